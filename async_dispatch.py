@@ -0,0 +1,149 @@
+import asyncio
+import random
+import threading
+import time
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+# Token bucket: holds up to `capacity` units and refills continuously
+class TokenBucket:
+    def __init__(self, per_minute):
+        """
+        Callers reserve their units up front and then sleep off any deficit,
+        so one bucket can be shared by several threads and event loops.
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        """Takes amount units and returns how long to wait before using them."""
+        # A single request larger than the bucket would wait forever, so cap it
+        amount = min(amount, self.capacity)
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    async def acquire(self, amount=1):
+        delay = self.reserve(amount)
+        if delay:
+            await asyncio.sleep(delay)
+
+    def wait(self, amount=1):
+        delay = self.reserve(amount)
+        if delay:
+            time.sleep(delay)
+
+
+# Requests-per-minute and tokens-per-minute caps; either may be None for no limit
+class RateLimiter:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+
+    async def acquire(self, tokens):
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens:
+            await self.tokens.acquire(tokens)
+
+    def wait(self, tokens):
+        """Blocking form of acquire, for the sequential conversion path."""
+        if self.requests:
+            self.requests.wait(1)
+        if self.tokens:
+            self.tokens.wait(tokens)
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) used for the tokens-per-minute cap."""
+    return len(text) // 4 + 1
+
+
+def _retry_status(error):
+    # openai errors carry .status_code, google.genai errors carry .code
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    return status if status in RETRY_STATUSES else None
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def call_with_backoff(call, max_retries=5, base_delay=1.0, max_delay=60.0):
+    """
+    Awaits call(), retrying on 429 and 5xx responses with exponential backoff
+    and jitter. A Retry-After header from the server is honoured when present.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return await call()
+        except Exception as e:
+            status = _retry_status(e)
+            if status is None or attempt == max_retries:
+                raise
+            delay = min(max_delay, base_delay * 2 ** attempt) * (0.5 + random.random() / 2)
+            delay = max(delay, _retry_after(e) or 0)
+            print(f"⏳ Got {status}, retrying in {delay:.1f}s (attempt {attempt + 1}/{max_retries})")
+            await asyncio.sleep(delay)
+
+
+async def dispatch_batches(batches, send_batch, concurrency=4, limiter=None, token_estimate=None, max_retries=5,
+                           batch_numbers=None, on_result=None, telemetry=None):
+    """
+    Sends every batch through send_batch(batch, batch_number) with at most
+    `concurrency` requests in flight. Returns the responses in input order;
+    a batch that still fails after its retries is returned as the exception.
+    batch_numbers defaults to 1..N. on_result(batch_number, response) is
+    called as soon as each batch finishes, whatever order they finish in.
+    With a BatchTelemetry, each batch's queue wait, latency of its last
+    attempt and retry count are recorded before on_result runs.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = limiter or RateLimiter()
+    if batch_numbers is None:
+        batch_numbers = range(1, len(batches) + 1)
+
+    async def run(batch_number, batch):
+        tokens = token_estimate(batch) if token_estimate else 0
+        timing = {"queue_wait_seconds": 0.0, "request_seconds": 0.0, "attempts": 0}
+
+        async def attempt():
+            # Every attempt, retries included, counts against the rate limits
+            waiting = time.perf_counter()
+            await limiter.acquire(tokens)
+            started = time.perf_counter()
+            timing["queue_wait_seconds"] += started - waiting
+            timing["attempts"] += 1
+            try:
+                return await send_batch(batch, batch_number)
+            finally:
+                timing["request_seconds"] = time.perf_counter() - started
+
+        queued = time.perf_counter()
+        async with semaphore:
+            timing["queue_wait_seconds"] += time.perf_counter() - queued
+            try:
+                result = await call_with_backoff(attempt, max_retries=max_retries)
+            except Exception as e:
+                result = e
+        if telemetry:
+            telemetry.update(batch_number, queue_wait_seconds=round(timing["queue_wait_seconds"], 6),
+                             request_seconds=round(timing["request_seconds"], 6),
+                             retries=max(0, timing["attempts"] - 1))
+        if on_result:
+            on_result(batch_number, result)
+        return result
+
+    return await asyncio.gather(*(run(n, batch) for n, batch in zip(batch_numbers, batches)))
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+
+
+def input_fingerprint(data, batch_size):
+    """Identifies an input list and batching, so a journal is never resumed against different batches."""
+    payload = json.dumps({"batch_size": batch_size, "data": data}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def journal_seed(path):
+    """The seed recorded in a journal's header, or None if there is no readable journal or it has none."""
+    try:
+        with open(path, "r") as f:
+            return json.loads(f.readline()).get("seed")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+# Append-only JSONL journal of completed batches for one conversion run
+class BatchJournal:
+    def __init__(self, path, fingerprint, resume=False, seed=None):
+        """
+        With resume=True an existing journal for the same fingerprint is kept
+        and its batches count as done; otherwise the journal starts empty.
+        seed (e.g. the IOC memo's refresh seed) is kept in the header for
+        journal_seed to hand back to a resumed run.
+        """
+        self.path = path
+        self.fingerprint = fingerprint
+        self._offsets = {}
+        self.spans = {}  # batch number -> (start, end) of the input items it covers, when recorded
+
+        if resume and os.path.exists(path):
+            if self._load():
+                return
+            print(f"⚠️ Journal {path} belongs to a different input or batch size, starting over")
+
+        header = {"fingerprint": fingerprint}
+        if seed is not None:
+            header["seed"] = seed
+        with open(path, "w") as f:
+            f.write(json.dumps(header) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _load(self):
+        with open(self.path, "rb") as f:
+            try:
+                header = json.loads(f.readline())
+            except json.JSONDecodeError:
+                return False
+            if header.get("fingerprint") != self.fingerprint:
+                return False
+
+            while True:
+                offset = f.tell()
+                line = f.readline()
+                if not line:
+                    break
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn write from a crash: everything before it is intact
+                    break
+                self._offsets[record["batch"]] = offset
+                if record.get("span"):
+                    self.spans[record["batch"]] = tuple(record["span"])
+
+        # Drop the torn tail so later appends start on a clean line
+        with open(self.path, "r+b") as f:
+            f.truncate(offset)
+        return True
+
+    def completed_batches(self):
+        return set(self._offsets)
+
+    def append(self, batch_number, indicators, span=None):
+        """Durably records one finished batch before the run moves on."""
+        record = {"batch": batch_number, "items": indicators}
+        if span:
+            record["span"] = list(span)
+            self.spans[batch_number] = tuple(span)
+        line = json.dumps(record) + "\n"
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        self._offsets[batch_number] = offset
+
+    def iter_indicators(self):
+        """Yields the journaled indicators in batch order, reading one batch at a time."""
+        with open(self.path, "rb") as f:
+            for batch_number in sorted(self._offsets):
+                f.seek(self._offsets[batch_number])
+                yield from json.loads(f.readline())["items"]
+
+    def remove(self):
+        os.remove(self.path)
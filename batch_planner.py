@@ -0,0 +1,141 @@
+from batch_journal import input_fingerprint
+from batch_repair import REPAIR_BASE, find_missing
+from async_dispatch import estimate_tokens
+from prompt_packer import item_prompt_tokens, item_reply_tokens
+
+# Output tokens cost about this many input tokens on the providers' price lists
+OUTPUT_PRICE_RATIO = 4
+
+
+# Picks the next batch size from how the finished batches did
+class AdaptiveBatchSize:
+    def __init__(self, start, minimum=5, maximum=500, omission_target=0.02, objective="throughput", backoff=0.7):
+        """
+        A batch that drops more than omission_target of its items shrinks the
+        size by `backoff`. Otherwise the size climbs towards whichever size
+        gives the best objective: covered items per second ("throughput"),
+        or per price-weighted token ("cost"), stepping a quarter of the size
+        at a time and turning round when a step made things worse.
+        """
+        self.size = start
+        self.minimum = min(minimum, maximum)
+        self.maximum = maximum
+        self.omission_target = omission_target
+        self.objective = objective
+        self.backoff = backoff
+        self.direction = 1
+        self.last_score = None
+        self.history = []
+
+    def score(self, covered, seconds, prompt_tokens, completion_tokens):
+        if self.objective == "cost":
+            return covered / max(1, prompt_tokens + OUTPUT_PRICE_RATIO * completion_tokens)
+        return covered / max(seconds, 1e-3)
+
+    def observe(self, items_in, missing, seconds, prompt_tokens, completion_tokens):
+        """Takes one finished batch into account and returns the new size."""
+        omission_rate = missing / items_in if items_in else 0.0
+        if omission_rate > self.omission_target:
+            self.size = max(self.minimum, int(items_in * self.backoff))
+            self.direction = 1
+            self.last_score = None
+        else:
+            score = self.score(items_in - missing, seconds, prompt_tokens, completion_tokens)
+            if self.last_score is not None and score < self.last_score:
+                self.direction = -self.direction
+            self.last_score = score
+            # Steps from the batch actually sent, which the token budget may have cut short
+            self.size = min(self.maximum, max(self.minimum, items_in + self.direction * max(1, items_in // 4)))
+        self.history.append({"items_in": items_in, "omission_rate": round(omission_rate, 4),
+                             "seconds": round(seconds, 3), "next_size": self.size})
+        return self.size
+
+
+# Cuts the input into numbered batches: by count, by token budget, or adaptively while the run goes
+class BatchPlanner:
+    def __init__(self, data, batch_size=25, budget=None, adaptive=None, system_prompt=""):
+        """
+        batch_size caps the items in a batch; budget (a TokenBudget) also
+        caps its estimated tokens. Without `adaptive` every batch is cut up
+        front. With an AdaptiveBatchSize, batches are cut a wave at a time
+        and each wave uses the size the finished ones point to; their
+        journal records carry the span of items they cover, so a resumed
+        run re-cuts only the spans that were never finished. system_prompt
+        is counted into the tokens of batches whose provider reports none.
+        """
+        self.data = data
+        self.batch_size = batch_size
+        self.budget = budget
+        self.adaptive = adaptive
+        self.system_tokens = estimate_tokens(system_prompt)
+        self.batches = {}
+        self.spans = {}
+        self.gaps = [(0, len(data))] if data else []
+        self.next_number = 1
+        if not adaptive:
+            while self.gaps:
+                self._cut(batch_size)
+
+    def fingerprint(self):
+        """Identifies the input and how it is batched, for the journal."""
+        if self.adaptive:
+            return input_fingerprint(self.data, "adaptive")
+        return input_fingerprint(self.data, self.batch_size if self.budget is None
+                                 else [len(batch) for _, batch in sorted(self.batches.items())])
+
+    def resume(self, journal):
+        """Drops the work a resumed journal already holds; returns the batch numbers still to send."""
+        done = {n for n in journal.completed_batches() if n < REPAIR_BASE}
+        if self.adaptive:
+            covered = sorted(span for n, span in journal.spans.items() if n in done and span)
+            self.gaps = []
+            start = 0
+            for span_start, span_end in covered:
+                if span_start > start:
+                    self.gaps.append((start, span_start))
+                start = max(start, span_end)
+            if start < len(self.data):
+                self.gaps.append((start, len(self.data)))
+            self.next_number = max(done, default=0) + 1
+            return []
+        return [n for n in sorted(self.batches) if n not in done]
+
+    def _cut(self, size):
+        start, end = self.gaps[0]
+        stop = self.budget.cut(self.data, start, end, size) if self.budget else min(end, start + size)
+        if stop < end:
+            self.gaps[0] = (stop, end)
+        else:
+            self.gaps.pop(0)
+        number = self.next_number
+        self.next_number += 1
+        self.batches[number] = self.data[start:stop]
+        self.spans[number] = (start, stop)
+        return number
+
+    def waves(self, pending, concurrency):
+        """
+        Yields lists of (batch number, batch) to send. Cut-up-front plans come
+        as one wave; adaptive ones as waves of `concurrency` batches, cut after
+        the previous wave has been observed.
+        """
+        if not self.adaptive:
+            if pending:
+                yield [(n, self.batches[n]) for n in pending]
+            return
+        while self.gaps:
+            numbers = [self._cut(self.adaptive.size) for _ in range(max(1, concurrency)) if self.gaps]
+            yield [(n, self.batches[n]) for n in numbers]
+
+    def observe(self, batch_number, indicators, record):
+        """Feeds one finished batch (and its telemetry record) to the adaptive size."""
+        if not self.adaptive or batch_number not in self.spans or record.get("cached"):
+            return
+        items = self.batches[batch_number]
+        missing = len(find_missing(items, indicators or [])) if indicators is not None else len(items)
+        # Providers that report no usage are charged the estimate
+        prompt_tokens = record.get("prompt_tokens") or self.system_tokens + sum(map(item_prompt_tokens, items))
+        completion_tokens = record.get("completion_tokens") or sum(map(item_reply_tokens, items))
+        size = self.adaptive.observe(len(items), missing, record.get("request_seconds") or 0.0,
+                                     prompt_tokens, completion_tokens)
+        print(f"📐 Batch {batch_number}: {missing}/{len(items)} items missing; next batches hold {size} items")
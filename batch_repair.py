@@ -0,0 +1,49 @@
+from stix_patterns import IocIndex, IP_PATHS, URL_PATHS, MD5_PATHS, SHA1_PATHS, SHA256_PATHS
+from fast_validate import check_pattern
+
+# Source record fields that hold an IOC, and the object paths that cover each one
+SOURCE_FIELDS = {
+    "ipAddress": IP_PATHS,
+    "url": URL_PATHS,
+    "md5_hash": MD5_PATHS,
+    "sha1_hash": SHA1_PATHS,
+    "sha256_hash": SHA256_PATHS,
+}
+
+# Repair batches are journaled under numbers above this, so they sort after the main batches
+REPAIR_BASE = 1_000_000
+
+
+def drop_malformed(batch_num, indicators):
+    """Removes indicators whose pattern does not parse, so their items are re-requested."""
+    kept = [obj for obj in indicators
+            if isinstance(obj, dict) and isinstance(obj.get("pattern"), str) and not check_pattern(obj["pattern"])]
+    if len(kept) < len(indicators):
+        print(f"🧹 Dropped {len(indicators) - len(kept)} malformed indicators from batch {batch_num}")
+    return kept
+
+
+def find_missing(items, indicators):
+    """
+    Returns the source items that no indicator's pattern covers, using one
+    exact-value index per IOC field. Items without a known IOC field cannot
+    be checked and are never reported.
+    """
+    indexes = {field: IocIndex([item.get(field) if isinstance(item, dict) else None for item in items], paths)
+               for field, paths in SOURCE_FIELDS.items()}
+    covered = set()
+    for obj in indicators:
+        pattern = obj.get("pattern") if isinstance(obj, dict) else None
+        if isinstance(pattern, str):
+            for index in indexes.values():
+                covered.update(index.find_all(pattern))
+
+    return [item for idx, item in enumerate(items)
+            if idx not in covered and isinstance(item, dict) and any(item.get(field) for field in SOURCE_FIELDS)]
+
+
+def plan_repairs(missing, used_batch_numbers, repair_batch_size):
+    """Splits the missing items into small numbered batches that do not clash with journaled ones."""
+    next_number = max([REPAIR_BASE, *used_batch_numbers]) + 1
+    return {next_number + i: missing[start:start + repair_batch_size]
+            for i, start in enumerate(range(0, len(missing), repair_batch_size))}
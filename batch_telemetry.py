@@ -0,0 +1,145 @@
+import json
+import math
+import os
+import time
+
+# Fields every batch record carries, with their value before anything is measured
+BATCH_FIELDS = {
+    "status": "ok",
+    "cached": False,
+    "items_in": 0,
+    "indicators_out": 0,
+    "queue_wait_seconds": 0.0,
+    "request_seconds": 0.0,
+    "parse_seconds": 0.0,
+    "first_indicator_seconds": None,
+    "truncated": False,
+    "retries": 0,
+    "prompt_tokens": 0,
+    "completion_tokens": 0,
+}
+
+
+def label_value(value):
+    """A Prometheus label value: quoted, with backslash, quote and newline escaped."""
+    text = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return f'"{text}"'
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of a list of numbers; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+# Per-batch timings, token counts and item counts for one conversion run
+class BatchTelemetry:
+    def __init__(self, path=None, run=None):
+        """
+        Each finished batch becomes one record, appended to the JSONL file at
+        `path` if given. `run` labels the records (e.g. the output file) so
+        several runs can share one log.
+        """
+        self.path = path
+        self.run = run
+        self.started = time.time()
+        self.pending = {}
+        self.records = []
+
+    def update(self, batch_number, **fields):
+        record = self.pending.setdefault(batch_number, dict(BATCH_FIELDS, batch=batch_number))
+        record.update(fields)
+
+    def finish(self, batch_number, **fields):
+        self.update(batch_number, **fields)
+        record = self.pending.pop(batch_number)
+        record["run"] = self.run
+        record["finished_at"] = round(time.time(), 3)
+        self.records.append(record)
+        if self.path:
+            with open(self.path, "a") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def summary(self):
+        seconds = time.time() - self.started
+        latencies = [r["request_seconds"] for r in self.records if not r["cached"] and r["status"] != "failed"]
+        total = lambda field: sum(r[field] for r in self.records)
+        return {
+            "run": self.run,
+            "batches": len(self.records),
+            "failed": sum(r["status"] != "ok" for r in self.records),
+            "cached": sum(r["cached"] for r in self.records),
+            "seconds": round(seconds, 3),
+            "items_in": total("items_in"),
+            "indicators_out": total("indicators_out"),
+            "items_per_second": round(total("items_in") / seconds, 2) if seconds else None,
+            "retries": total("retries"),
+            "prompt_tokens": total("prompt_tokens"),
+            "completion_tokens": total("completion_tokens"),
+            "queue_wait_seconds": round(total("queue_wait_seconds"), 3),
+            "parse_seconds": round(total("parse_seconds"), 3),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+            "truncated": sum(r["truncated"] for r in self.records),
+            "first_indicator_p50": percentile([r["first_indicator_seconds"] for r in self.records
+                                               if r["first_indicator_seconds"] is not None], 50),
+        }
+
+    def print_summary(self):
+        s = self.summary()
+        fmt = lambda v: "-" if v is None else f"{v:.2f}s"
+        print(f"📊 {s['batches']} batches ({s['failed']} failed, {s['cached']} cached) in {s['seconds']:.1f}s: "
+              f"{s['items_in']} items in, {s['indicators_out']} indicators out, {s['items_per_second']} items/s")
+        print(f"   latency p50 {fmt(s['latency_p50'])}, p95 {fmt(s['latency_p95'])}, p99 {fmt(s['latency_p99'])}; "
+              f"{s['retries']} retries; {s['prompt_tokens']} prompt + {s['completion_tokens']} completion tokens")
+        if s["first_indicator_p50"] is not None:
+            print(f"   first indicator after {fmt(s['first_indicator_p50'])} (p50); {s['truncated']} replies cut off")
+
+    def write_prometheus(self, path):
+        """Writes the run's metrics in the Prometheus text exposition format."""
+        label = f"run={label_value(self.run)}" if self.run else ""
+        join = lambda *parts: "{" + ",".join(p for p in parts if p) + "}"
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for suffix, labels, value in samples:
+                lines.append(f"{name}{suffix}{join(label, labels)} {value}")
+
+        def summary_samples(field, records):
+            values = [r[field] for r in records]
+            samples = [("", f'quantile="{q / 100}"', percentile(values, q) or 0) for q in (50, 95, 99)]
+            return samples + [("_sum", "", round(sum(values), 6)), ("_count", "", len(values))]
+
+        statuses = sorted({r["status"] for r in self.records} | {"ok"})
+        metric("stix_batches_total", "counter", "Batches finished, by outcome.",
+               [("", f"status={label_value(s)}", sum(r["status"] == s for r in self.records)) for s in statuses])
+        metric("stix_batches_cached_total", "counter", "Batches answered from the response cache.",
+               [("", "", sum(r["cached"] for r in self.records))])
+        requested = [r for r in self.records if not r["cached"] and r["status"] != "failed"]
+        metric("stix_batch_request_seconds", "summary", "Model request latency per batch.",
+               summary_samples("request_seconds", requested))
+        metric("stix_batch_queue_wait_seconds", "summary", "Time a batch waited for a slot or the rate limiter.",
+               summary_samples("queue_wait_seconds", self.records))
+        metric("stix_batch_parse_seconds", "summary", "Time spent parsing each batch response.",
+               summary_samples("parse_seconds", self.records))
+        streamed = [r for r in self.records if r["first_indicator_seconds"] is not None]
+        if streamed:
+            metric("stix_batch_first_indicator_seconds", "summary", "Time from request to first streamed indicator.",
+                   summary_samples("first_indicator_seconds", streamed))
+        for field, help_text in [("retries", "Retried model requests."),
+                                 ("truncated", "Replies cut off before the indicator array closed."),
+                                 ("prompt_tokens", "Prompt tokens reported by the provider."),
+                                 ("completion_tokens", "Completion tokens reported by the provider."),
+                                 ("items_in", "Source items sent to the model."),
+                                 ("indicators_out", "Indicators parsed from model responses.")]:
+            metric(f"stix_{field}_total", "counter", help_text, [("", "", sum(r[field] for r in self.records))])
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
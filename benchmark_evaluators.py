@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import importlib
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+from synthetic_corpus import IOC_KINDS, write_corpus, ioc_pattern
+from stix_patterns import IP_PATHS, URL_PATHS, MD5_PATHS
+from ioc_store import exact_index
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Evaluator script, source-list extractor, and the result keys that hold omissions/repeats/unexpected
+EVALUATORS = {
+    "ip": ("ip_search", "extract_ip_list", "omitted_ips", "repeated_ips", "unexpected_patterns"),
+    "url": ("url_search", "extract_url_list", "omitted_urls", "repeated_urls", "unexpected_patterns"),
+    "md5": ("hash_search", "extract_hash_list", "missing_hashes", "duplicate_patterns", "extra_patterns"),
+}
+
+# Object paths of each kind's exact index
+INDEX_PATHS = {"ip": IP_PATHS, "url": URL_PATHS, "md5": MD5_PATHS}
+
+# Modules a stix_cli subcommand should load only when it needs them
+HEAVY_MODULES = {"openai", "google", "pydantic", "stix2validator"}
+
+def measure(fn, track_memory=True):
+    """Runs fn twice: once timed, once under tracemalloc for peak Python allocations."""
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+
+    peak = None
+    if track_memory:
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+# Compare an evaluator's summary with the errors injected into each bundle
+def check_against_truth(kind, results, truth):
+    _, _, omitted_key, repeated_key, unexpected_key = EVALUATORS[kind]
+    problems = []
+    for result in results:
+        expected = truth[result["file"]]
+        if set(result[omitted_key]) != set(expected["omitted"]):
+            problems.append(f"{result['file']}: omissions differ")
+        # hash_search reports duplicated patterns, the others report duplicated IOCs
+        if kind == "md5":
+            expected_repeated = {ioc_pattern(kind, ioc) for ioc in expected["duplicated"]}
+        else:
+            expected_repeated = set(expected["duplicated"])
+        if set(result[repeated_key]) != expected_repeated:
+            problems.append(f"{result['file']}: repeats differ")
+        if set(result[unexpected_key]) != set(expected["hallucinated"]):
+            problems.append(f"{result['file']}: unexpected patterns differ")
+    return problems
+
+def bench_evaluator(kind, n, work_dir, bundles, workers, track_memory):
+    script, extract_name, *_ = EVALUATORS[kind]
+    module = importlib.import_module(script)
+    source_file, stix_dir, truth = write_corpus(work_dir, kind, n, bundles)
+    summary_file = os.path.join(work_dir, f"{kind}_{n}_summary.json")
+    ioc_list = getattr(module, extract_name)(source_file)
+
+    def run():
+        module.evaluate_stix_directory(ioc_list, stix_dir, summary_file, workers=workers)
+        with open(summary_file, 'r') as f:
+            return json.load(f)
+
+    # The evaluators print a report per file; keep it out of the benchmark output
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        results, seconds, peak = measure(run, track_memory)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    indicators = sum(n - len(t["omitted"]) + len(t["duplicated"]) + len(t["hallucinated"]) for t in truth.values())
+    return {
+        "benchmark": f"evaluate_stix_directory[{kind}]",
+        "iocs": n,
+        "bundles": bundles,
+        "seconds": round(seconds, 3),
+        "indicators_per_second": round(indicators / seconds) if seconds else None,
+        "peak_bytes": peak,
+        "problems": check_against_truth(kind, results, truth),
+    }
+
+def bench_json_block(n, track_memory):
+    from gpt_stix import extract_first_json_block
+    items = [{"type": "indicator", "pattern": ioc_pattern("ip", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}")} for i in range(n)]
+    # Model-style reply: prose, a fenced array, and trailing chatter
+    text = "Here are the indicators:\n```json\n" + json.dumps(items, indent=2) + "\n```\nLet me know if you need more."
+
+    block, seconds, peak = measure(lambda: extract_first_json_block(text), track_memory)
+    problems = [] if block is not None and json.loads(block) == items else ["extracted block does not match"]
+    return {
+        "benchmark": "extract_first_json_block",
+        "iocs": n,
+        "seconds": round(seconds, 3),
+        "mb_per_second": round(len(text) / seconds / 1e6, 2) if seconds else None,
+        "peak_bytes": peak,
+        "problems": problems,
+    }
+
+# Memory an exact index keeps once the evaluator has dropped its source list
+def bench_index_memory(kind, n, compact, plain_bytes=None):
+    iocs = IOC_KINDS[kind]["generate"](random.Random(0), n)
+    start = time.perf_counter()
+    exact_index(iocs, INDEX_PATHS[kind], compact=compact)
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    ioc_list = [ioc.encode().decode() for ioc in iocs]  # fresh strings, as if just read from the source file
+    index = exact_index(ioc_list, INDEX_PATHS[kind], compact=compact)
+    del ioc_list
+    kept, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del index
+
+    problems = []
+    if plain_bytes is not None and kept >= plain_bytes:
+        problems.append(f"keeps {kept} bytes, IocIndex keeps {plain_bytes}")
+    return {
+        "benchmark": f"index_memory[{kind}, {'compact' if compact else 'plain'}]",
+        "iocs": n,
+        "seconds": round(seconds, 3),
+        "bytes_per_ioc": round(kept / n, 1),
+        "peak_bytes": kept,
+        "problems": problems,
+    }
+
+# Cold start of one stix_cli subcommand in a fresh interpreter, as cron or a batch scheduler runs it
+def bench_startup(name, cli_args, n, repeats):
+    command = [sys.executable, os.path.join(REPO_DIR, "stix_cli.py"), *cli_args]
+    seconds = []
+    problems = []
+    with tempfile.TemporaryDirectory(prefix="stix_startup_") as run_dir:
+        for _ in range(repeats):
+            start = time.perf_counter()
+            done = subprocess.run(command, cwd=run_dir, capture_output=True, text=True)
+            seconds.append(time.perf_counter() - start)
+            if done.returncode != 0:
+                problems.append(f"exit {done.returncode}: {done.stderr.strip()[-200:]}")
+                break
+        # One more run under -X importtime to see which top-level packages were loaded
+        traced = subprocess.run([sys.executable, "-X", "importtime", *command[1:]], cwd=run_dir,
+                                capture_output=True, text=True)
+    loaded = {line.split("|")[-1].strip().split(".")[0] for line in traced.stderr.splitlines()
+              if line.startswith("import time:")}
+    problems.extend(f"loaded {module}" for module in sorted(HEAVY_MODULES & loaded))
+    return {
+        "benchmark": f"startup[{name}]",
+        "iocs": n,
+        "seconds": round(statistics.median(seconds), 3),
+        "peak_bytes": None,
+        "problems": problems,
+    }
+
+def bench_startups(work_dir, n, repeats):
+    source_file, stix_dir, _ = write_corpus(work_dir, "ip", n, 1)
+    return [
+        bench_startup("evaluate", ["evaluate", stix_dir, "--ip", source_file, "--no-db"], n, repeats),
+        bench_startup("validate --fast", ["validate", stix_dir, "--fast", "--no-db"], n, repeats),
+        bench_startup("convert --dry-run", ["convert", "openai", source_file, "--dry-run"], n, repeats),
+    ]
+
+def print_row(row):
+    peak = f"{row['peak_bytes'] / 1e6:.1f} MB" if row["peak_bytes"] is not None else "-"
+    status = "✅" if not row["problems"] else f"❌ {'; '.join(row['problems'][:3])}"
+    print(f"{row['benchmark']:<36} {row['iocs']:>9} IOCs  {row['seconds']:>9.3f}s  peak {peak:>10}  {status}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the evaluators on synthetic corpora with known errors")
+    parser.add_argument("--kinds", default="ip,url,md5")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--bundles", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc pass")
+    parser.add_argument("--work-dir", help="where to write the corpus (default: a temporary directory)")
+    parser.add_argument("--startup-runs", type=int, default=5,
+                        help="cold starts of each stix_cli subcommand to time (0 to skip)")
+    parser.add_argument("--output", default="benchmark_results.json")
+    args = parser.parse_args()
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="stix_bench_")
+    sizes = [int(n) for n in args.sizes.split(",")]
+    rows = []
+
+    if args.startup_runs:
+        for row in bench_startups(work_dir, 100, args.startup_runs):
+            rows.append(row)
+            print_row(row)
+
+    for n in sizes:
+        for kind in args.kinds.split(","):
+            rows.append(bench_evaluator(kind, n, work_dir, args.bundles, args.workers, not args.no_memory))
+            print_row(rows[-1])
+        if not args.no_memory:
+            # The compact index must keep less than IocIndex for its --compact option to be worth it
+            for kind in args.kinds.split(","):
+                rows.append(bench_index_memory(kind, n, compact=False))
+                print_row(rows[-1])
+                rows.append(bench_index_memory(kind, n, compact=True, plain_bytes=rows[-1]["peak_bytes"]))
+                print_row(rows[-1])
+        rows.append(bench_json_block(n, not args.no_memory))
+        print_row(rows[-1])
+
+    with open(args.output, 'w') as out:
+        json.dump(rows, out, indent=2)
+    print(f"\n📄 Saved benchmark results to {args.output} (corpus in {work_dir})")
+    sys.exit(1 if any(row["problems"] for row in rows) else 0)
@@ -0,0 +1,152 @@
+import hashlib
+import json
+import os
+import textwrap
+import uuid
+from stix_reader import MANIFEST_SUFFIX, read_manifest
+
+
+def _bundle_header():
+    return {
+        "type": "bundle",
+        "id": f"bundle--{uuid.uuid4()}",
+        "spec_version": "2.1",
+    }
+
+
+def manifest_path_for(output_file):
+    return os.path.splitext(output_file)[0] + MANIFEST_SUFFIX
+
+
+# Write a STIX bundle one object at a time, in the same layout as json.dump(..., indent=2)
+def write_stix_bundle(output_file, objects, shard_bytes=None):
+    """
+    Streams objects into a bundle at output_file without holding them all in
+    memory. The file is written under a temporary name and moved into place
+    at the end, so a crash never leaves a half-written bundle behind.
+    With shard_bytes the bundle is split into shards instead (see
+    write_stix_shards). Returns the number of objects written.
+    """
+    if shard_bytes:
+        return write_stix_shards(output_file, objects, shard_bytes)
+
+    header = _bundle_header()
+    count = 0
+    tmp_file = f"{output_file}.tmp"
+
+    with open(tmp_file, 'w') as f:
+        f.write("{\n")
+        for key, value in header.items():
+            f.write(f"  {json.dumps(key)}: {json.dumps(value)},\n")
+        f.write('  "objects": [')
+        for obj in objects:
+            f.write(",\n" if count else "\n")
+            f.write(textwrap.indent(json.dumps(obj, indent=2), "    "))
+            count += 1
+        f.write("\n  ]\n}" if count else "]\n}")
+
+    os.replace(tmp_file, output_file)
+    # A sharded copy from an earlier run would otherwise be evaluated as well
+    _remove_shard_set(manifest_path_for(output_file))
+    return count
+
+
+# One shard: a complete bundle with one compact object per line
+class _Shard:
+    FOOTER = b"\n]}\n"
+
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.f = open(self.tmp_path, 'wb')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.count = 0
+        header = json.dumps(_bundle_header())[:-1] + ', "objects": ['
+        self.write(header.encode("utf-8"))
+
+    def write(self, data):
+        self.f.write(data)
+        self.digest.update(data)
+        self.size += len(data)
+
+    def fits(self, data, max_bytes):
+        # A shard always takes at least one object, however large
+        return self.count == 0 or self.size + len(data) + len(self.FOOTER) <= max_bytes
+
+    def add(self, data):
+        self.write(b",\n" + data if self.count else b"\n" + data)
+        self.count += 1
+
+    def close(self):
+        self.write(self.FOOTER if self.count else b"]}\n")
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+        return {"file": os.path.basename(self.path), "objects": self.count,
+                "bytes": self.size, "sha256": self.digest.hexdigest()}
+
+
+def write_stix_shards(output_file, objects, shard_bytes):
+    """
+    Streams objects into bundles of at most shard_bytes each, named
+    <output>.partNNN.json, then writes <output>.manifest.json listing every
+    shard with its object count, size and sha256. The manifest is written
+    last, so readers only ever see complete shard sets. Returns the number
+    of objects written.
+    """
+    stem = os.path.splitext(output_file)[0]
+    manifest_file = manifest_path_for(output_file)
+    old_shards = _listed_shards(manifest_file)
+
+    shards = []
+    shard = _Shard(f"{stem}.part{len(shards) + 1:03}.json")
+    total = 0
+    for obj in objects:
+        data = json.dumps(obj).encode("utf-8")
+        if not shard.fits(b",\n" + data, shard_bytes):
+            shards.append(shard.close())
+            shard = _Shard(f"{stem}.part{len(shards) + 1:03}.json")
+        shard.add(data)
+        total += 1
+    shards.append(shard.close())
+
+    manifest = {
+        "type": "stix-shard-manifest",
+        "bundle": os.path.basename(output_file),
+        "objects": total,
+        "shard_bytes": shard_bytes,
+        "shards": shards,
+    }
+    tmp_file = f"{manifest_file}.tmp"
+    with open(tmp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)
+
+    # Drop what an earlier run left behind: extra shards, or the single-file bundle
+    current = {shard["file"] for shard in shards}
+    folder = os.path.dirname(output_file)
+    for name in old_shards - current:
+        _remove(os.path.join(folder, name))
+    _remove(output_file)
+    return total
+
+
+def _listed_shards(manifest_file):
+    try:
+        return {shard["file"] for shard in read_manifest(manifest_file)["shards"]}
+    except (OSError, ValueError, KeyError, TypeError):
+        return set()
+
+
+def _remove_shard_set(manifest_file):
+    folder = os.path.dirname(manifest_file)
+    for name in _listed_shards(manifest_file):
+        _remove(os.path.join(folder, name))
+    _remove(manifest_file)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
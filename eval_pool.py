@@ -0,0 +1,147 @@
+import os
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from stix_reader import MANIFEST_SUFFIX, read_manifest
+from result_store import ResultStore, context_hash
+from omission_matrix import OmissionMatrixWriter, positions_for
+from results_db import ResultsDB, outcome_rows
+
+# Shared state (the IOC index) handed to each worker once, at pool start-up
+_shared = None
+
+
+def _init_worker(shared):
+    global _shared
+    _shared = shared
+
+
+def _run(task):
+    score_file, path = task
+    return score_file(_shared, path)
+
+
+def list_stix_files(stix_dir):
+    """
+    Returns the .json files in stix_dir, sorted so summaries come out in a
+    stable order. A sharded bundle is listed once, by its manifest, and its
+    shard files are left out.
+    """
+    names = [f for f in os.listdir(stix_dir) if f.endswith(".json")]
+    shards = set()
+    for name in names:
+        if name.endswith(MANIFEST_SUFFIX):
+            try:
+                shards.update(shard["file"] for shard in read_manifest(os.path.join(stix_dir, name))["shards"])
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+    return sorted(f for f in names if f not in shards)
+
+
+def map_stix_files(score_file, shared, paths, workers=1, store=None):
+    """
+    Yields score_file(shared, path) for each path, in input order.
+    With workers > 1 the files are fanned out to a process pool; score_file
+    must be a module-level function so it can be pickled. With a
+    ResultStore, unchanged files reuse their stored result and only the
+    rest are scored.
+    """
+    if store is None:
+        yield from _score_files(score_file, shared, paths, workers)
+        return
+
+    stored = {path: store.lookup(path) for path in paths}
+    fresh = _score_files(score_file, shared, [path for path in paths if stored[path] is None], workers)
+    for path in paths:
+        result = stored[path]
+        if result is None:
+            result = next(fresh)
+            store.save(path, result)
+        yield result
+    fresh.close()
+    store.flush()
+
+
+def _score_files(score_file, shared, paths, workers):
+    if workers <= 1:
+        for path in paths:
+            yield score_file(shared, path)
+        return
+
+    chunksize = max(1, len(paths) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared,)) as pool:
+        yield from pool.map(_run, [(score_file, path) for path in paths], chunksize=chunksize)
+
+
+# Everything around scoring that the single-type evaluators (ip, url, hash) share
+def evaluate_files(tool, ioc_type, matcher, stix_dir, output_file, score_file, describe, report,
+                   exact=True, workers=1, store_file=None, canonical=False, matrix_file=None, matrix_group=None,
+                   db_file=None, model=None, saved_label="✅ Saved summary"):
+    """
+    Scores each STIX file in stix_dir with score_file(matcher, path),
+    reusing stored results, adding a matrix row and a results database
+    record per file and writing the JSON summary. describe(matcher, scored)
+    maps one scored file to a dict of its summary ("result"), "matched",
+    "total", "omitted" and "unexpected" values, its "repeated" IOCs (a list,
+    or IOC -> count) and their "repeated_positions"; report(scored) prints it.
+    saved_label starts the line announcing the saved summary.
+    """
+    results = []
+
+    # Reuse stored results for files unchanged since the last run with this IOC list
+    store = ResultStore(store_file, context_hash(ioc_type, exact, canonical, list(matcher.iocs))) if store_file else None
+    # One matrix row per file, for cross-run omission analysis (needs the exact index)
+    matrix = OmissionMatrixWriter(matrix_file, matcher.iocs, ioc_type) if matrix_file and exact else None
+    db = ResultsDB(db_file) if db_file else None
+    run_id = db.start_run(tool, model=model, ioc_type=ioc_type, stix_dir=stix_dir, exact=exact,
+                          canonical=canonical) if db else None
+
+    paths = [os.path.join(stix_dir, filename) for filename in list_stix_files(stix_dir)]
+    for scored, path in zip(map_stix_files(score_file, matcher, paths, workers, store), paths):
+        outcome = describe(matcher, scored)
+        result = outcome["result"]
+        results.append(result)
+        if matrix:
+            matrix.add_run({"run": path, "group": matrix_group}, positions_for(matcher, outcome["omitted"]),
+                           outcome["repeated_positions"])
+        if db:
+            db.add_file(run_id, result["file"], outcome["matched"], outcome["total"], result["percentage"],
+                        outcome_rows(ioc_type, outcome["omitted"], outcome["repeated"]), outcome["unexpected"],
+                        result.get("parse_error"))
+        report(scored)
+
+    if store:
+        print(f"\n♻️ Reused stored results for {store.hits}/{len(paths)} files")
+
+    if db:
+        db.finish_run(run_id)
+        db.close()
+        print(f"\n🗄️ Recorded run {run_id} in {db_file}")
+
+    if output_file:
+        with open(output_file, 'w') as out:
+            json.dump(results, out, indent=2)
+        print(f"\n{saved_label} to {output_file}")
+    return results
+
+
+# Command-line options shared by the evaluators' __main__ blocks
+def evaluator_parser(description, matrix_help="append each file's omissions to this runs x IOCs matrix (.omx)"):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--canonical", action="store_true",
+                        help="match IOCs the model rewrote (IP notation, hash case, URL encoding)")
+    parser.add_argument("--matrix", help=matrix_help)
+    parser.add_argument("--group", help="label for these runs in the matrix, e.g. the model name")
+    parser.add_argument("--model", help="model that produced these files, recorded with the run in the results database")
+    parser.add_argument("--compact", action="store_true",
+                        help="keep the source IOCs in packed arrays: slower, but far smaller for multi-million-IOC lists")
+    parser.add_argument("--no-json", action="store_true", help="skip the JSON summary; the run still goes to the results database")
+    return parser
+
+
+def evaluator_options(args, store_file, db_file):
+    """evaluate_stix_directory keyword arguments for options parsed by evaluator_parser."""
+    return {"workers": args.workers, "store_file": store_file, "canonical": args.canonical,
+            "matrix_file": args.matrix, "matrix_group": args.group, "db_file": db_file,
+            "model": args.model or args.group, "compact": args.compact}
@@ -0,0 +1,414 @@
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from functools import lru_cache
+from stix_reader import iter_stix_objects, StixStreamError
+
+# Fields declared on the Indicator model in gpt_stix.py / gemini_stix.py
+INDICATOR_FIELDS = frozenset({
+    "type", "spec_version", "id", "created", "modified",
+    "pattern", "pattern_type", "valid_from", "description",
+})
+REQUIRED_FIELDS = INDICATOR_FIELDS - {"description"}
+
+# STIX 2.1 cyber observable types the fast path accepts in patterns
+KNOWN_OBJECT_TYPES = frozenset({
+    "artifact", "autonomous-system", "directory", "domain-name", "email-addr",
+    "email-message", "file", "ipv4-addr", "ipv6-addr", "mac-addr", "mutex",
+    "network-traffic", "process", "software", "url", "user-account",
+    "windows-registry-key", "x509-certificate",
+})
+
+# Properties of each of those types the fast path accepts in patterns (STIX 2.1
+# section 6); any other property, or a path into one, goes to the full validator
+OBJECT_PROPERTIES = {
+    "artifact": frozenset({"mime_type", "payload_bin", "url", "hashes", "encryption_algorithm", "decryption_key"}),
+    "autonomous-system": frozenset({"number", "name", "rir"}),
+    "directory": frozenset({"path", "path_enc", "ctime", "mtime", "atime", "contains_refs"}),
+    "domain-name": frozenset({"value", "resolves_to_refs"}),
+    "email-addr": frozenset({"value", "display_name", "belongs_to_ref"}),
+    "email-message": frozenset({
+        "is_multipart", "date", "content_type", "from_ref", "sender_ref", "to_refs", "cc_refs", "bcc_refs",
+        "message_id", "subject", "received_lines", "additional_header_fields", "body", "body_multipart",
+        "raw_email_ref",
+    }),
+    "file": frozenset({
+        "hashes", "size", "name", "name_enc", "magic_number_hex", "mime_type", "ctime", "mtime", "atime",
+        "parent_directory_ref", "contains_refs", "content_ref",
+    }),
+    "ipv4-addr": frozenset({"value", "resolves_to_refs", "belongs_to_refs"}),
+    "ipv6-addr": frozenset({"value", "resolves_to_refs", "belongs_to_refs"}),
+    "mac-addr": frozenset({"value"}),
+    "mutex": frozenset({"name"}),
+    "network-traffic": frozenset({
+        "start", "end", "is_active", "src_ref", "dst_ref", "src_port", "dst_port", "protocols",
+        "src_byte_count", "dst_byte_count", "src_packets", "dst_packets", "ipfix", "src_payload_ref",
+        "dst_payload_ref", "encapsulates_refs", "encapsulated_by_ref",
+    }),
+    "process": frozenset({
+        "is_hidden", "pid", "created_time", "cwd", "command_line", "environment_variables",
+        "opened_connection_refs", "creator_user_ref", "image_ref", "parent_ref", "child_refs",
+    }),
+    "software": frozenset({"name", "cpe", "swid", "languages", "vendor", "version"}),
+    "url": frozenset({"value"}),
+    "user-account": frozenset({
+        "user_id", "credential", "account_login", "account_type", "display_name", "is_service_account",
+        "is_privileged", "can_escalate_privs", "is_disabled", "account_created", "account_expires",
+        "credential_last_changed", "account_first_login", "account_last_login",
+    }),
+    "windows-registry-key": frozenset({"key", "values", "modified_time", "creator_user_ref", "number_of_subkeys"}),
+    "x509-certificate": frozenset({
+        "is_self_signed", "hashes", "version", "serial_number", "signature_algorithm", "issuer",
+        "validity_not_before", "validity_not_after", "subject", "subject_public_key_algorithm",
+        "subject_public_key_modulus", "subject_public_key_exponent", "x509_v3_extensions",
+    }),
+}
+# hash-algorithm-ov: the only keys the fast path accepts under `hashes`
+HASH_ALGORITHMS = frozenset({"MD5", "SHA-1", "SHA-256", "SHA-512", "SHA3-256", "SHA3-512", "SSDEEP", "TLSH"})
+
+_ID_RE = re.compile(r"^indicator--[0-9a-f]{8}-[0-9a-f]{4}-[1-5][0-9a-f]{3}-[89ab][0-9a-f]{3}-[0-9a-f]{12}$")
+_TIMESTAMP_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(\.\d+)?Z$")
+# STIX 2.1 requires created and modified to be precise to the millisecond
+_MILLISECOND_TIMESTAMP_RE = re.compile(r"^(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})(\.\d{3})Z$")
+
+# Tokens of the STIX 2.1 patterning grammar
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+)
+  | (?P<timestamp>t'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?Z')
+  | (?P<hex>h'(?:[0-9a-fA-F]{2})*')
+  | (?P<binary>b'[A-Za-z0-9+/]*={0,2}')
+  | (?P<string>'(?:\\['\\]|[^'\\])*')
+  | (?P<path>[A-Za-z_][A-Za-z0-9_-]*:(?:[A-Za-z_][A-Za-z0-9_]*|'(?:\\['\\]|[^'\\])*')
+        (?:\.(?:[A-Za-z_][A-Za-z0-9_]*|'(?:\\['\\]|[^'\\])*')|\[(?:[+-]?\d+|\*)\])*)
+  | (?P<float>[+-]?\d*\.\d+)
+  | (?P<int>[+-]?\d+)
+  | (?P<op><=|>=|!=|<>|==|=|<|>)
+  | (?P<punct>[\[\](),])
+  | (?P<word>[A-Za-z]+)
+""", re.VERBOSE)
+
+# First property of an object path (bare or quoted), then whatever follows it
+_PROPERTY_RE = re.compile(r"([A-Za-z_][A-Za-z0-9_]*|'(?:\\['\\]|[^'\\])*')(.*)", re.DOTALL)
+
+_ORDERABLE = {"int", "float", "string", "hex", "binary", "timestamp"}
+_PRIMITIVE = _ORDERABLE | {"bool"}
+
+
+def _tokenize(pattern):
+    tokens = []
+    pos = 0
+    while pos < len(pattern):
+        match = _TOKEN_RE.match(pattern, pos)
+        if not match:
+            raise ValueError(f"unexpected character {pattern[pos]!r} at {pos}")
+        kind = match.lastgroup
+        text = match.group()
+        pos = match.end()
+        if kind == "ws":
+            continue
+        if kind == "word" and text in ("true", "false"):
+            kind = "bool"
+        tokens.append((kind, text))
+    return tokens
+
+
+class _PatternParser:
+    def __init__(self, pattern):
+        self.tokens = _tokenize(pattern)
+        self.pos = 0
+        self.object_paths = set()
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, kind=None, text=None):
+        token_kind, token_text = self.peek()
+        if (kind and token_kind != kind) or (text and token_text != text):
+            want = text or kind
+            raise ValueError(f"expected {want} but found {token_text or 'end of pattern'!r}")
+        self.pos += 1
+        return token_text
+
+    def accept(self, text):
+        if self.peek()[1] == text:
+            self.pos += 1
+            return True
+        return False
+
+    def parse(self):
+        self.observation_expressions()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"unexpected {self.peek()[1]!r} after end of pattern")
+
+    def observation_expressions(self):
+        self.observation_or()
+        while self.accept("FOLLOWEDBY"):
+            self.observation_or()
+
+    def observation_or(self):
+        self.observation_and()
+        while self.accept("OR"):
+            self.observation_and()
+
+    def observation_and(self):
+        self.observation()
+        while self.accept("AND"):
+            self.observation()
+
+    def observation(self):
+        if self.accept("["):
+            self.comparison_or()
+            self.take(text="]")
+        else:
+            self.take(text="(")
+            self.observation_expressions()
+            self.take(text=")")
+        self.qualifiers()
+
+    def qualifiers(self):
+        while True:
+            if self.accept("START"):
+                self.take("timestamp")
+                self.take(text="STOP")
+                self.take("timestamp")
+            elif self.accept("WITHIN"):
+                if self.peek()[0] not in ("int", "float"):
+                    raise ValueError("WITHIN needs a number of seconds")
+                self.pos += 1
+                self.take(text="SECONDS")
+            elif self.accept("REPEATS"):
+                self.take("int")
+                self.take(text="TIMES")
+            else:
+                return
+
+    def comparison_or(self):
+        self.comparison_and()
+        while self.accept("OR"):
+            self.comparison_and()
+
+    def comparison_and(self):
+        self.property_test()
+        while self.accept("AND"):
+            self.property_test()
+
+    def object_path(self):
+        path = self.take("path")
+        self.object_paths.add(tuple(path.split(":", 1)))
+
+    def property_test(self):
+        if self.accept("("):
+            self.comparison_or()
+            self.take(text=")")
+            return
+        if self.accept("EXISTS"):
+            self.object_path()
+            return
+
+        self.object_path()
+        self.accept("NOT")
+        kind, text = self.peek()
+        if kind == "op":
+            self.pos += 1
+            allowed = _PRIMITIVE if text in ("=", "==", "!=", "<>") else _ORDERABLE
+            if self.peek()[0] not in allowed:
+                raise ValueError(f"bad literal after {text}: {self.peek()[1]!r}")
+            self.pos += 1
+        elif text == "IN":
+            self.pos += 1
+            self.take(text="(")
+            while True:
+                if self.peek()[0] not in _PRIMITIVE:
+                    raise ValueError(f"bad literal in set: {self.peek()[1]!r}")
+                self.pos += 1
+                if not self.accept(","):
+                    break
+            self.take(text=")")
+        elif text in ("LIKE", "MATCHES", "ISSUBSET", "ISSUPERSET"):
+            self.pos += 1
+            self.take("string")
+        else:
+            raise ValueError(f"expected a comparison operator but found {text or 'end of pattern'!r}")
+
+
+# Grammar check for a STIX pattern, memoized since models repeat pattern shapes
+@lru_cache(maxsize=100_000)
+def check_pattern(pattern):
+    """
+    Returns a tuple of problems with the pattern: grammar errors, object
+    types outside the STIX 2.1 observable list, or properties outside
+    OBJECT_PROPERTIES. () means the pattern is fine.
+    """
+    try:
+        parser = _PatternParser(pattern)
+        parser.parse()
+    except ValueError as e:
+        return (f"pattern: {e}",)
+    unknown = sorted({object_type for object_type, _ in parser.object_paths} - KNOWN_OBJECT_TYPES)
+    if unknown:
+        return (f"pattern: unknown object type {', '.join(unknown)}",)
+    uncovered = sorted(f"{object_type}:{path}" for object_type, path in parser.object_paths
+                       if not _known_property(object_type, path))
+    if uncovered:
+        return (f"pattern: property not covered by the fast path: {', '.join(uncovered)}",)
+    return ()
+
+
+def _known_property(object_type, path):
+    name, rest = _PROPERTY_RE.fullmatch(path).groups()
+    name = name.strip("'")
+    if name not in OBJECT_PROPERTIES[object_type]:
+        return False
+    if not rest:
+        return True
+    # file:hashes.MD5 or file:hashes.'SHA-256'; every other nested path is left to stix2validator
+    return name == "hashes" and rest[:1] == "." and rest[1:].strip("'") in HASH_ALGORITHMS
+
+
+def _check_timestamp(obj, field, problems, timestamp_re=_TIMESTAMP_RE):
+    value = obj.get(field)
+    match = timestamp_re.match(value) if isinstance(value, str) else None
+    if not match:
+        precision = " with millisecond precision" if timestamp_re is _MILLISECOND_TIMESTAMP_RE else ""
+        problems.append(f"{field}: not a STIX timestamp{precision}: {value!r}")
+        return None
+    try:
+        # (second, fraction) pairs order correctly whatever the fraction's length
+        return datetime(*map(int, match.groups()[:6])), float("0" + (match.group(7) or ""))
+    except ValueError:
+        problems.append(f"{field}: not a real date: {value!r}")
+        return None
+
+
+def fast_check(obj):
+    """
+    Checks one object against the Indicator subset. Returns a list of
+    problems; an empty list means the object needs no full validation.
+    Anything outside the subset (other types, extra fields) is reported
+    so that the full validator decides.
+    """
+    if not isinstance(obj, dict):
+        return ["not a JSON object"]
+    problems = []
+
+    if obj.get("type") != "indicator":
+        problems.append(f"type: not covered by the fast path: {obj.get('type')!r}")
+        return problems
+    extra = sorted(set(obj) - INDICATOR_FIELDS)
+    if extra:
+        problems.append(f"fields outside the Indicator subset: {', '.join(extra)}")
+    missing = sorted(REQUIRED_FIELDS - set(obj))
+    if missing:
+        problems.append(f"missing required fields: {', '.join(missing)}")
+
+    if obj.get("spec_version") != "2.1":
+        problems.append(f"spec_version: expected '2.1', got {obj.get('spec_version')!r}")
+    if not isinstance(obj.get("id"), str) or not _ID_RE.match(obj["id"]):
+        problems.append(f"id: not an indicator identifier: {obj.get('id')!r}")
+
+    created = _check_timestamp(obj, "created", problems, _MILLISECOND_TIMESTAMP_RE)
+    modified = _check_timestamp(obj, "modified", problems, _MILLISECOND_TIMESTAMP_RE)
+    _check_timestamp(obj, "valid_from", problems)
+    if created and modified and modified < created:
+        problems.append("modified: earlier than created")
+
+    if obj.get("pattern_type") != "stix":
+        problems.append(f"pattern_type: not covered by the fast path: {obj.get('pattern_type')!r}")
+    elif not isinstance(obj.get("pattern"), str):
+        problems.append("pattern: not a string")
+    else:
+        problems.extend(check_pattern(obj["pattern"]))
+
+    if "description" in obj and not isinstance(obj["description"], (str, type(None))):
+        problems.append("description: not a string")
+    return problems
+
+
+def _full_validate(obj):
+    # Imported lazily: the fast path itself does not need stix2validator
+    from stix2validator import validate_instance
+    return validate_instance(obj)
+
+
+def validate_objects(stix_file_path):
+    """
+    Fast-path validation of a bundle: each object is checked in-process and
+    only objects that fail the fast check go to stix2validator. Returns a
+    summary in the same shape as validate_format.validate_stix_file.
+    """
+    errors = []
+    warnings = []
+    fast_checked = 0
+    fully_validated = 0
+    is_valid = True
+
+    try:
+        for obj in iter_stix_objects(stix_file_path):
+            if not fast_check(obj):
+                fast_checked += 1
+                continue
+            fully_validated += 1
+            result = _full_validate(obj)
+            prefix = f"{result.object_id}: " if result.object_id else ""
+            errors.extend(prefix + str(error) for error in result.errors or [])
+            warnings.extend(prefix + str(warning) for warning in result.warnings or [])
+            is_valid = is_valid and result.is_valid
+    except StixStreamError as e:
+        errors.append(f"fatal: {e}")
+        is_valid = False
+
+    return {
+        "is_valid": is_valid,
+        "errors": errors,
+        "warnings": warnings,
+        "fast_checked": fast_checked,
+        "fully_validated": fully_validated,
+    }
+
+
+# Compare the fast path with stix2validator over every object in some bundles
+def measure_agreement(paths):
+    """
+    Runs both checkers on every object. A false accept is an object the fast
+    path passes but stix2validator rejects (must never happen); a false
+    reject only costs a trip through the full validator.
+    """
+    stats = {"objects": 0, "agree": 0, "false_accept": 0, "false_reject": 0,
+             "fast_seconds": 0.0, "full_seconds": 0.0, "false_accepts": []}
+    for path in paths:
+        try:
+            objects = list(iter_stix_objects(path))
+        except StixStreamError:
+            continue
+        for obj in objects:
+            start = time.perf_counter()
+            fast_ok = not fast_check(obj)
+            stats["fast_seconds"] += time.perf_counter() - start
+            start = time.perf_counter()
+            full_ok = _full_validate(obj).is_valid
+            stats["full_seconds"] += time.perf_counter() - start
+
+            stats["objects"] += 1
+            if fast_ok == full_ok:
+                stats["agree"] += 1
+            elif fast_ok:
+                stats["false_accept"] += 1
+                stats["false_accepts"].append(obj.get("id") if isinstance(obj, dict) else None)
+            else:
+                stats["false_reject"] += 1
+    return stats
+
+
+if __name__ == "__main__":
+    stix_dir = sys.argv[1]
+    paths = [os.path.join(stix_dir, f) for f in sorted(os.listdir(stix_dir)) if f.endswith(".json")]
+    stats = measure_agreement(paths)
+    total = stats["objects"] or 1
+    print(f"📊 {stats['objects']} objects: {stats['agree']} agree ({stats['agree'] / total * 100:.2f}%), "
+          f"{stats['false_accept']} false accepts, {stats['false_reject']} false rejects")
+    print(f"⏱️ fast path {stats['objects'] / (stats['fast_seconds'] or 1e-9):.0f} objects/s, "
+          f"stix2validator {stats['objects'] / (stats['full_seconds'] or 1e-9):.0f} objects/s")
+    for object_id in stats["false_accepts"]:
+        print(f"  - false accept: {object_id}")
@@ -1,31 +1,37 @@
 import json
-import uuid
-import re
 import os
 import time
-from datetime import datetime
-from openai import OpenAI
-from typing import List, Optional, Literal
-from pydantic import RootModel, BaseModel, Field
-
-# define schema
-
-class Indicator(BaseModel):
-    type: Literal["indicator"] = Field(..., description="Must be the literal 'indicator'")
-    spec_version: Literal["2.0", "2.1"] = Field(..., description="STIX specification version")
-    id: str = Field(..., description="STIX ID, leave blank in output")
-    created: str = Field(..., description="ISO 8601 timestamp, leave blank")
-    modified: str = Field(..., description="ISO 8601 timestamp, leave blank")
-    pattern: str = Field(..., description="Detection pattern (e.g., '[ipv4-addr:value = '1.1.1.1']')")
-    pattern_type: str = Field(..., description="Pattern type (e.g., 'stix', 'yara')")
-    valid_from: str = Field(..., description="Start time from which the indicator is valid (ISO 8601)")
-    description: Optional[str] = Field(None, description="Contextual description of the indicator")
-
-    class Config:
-        title = "STIX 2.1 Indicator (Required Fields Only, GPT-Compatible)"
-
-class IndicatorListWrapper(BaseModel):
-    items: list[Indicator]
+from functools import lru_cache
+from typing import Optional, Literal
+from response_cache import ResponseCache, make_cache_key
+from stream_decoder import StreamedReply
+from ioc_memo import IocMemo
+from prompt_packer import format_batch
+from stix_conversion import ConversionProvider, convert_with, stamp_indicator, utc_timestamp
+
+# define schema (built on first use, so loading this module does not import pydantic)
+@lru_cache(maxsize=None)
+def indicator_list_model():
+    from pydantic import BaseModel, Field
+
+    class Indicator(BaseModel):
+        type: Literal["indicator"] = Field(..., description="Must be the literal 'indicator'")
+        spec_version: Literal["2.0", "2.1"] = Field(..., description="STIX specification version")
+        id: str = Field(..., description="STIX ID, leave blank in output")
+        created: str = Field(..., description="ISO 8601 timestamp, leave blank")
+        modified: str = Field(..., description="ISO 8601 timestamp, leave blank")
+        pattern: str = Field(..., description="Detection pattern (e.g., '[ipv4-addr:value = '1.1.1.1']')")
+        pattern_type: str = Field(..., description="Pattern type (e.g., 'stix', 'yara')")
+        valid_from: str = Field(..., description="Start time from which the indicator is valid (ISO 8601)")
+        description: Optional[str] = Field(None, description="Contextual description of the indicator")
+
+        class Config:
+            title = "STIX 2.1 Indicator (Required Fields Only, GPT-Compatible)"
+
+    class IndicatorListWrapper(BaseModel):
+        items: list[Indicator]
+
+    return IndicatorListWrapper
 
 
 # Helper: Extract first valid JSON object or array
@@ -56,36 +62,15 @@ def batch_list(items, batch_size):
 
 # Add unique ID, date created, and date modified
 def append_fields(stix_bundle):
-    now = datetime.utcnow()
-    timestamp_with_ms = now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+    timestamp_with_ms = utc_timestamp()
 
     for object in stix_bundle["objects"]:
-        object["id"] = f"indicator--{uuid.uuid4()}"
-        object["created"] = timestamp_with_ms
-        object["modified"] = timestamp_with_ms
-        object["valid_from"] = timestamp_with_ms
+        stamp_indicator(object, timestamp_with_ms)
     return stix_bundle
 
-def extract_list_payload(obj):
-    """Returns the first list found in the top-level keys of a dict, or the object itself if it's a list."""
-    if isinstance(obj, list):
-        return obj
-    elif isinstance(obj, dict):
-        for v in obj.values():
-            if isinstance(v, list):
-                return v
-    return [] 
+model_name = "gpt-4o"
 
-# Function to send one batch to ChatGPT
-def generate_stix_for_batch(client, batch, batch_number):
-    prompt = json.dumps({"data": batch}, indent=2)
-    
-    response = client.beta.chat.completions.parse(
-        model="gpt-4o",
-        messages=[
-            {
-                "role": "system", 
-                "content": """
+system_prompt = """
                     You are a system that converts indicators of compromise (IOCs) from raw threat intelligence into STIX 2.1 Indicator objects.
 
                     Each input item may represent a URL, domain, IP address (IPv4 or IPv6), file hash (MD5, SHA1, SHA256), or other observable.
@@ -101,12 +86,15 @@ def generate_stix_for_batch(client, batch, batch_number):
                     Wrap the array of indicators inside a JSON object with key items.
 
                     """
-            },
-            {"role": "user", "content": prompt}
-        ],
-        response_format=IndicatorListWrapper
-    )
-    
+
+def build_messages(batch):
+    prompt = format_batch(batch)
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt}
+    ]
+
+def extract_response_content(response, batch_number):
     try:
         content = response.choices[0].message.content
     except (AttributeError, IndexError) as e:
@@ -117,56 +105,135 @@ def generate_stix_for_batch(client, batch, batch_number):
     print(f"✅ Processed batch {batch_number}")
     return content
 
-# Main function
-def convert_to_stix_via_chatgpt(input_file, output_file, api_key, batch_size=25):
-    with open(input_file, 'r') as f:
-        full_input = json.load(f)
-
-    data = extract_list_payload(full_input)
-    client = OpenAI(api_key=api_key)
-
-    all_indicators = []
-
-    for batch_num, batch in enumerate(batch_list(data, batch_size), start=1):
-        stix_text = generate_stix_for_batch(client, batch, batch_num)
-        json_text = json.loads(stix_text)
-
-        try:
-            parsed = json_text["items"]
-            
-            if not isinstance(parsed, list):
-                raise ValueError("Expected top-level JSON array of indicator objects.")
-            
-            all_indicators.extend(parsed)
-
-        except Exception as e:
-            print(f"⚠️ Failed to parse batch {batch_num}: {e}")
-            with open(f"failed_batch_{batch_num}.txt", "w") as err_file:
-                err_file.write(stix_text)
-            print(f"📝 Saved raw response to failed_batch_{batch_num}.txt")
-
-    # Build the final STIX bundle
-    stix_bundle = {
-        "type": "bundle",
-        "id": f"bundle--{uuid.uuid4()}",
-        "spec_version": "2.1",
-        "objects": all_indicators
-    }
-    append_fields(stix_bundle)
-
-    with open(output_file, 'w') as f:
-        json.dump(stix_bundle, f, indent=2)
-
-    print(f"Saved {len(all_indicators)} indicators to {output_file}")
-
-
-# Define input and output file
-input_file = [INPUT_FILENAME] #Replace with your input file
-api_key = [YOUR_API_KEY] # Replace with your API Key
-
-for i in range(1, 2):
-    filename = f"stix_output_{i:03}.json"
-    output_dir = [YOUR_OUTPUT_DIR]
-    output_file = os.path.join(output_dir, filename)
-    convert_to_stix_via_chatgpt(input_file, output_file, api_key)
-    time.sleep(1)
+def batch_cache_key(batch, model=None):
+    return make_cache_key("openai", model or model_name, system_prompt, indicator_list_model().model_json_schema(), batch)
+
+def record_usage(telemetry, batch_number, response):
+    usage = getattr(response, "usage", None)
+    if telemetry is not None and usage is not None:
+        telemetry.update(batch_number, prompt_tokens=usage.prompt_tokens or 0,
+                         completion_tokens=usage.completion_tokens or 0)
+
+# Function to send one batch to ChatGPT
+def generate_stix_for_batch(client, batch, batch_number, cache=None, telemetry=None, model=None):
+    response = client.beta.chat.completions.parse(
+        model=model or model_name,
+        messages=build_messages(batch),
+        response_format=indicator_list_model()
+    )
+    record_usage(telemetry, batch_number, response)
+    content = extract_response_content(response, batch_number)
+    if cache is not None:
+        cache.store(batch, content)
+    return content
+
+# Async variant used by the concurrent dispatch mode
+async def generate_stix_for_batch_async(client, batch, batch_number, cache=None, telemetry=None, model=None):
+    response = await client.beta.chat.completions.parse(
+        model=model or model_name,
+        messages=build_messages(batch),
+        response_format=indicator_list_model()
+    )
+    record_usage(telemetry, batch_number, response)
+    content = extract_response_content(response, batch_number)
+    if cache is not None:
+        cache.store(batch, content)
+    return content
+
+# Streaming variants: indicators are decoded as the reply arrives, and the
+# complete ones are kept if the reply is cut off
+def stream_stix_for_batch(client, batch, batch_number, cache=None, telemetry=None, model=None):
+    reply = StreamedReply(batch_number, telemetry)
+    try:
+        with client.beta.chat.completions.stream(
+            model=model or model_name,
+            messages=build_messages(batch),
+            response_format=indicator_list_model(),
+            stream_options={"include_usage": True}
+        ) as stream:
+            for event in stream:
+                if event.type == "content.delta":
+                    reply.add(event.delta)
+                elif event.type == "chunk":
+                    record_usage(telemetry, batch_number, event.chunk)
+    except Exception as e:
+        return reply.finish(e)
+    print(f"✅ Processed batch {batch_number}")
+    if reply.complete and cache is not None:
+        cache.store(batch, reply.text)
+    return reply.finish()
+
+async def stream_stix_for_batch_async(client, batch, batch_number, cache=None, telemetry=None, model=None):
+    reply = StreamedReply(batch_number, telemetry)
+    try:
+        async with client.beta.chat.completions.stream(
+            model=model or model_name,
+            messages=build_messages(batch),
+            response_format=indicator_list_model(),
+            stream_options={"include_usage": True}
+        ) as stream:
+            async for event in stream:
+                if event.type == "content.delta":
+                    reply.add(event.delta)
+                elif event.type == "chunk":
+                    record_usage(telemetry, batch_number, event.chunk)
+    except Exception as e:
+        return reply.finish(e)
+    print(f"✅ Processed batch {batch_number}")
+    if reply.complete and cache is not None:
+        cache.store(batch, reply.text)
+    return reply.finish()
+
+# The SDK is imported on first use, so a dry run or an evaluation never pays for it
+def make_client(api_key, base_url=None):
+    from openai import OpenAI
+    return OpenAI(api_key=api_key, base_url=base_url)
+
+def make_async_client(api_key, base_url=None):
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=api_key, base_url=base_url)
+
+def decode_reply(text):
+    return json.loads(text)["items"]
+
+PROVIDER = ConversionProvider(
+    "openai", model_name, system_prompt, batch_cache_key, decode_reply, make_client, make_async_client,
+    generate_stix_for_batch, generate_stix_for_batch_async, stream_stix_for_batch, stream_stix_for_batch_async,
+)
+
+# Main function; the options are those of stix_conversion.convert_with
+def convert_to_stix_via_chatgpt(input_file, output_file, api_key, **options):
+    return convert_with(PROVIDER, input_file, output_file, api_key, **options)
+
+
+if __name__ == "__main__":
+    # Define input and output file
+    input_file = [INPUT_FILENAME] #Replace with your input file
+    api_key = [YOUR_API_KEY] # Replace with your API Key
+    concurrency = 1 # Batches in flight at once; above 1 uses the async dispatcher
+    cache_dir = None # Set to a directory to reuse identical model responses; leave unset for repeated trials
+    refresh_cache = False # True re-requests every batch and overwrites the cached responses
+    resume = False # True skips batches already recorded in <output_file>.journal by a crashed run
+    stream = False # True decodes indicators as the reply streams in and keeps the complete ones from cut-off replies
+    repair_rounds = 0 # Set above 0 to re-request items no indicator covers; changes what is being measured, so off by default
+    memo_file = None # Set to a JSON path to reuse each IOC's last validated indicator across runs
+    memo_ttl_days = 30 # Memoized indicators older than this are converted again
+    memo_refresh_share = 0.0 # Share of memoized IOCs sent to the model anyway, to keep measuring accuracy
+    shard_bytes = None # Set (e.g. 50_000_000) to split each bundle into shards of at most this size, listed in a .manifest.json
+    telemetry_file = None # Set to a .jsonl path to log per-batch timings and tokens; a .prom metrics file is written beside it
+    pack_prompts = False # True sends only the IOC and context fields, as compact JSON; changes the prompt, so off by default
+    size_by_tokens = False # True also caps each batch by its estimated tokens against the model's context and output limits
+    adaptive = None # "throughput" or "cost" resizes batches (up to batch_size) during the run from omissions and latency; changes what is being measured
+
+    cache = ResponseCache(cache_dir, refresh=refresh_cache) if cache_dir else None
+    memo = IocMemo(memo_file, memo_ttl_days * 24 * 3600, memo_refresh_share) if memo_file else None
+
+    for i in range(1, 2):
+        filename = f"stix_output_{i:03}.json"
+        output_dir = [YOUR_OUTPUT_DIR]
+        output_file = os.path.join(output_dir, filename)
+        convert_to_stix_via_chatgpt(input_file, output_file, api_key, concurrency=concurrency, cache=cache, resume=resume,
+                                    telemetry_file=telemetry_file, stream=stream,
+                                    shard_bytes=shard_bytes, repair_rounds=repair_rounds, memo=memo,
+                                    pack_prompts=pack_prompts, size_by_tokens=size_by_tokens, adaptive=adaptive)
+        time.sleep(1)
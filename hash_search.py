@@ -1,9 +1,10 @@
 import os
 import json
-
-hash_source_file = "hash_list.json"
-stix_folder = "./stix_output_gpt_hash"
-summary_output_file = "hash_match_summary_gpt.json"
+from ioc_matcher import IocMatcher
+from stix_patterns import IocIndex, MD5_PATHS
+from ioc_store import exact_index, distinct_positions
+from eval_pool import evaluate_files, evaluator_parser, evaluator_options
+from stix_reader import iter_stix_objects, StixStreamError
 
 # Step 1: Extract list of hashes from the original input file
 def extract_hash_list(input_file):
@@ -12,99 +13,115 @@ def extract_hash_list(input_file):
     return [entry["md5_hash"] for entry in data.get("data", []) if "md5_hash" in entry]
 
 # Step 2: Check hashes in a single STIX file
-def find_hashes_in_stix(hash_list, stix_file_path):
-    with open(stix_file_path, 'r') as f:
-        try:
-            stix_data = json.load(f)
-        except json.JSONDecodeError:
-            print(f"⚠️ Could not parse JSON in {stix_file_path}")
-            return 0
-
+def find_hashes_in_stix(hash_list, stix_file_path, exact=True):
+    matcher = IocIndex(hash_list, MD5_PATHS) if exact else IocMatcher(hash_list)
     found_hashes = set()
-    for obj in stix_data.get("objects", []):
-        if obj.get("type") == "indicator":
-            pattern = obj.get("pattern", "")
-            for hash in hash_list:
-                if hash in pattern:
-                    found_hashes.add(hash)
+    try:
+        for obj in iter_stix_objects(stix_file_path):
+            if obj.get("type") == "indicator":
+                pattern = obj.get("pattern", "")
+                for idx in matcher.find_all(pattern):
+                    found_hashes.add(hash_list[idx])
+    except StixStreamError as e:
+        print(f"⚠️ Could not parse JSON in {stix_file_path}: {e}")
 
     return len(found_hashes)
 
-# Step 3: Process all STIX files in a directory
-def evaluate_stix_directory(hash_list, stix_dir, output_file):
-    results = []
+# Step 3: Score a single STIX file against the hash index
+def score_stix_file(matcher, filepath):
+    hash_list = matcher.iocs
     total_hashes = len(hash_list)
-
-    for filename in os.listdir(stix_dir):
-        if filename.endswith(".json"):
-            filepath = os.path.join(stix_dir, filename)
-            match_hashes = set()
-
-            # Get matched hashes
-            with open(filepath, 'r') as f:
-                try:
-                    stix_data = json.load(f)
-                except json.JSONDecodeError:
-                    print(f"⚠️ Could not parse JSON in {filepath}")
-                    continue
-
-            unexpected_patterns = []
-            seen_patterns = set()
-            duplicate_patterns = []
-            
-            for obj in stix_data.get("objects", []):
-                if obj.get("type") == "indicator":
-                    pattern = obj.get("pattern", "")
-
-                    # check for duplicates
-                    if pattern in seen_patterns:
-                        print(f"♻️ Duplicate pattern in {filename}: {pattern}")
-                        duplicate_patterns.append(pattern)
-                    else:
-                        seen_patterns.add(pattern)
-
-                    found = False
-                    for h in hash_list:
-                        if h in pattern:
-                            match_hashes.add(h)
-                            found = True
-                            break
-
-                    if not found:
-                        print(f"⚠️ Unexpected pattern in {filename}: {pattern}")
-                        unexpected_patterns.append(pattern)
-
-            match_count = len(match_hashes)
-            missed_hashes = list(set(hash_list) - match_hashes)
-
-            percentage = (match_count / total_hashes) * 100 if total_hashes else 0
-
-            results.append({
-                "file": filename,
-                "matched_hashes": match_count,
-                "total_hashes": total_hashes,
-                "percentage": round(percentage, 2),
-                "missing_hashes": missed_hashes,
-                "extra_patterns": unexpected_patterns,
-                "duplicate_patterns": duplicate_patterns 
-            })
-
-            print(f"✅ {filename}: {match_count}/{total_hashes} Hashes matched ({round(percentage, 2)}%)")
-            if missed_hashes:
-                print(f"❌ Missing {len(missed_hashes)} hashes in {filename}:")
-                for missing in missed_hashes:
-                    print(f"  - {missing}")
-
-    # Save summary results
-    with open(output_file, 'w') as out:
-        json.dump(results, out, indent=2)
-    print(f"\n📄 Saved summary with missing hashes to {output_file}")
-
-
-    # Save summary results
-    with open(output_file, 'w') as out:
-        json.dump(results, out, indent=2)
-    print(f"\n📄 Saved summary to {output_file}")
-
-hash_list = extract_hash_list(hash_source_file)
-evaluate_stix_directory(hash_list, stix_folder, summary_output_file)
\ No newline at end of file
+    matched_positions = set()
+    unexpected_patterns = []
+    seen_patterns = set()
+    duplicate_patterns = []
+
+    # Score objects as they stream in; a damaged tail keeps what was recovered
+    parse_error = None
+    try:
+        for obj in iter_stix_objects(filepath):
+            if obj.get("type") == "indicator":
+                pattern = obj.get("pattern", "")
+
+                # check for duplicates
+                if pattern in seen_patterns:
+                    duplicate_patterns.append(pattern)
+                else:
+                    seen_patterns.add(pattern)
+
+                # Keep the first hit in list order, as the old per-hash loop did
+                first = matcher.find_first(pattern)
+                if first is not None:
+                    matched_positions.add(first)
+                else:
+                    unexpected_patterns.append(pattern)
+    except StixStreamError as e:
+        parse_error = str(e)
+
+    # find_first always returns a hash's first position, so duplicates are counted once
+    match_count = len(matched_positions)
+    missed_hashes = [hash_list[idx] for idx in distinct_positions(matcher) if idx not in matched_positions]
+
+    percentage = (match_count / total_hashes) * 100 if total_hashes else 0
+
+    result = {
+        "file": os.path.basename(filepath),
+        "matched_hashes": match_count,
+        "total_hashes": total_hashes,
+        "percentage": round(percentage, 2),
+        "missing_hashes": missed_hashes,
+        "extra_patterns": unexpected_patterns,
+        "duplicate_patterns": duplicate_patterns
+    }
+    if parse_error:
+        result["parse_error"] = parse_error
+    return result
+
+# Step 4: Print the per-file report
+def print_file_result(result):
+    filename = result["file"]
+    if "parse_error" in result:
+        print(f"⚠️ Could not parse all JSON in {filename}: {result['parse_error']}")
+    for pattern in result["duplicate_patterns"]:
+        print(f"♻️ Duplicate pattern in {filename}: {pattern}")
+    for pattern in result["extra_patterns"]:
+        print(f"⚠️ Unexpected pattern in {filename}: {pattern}")
+
+    print(f"✅ {filename}: {result['matched_hashes']}/{result['total_hashes']} Hashes matched ({result['percentage']}%)")
+    if result["missing_hashes"]:
+        print(f"❌ Missing {len(result['missing_hashes'])} hashes in {filename}:")
+        for missing in result["missing_hashes"]:
+            print(f"  - {missing}")
+
+# Step 4b: What the shared evaluation loop records about one scored file
+def describe_file(matcher, scored):
+    result = scored
+    return {"result": result, "matched": result["matched_hashes"], "total": result["total_hashes"],
+            "omitted": result["missing_hashes"],
+            "repeated": [matcher.iocs[idx] for idx in map(matcher.find_first, result["duplicate_patterns"])
+                         if idx is not None],
+            "repeated_positions": [idx for pattern in result["duplicate_patterns"] for idx in matcher.find_all(pattern)],
+            "unexpected": result["extra_patterns"]}
+
+# Step 5: Process all STIX files in a directory
+def evaluate_stix_directory(hash_list, stix_dir, output_file, exact=True, workers=1, store_file=None, canonical=False,
+                            matrix_file=None, matrix_group=None,
+                            db_file=None, model=None, compact=False):
+    matcher = exact_index(hash_list, MD5_PATHS, canonical, compact) if exact else IocMatcher(hash_list)
+    del hash_list  # the matcher keeps the IOCs; a compact one only saves memory if it holds the sole copy
+    return evaluate_files("hash_search", "md5", matcher, stix_dir, output_file, score_stix_file, describe_file,
+                          print_file_result,
+                          exact, workers, store_file, canonical, matrix_file, matrix_group, db_file, model,
+                          saved_label="📄 Saved summary with missing hashes")
+
+
+if __name__ == "__main__":
+    hash_source_file = "hash_list.json"
+    stix_folder = "./stix_output_gpt_hash"
+    summary_output_file = "hash_match_summary_gpt.json"
+    result_store_file = "hash_match_store_gpt.json"  # per-file results reused on the next run
+    results_db_file = "stix_results.sqlite"  # every run is appended here (shared by all evaluators); None to skip
+
+    args = evaluator_parser("Score STIX output files against the source hash list").parse_args()
+    evaluate_stix_directory(extract_hash_list(hash_source_file), stix_folder, None if args.no_json else summary_output_file,
+                            **evaluator_options(args, result_store_file, results_db_file))
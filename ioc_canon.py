@@ -0,0 +1,95 @@
+import re
+import socket
+from functools import lru_cache
+from urllib.parse import urlsplit, urlunsplit, quote
+
+_HEX_HASH = re.compile(r"[0-9a-fA-F]{32}|[0-9a-fA-F]{40}|[0-9a-fA-F]{64}")
+_ESCAPE = re.compile(r"%([0-9a-fA-F]{2})")
+_UNRESERVED = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-._~")
+_DEFAULT_PORTS = {"http": 80, "https": 443, "ftp": 21}
+# Characters left as they are when percent-encoding a path or query (RFC 3986 pchar, plus "/" and "?")
+_SAFE = "/?:@!$&'()*+,;=-._~%"
+_MAPPED_PREFIX = b"\x00" * 10 + b"\xff\xff"
+
+
+def canonical_ip(value):
+    """Canonical text of an IP address (IPv4-mapped IPv6 becomes IPv4), or None if it is not one."""
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            packed = socket.inet_pton(family, value)
+        except (OSError, ValueError):
+            continue
+        if family == socket.AF_INET6 and packed.startswith(_MAPPED_PREFIX):
+            return socket.inet_ntop(socket.AF_INET, packed[12:])
+        return socket.inet_ntop(family, packed)
+    return None
+
+
+def _normalise_escapes(text):
+    # Decode escaped unreserved characters, upper-case the hex of the rest, and escape what needs it
+    text = _ESCAPE.sub(lambda m: chr(int(m.group(1), 16)) if chr(int(m.group(1), 16)) in _UNRESERVED
+                       else f"%{m.group(1).upper()}", text)
+    return quote(text, safe=_SAFE)
+
+
+def _remove_dot_segments(path):
+    # RFC 3986 section 5.2.4, by segment
+    output = []
+    for segment in path.split("/"):
+        if segment == "..":
+            if len(output) > 1:
+                output.pop()
+        elif segment != ".":
+            output.append(segment)
+    if path.endswith(("/.", "/..")):
+        output.append("")
+    return "/".join(output)
+
+
+def canonical_url(value):
+    """
+    RFC 3986 normalisation (case, percent-encoding, dot segments, default
+    port, empty path) plus one equivalence models often introduce: a
+    trailing slash on the path is dropped. None if value has no scheme.
+    """
+    try:
+        parts = urlsplit(value)
+        port = parts.port
+    except ValueError:
+        return None
+    if not parts.scheme or not parts.netloc:
+        return None
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").rstrip(".")
+    if ":" in host:
+        host = f"[{canonical_ip(host) or host}]"
+    netloc = host
+    if port is not None and port != _DEFAULT_PORTS.get(scheme):
+        netloc = f"{netloc}:{port}"
+    if "@" in parts.netloc:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+    path = _remove_dot_segments(_normalise_escapes(parts.path)).rstrip("/")
+    return urlunsplit((scheme, netloc, path or "", _normalise_escapes(parts.query), parts.fragment))
+
+
+def canonicalise(value):
+    """
+    Canonical form of one IOC value, judged by its shape: IPs through their
+    packed form, hex digests lower-cased, URLs normalised. Anything else is
+    only stripped of surrounding whitespace.
+    """
+    value = value.strip()
+    ip = canonical_ip(value)
+    if ip is not None:
+        return ip
+    if _HEX_HASH.fullmatch(value):
+        return value.lower()
+    if "://" in value:
+        return canonical_url(value) or value
+    return value
+
+
+# Pattern values repeat across files and runs, so the pattern side is memoised
+@lru_cache(maxsize=100_000)
+def canonical_ioc(value):
+    return canonicalise(value)
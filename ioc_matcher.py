@@ -0,0 +1,71 @@
+from collections import deque
+
+
+# Aho-Corasick automaton over the source IOC list.
+# Built once per list, then each indicator pattern is scanned in a single pass
+# instead of testing `ioc in pattern` for every IOC.
+class IocMatcher:
+    def __init__(self, ioc_list):
+        self.iocs = list(ioc_list)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        self._link = [0]
+
+        # Build the trie, remembering which IOC indices end at each node
+        for idx, ioc in enumerate(self.iocs):
+            if not ioc:
+                continue
+            node = 0
+            for char in ioc:
+                nxt = self._goto[node].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                    self._link.append(0)
+                node = nxt
+            self._out[node].append(idx)
+
+        # Breadth-first pass to fill in failure links and output links
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[child] = target
+                # Output link jumps straight to the next shorter suffix that is an IOC
+                self._link[child] = target if self._out[target] else self._link[target]
+
+    def find_all(self, text):
+        """
+        Returns the set of indices (into the IOC list) of every IOC that occurs in text.
+        """
+        goto, fail, out, link = self._goto, self._fail, self._out, self._link
+        found = set()
+        node = 0
+
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            hit = node if out[node] else link[node]
+            while hit:
+                found.update(out[hit])
+                hit = link[hit]
+
+        return found
+
+    def find_first(self, text):
+        """
+        Returns the index of the earliest IOC in list order that occurs in text, or None.
+        """
+        found = self.find_all(text)
+        return min(found) if found else None
@@ -0,0 +1,131 @@
+import hashlib
+import ipaddress
+import json
+import os
+import random
+import time
+from stix_patterns import IocIndex, parse_pattern_values
+from fast_validate import check_pattern
+from batch_repair import SOURCE_FIELDS
+
+DEFAULT_TTL_SECONDS = 30 * 24 * 3600
+
+# Fields stamped per run; a memoized indicator is stored without them
+_STAMPED_FIELDS = ("id", "created", "modified", "valid_from")
+
+
+def normalise_value(field, value):
+    value = value.strip()
+    if field == "ipAddress":
+        try:
+            return ipaddress.ip_address(value).compressed
+        except ValueError:
+            return value
+    if field.endswith("_hash"):
+        return value.lower()
+    return value
+
+
+def normalised_field(item, field):
+    value = item.get(field) if isinstance(item, dict) else None
+    return normalise_value(field, value) if isinstance(value, str) and value.strip() else None
+
+
+def item_key(item, model):
+    """Memo key for a source item: the model plus its first IOC field, normalised. None if it has no IOC."""
+    if not isinstance(item, dict):
+        return None
+    for field in SOURCE_FIELDS:
+        value = item.get(field)
+        if isinstance(value, str) and value.strip():
+            return f"{model}|{field}|{normalise_value(field, value)}"
+    return None
+
+
+def refresh_draw(seed, key):
+    """Where a memo key falls in [0, 1) for a seed; the same seed always refreshes the same keys."""
+    digest = hashlib.sha256(f"{seed}|{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64
+
+
+# Last validated indicator per IOC and model, shared across runs and input files
+class IocMemo:
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, refresh_share=0.0, seed=None):
+        """
+        Entries older than ttl_seconds are ignored. refresh_share is the
+        fraction of memoized items sent to the model anyway, so each run still
+        measures the model on a sample of known IOCs. The sample is drawn from
+        each key's hash under a per-run seed, so a resumed run that reuses its
+        seed sends the same items; a fixed seed here makes every run use it.
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.refresh_share = refresh_share
+        self.seed = seed
+        self.entries = {}
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    self.entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                print(f"⚠️ {path} is unreadable, starting an empty IOC memo")
+
+    def run_seed(self):
+        """Seed for a new run's refresh sample."""
+        return self.seed if self.seed is not None else random.getrandbits(63)
+
+    def split(self, items, model, seed=None):
+        """
+        Returns (memoized indicators, items to send, how many of those were
+        refreshed). Items without a fresh entry, and a refresh_share sample
+        of those with one, go to the model.
+        """
+        now = time.time()
+        seed = seed if seed is not None else self.run_seed()
+        indicators = []
+        to_send = []
+        refreshed = 0
+        for item in items:
+            key = item_key(item, model)
+            entry = self.entries.get(key)
+            if entry is None or now - entry["stored_at"] > self.ttl_seconds:
+                to_send.append(item)
+            elif self.refresh_share and refresh_draw(seed, key) < self.refresh_share:
+                refreshed += 1
+                to_send.append(item)
+            else:
+                indicators.append(dict(entry["indicator"]))
+        return indicators, to_send, refreshed
+
+    def learn(self, items, indicators, model):
+        """
+        Stores, for each item, an indicator whose pattern parses and covers
+        the item's IOC. Returns the number of items learned. Both the items
+        and the pattern values are normalised as item_key does, so an
+        indicator that differs from its item only in case or IP notation
+        is still learned.
+        """
+        indexes = {field: (IocIndex([normalised_field(item, field) for item in items], paths), field)
+                   for field, paths in SOURCE_FIELDS.items()}
+        now = time.time()
+        learned = set()
+        for obj in indicators:
+            pattern = obj.get("pattern") if isinstance(obj, dict) else None
+            if not isinstance(pattern, str) or check_pattern(pattern):
+                continue
+            stored = {k: v for k, v in obj.items() if k not in _STAMPED_FIELDS}
+            values = parse_pattern_values(pattern)
+            for index, field in indexes.values():
+                for position in index.find_values([(path, normalise_value(field, value)) for path, value in values]):
+                    key = item_key(items[position], model)
+                    if key is not None and position not in learned:
+                        learned.add(position)
+                        self.entries[key] = {"indicator": stored, "stored_at": now}
+        return len(learned)
+
+    def flush(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
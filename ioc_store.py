@@ -0,0 +1,230 @@
+import bisect
+import re
+import socket
+from array import array
+from stix_patterns import IocIndex, parse_pattern_values
+from ioc_canon import canonicalise, canonical_ioc
+
+_HEX = re.compile(r"[0-9a-f]+")
+_HASH_LENGTHS = (32, 40, 64)
+
+
+def count_vector(size):
+    """A zeroed vector of per-IOC counters, four bytes each."""
+    return array("I", bytes(4 * size))
+
+
+def exact_index(ioc_list, object_paths, canonical=False, compact=False):
+    """
+    IocIndex, or with compact=True a CompactIocIndex. The compact one is
+    slower to build and to query, and only saves memory once the caller
+    drops its own copy of ioc_list.
+    """
+    if compact:
+        return CompactIocIndex(ioc_list, object_paths, canonical)
+    return IocIndex(ioc_list, object_paths, canonical)
+
+
+def distinct_positions(index):
+    """Yields the position of the first occurrence of each IOC, in list order."""
+    repeats = getattr(index, "repeat_positions", None)
+    if repeats is None:
+        first = {}
+        for idx, ioc in enumerate(index.iocs):
+            first.setdefault(ioc, idx)
+        yield from first.values()
+        return
+    for idx in range(len(index.iocs)):
+        if idx not in repeats:
+            yield idx
+
+
+# Fixed-width keys (IPv4 as 4 bytes, IPv6 as 16, hashes as their digest) packed into one buffer
+class _FixedTable:
+    def __init__(self, width, family=None):
+        self.width = width
+        self.family = family  # address family for IPs; None for hex digests
+        self.keys = bytearray()
+        self.positions = array("I")
+        self.order = array("I")
+
+    def append(self, key, position):
+        self.keys += key
+        self.positions.append(position)
+
+    def key(self, slot):
+        return bytes(self.keys[slot * self.width:(slot + 1) * self.width])
+
+    def value(self, slot):
+        key = self.key(slot)
+        return socket.inet_ntop(self.family, key) if self.family else key.hex()
+
+    def __len__(self):
+        return len(self.positions)
+
+
+# Anything else (URLs, values that would not round-trip) as UTF-8 in one buffer plus offsets
+class _TextTable:
+    def __init__(self):
+        self.keys = bytearray()
+        self.offsets = array("Q", [0])
+        self.positions = array("I")
+        self.order = array("I")
+
+    def append(self, key, position):
+        self.keys += key
+        self.offsets.append(len(self.keys))
+        self.positions.append(position)
+
+    def key(self, slot):
+        return bytes(self.keys[self.offsets[slot]:self.offsets[slot + 1]])
+
+    def value(self, slot):
+        return self.key(slot).decode("utf-8")
+
+    def __len__(self):
+        return len(self.positions)
+
+
+# The table's keys in sorted order, as a sequence bisect can search
+class _SortedKeys:
+    def __init__(self, table):
+        self.table = table
+
+    def __len__(self):
+        return len(self.table.order)
+
+    def __getitem__(self, i):
+        return self.table.key(self.table.order[i])
+
+
+def _new_tables():
+    return [
+        _FixedTable(4, socket.AF_INET),
+        _FixedTable(16, socket.AF_INET6),
+        _FixedTable(16),
+        _FixedTable(20),
+        _FixedTable(32),
+        _TextTable(),
+    ]
+
+
+def _encode(value):
+    """
+    Returns (table number, key) for a value. A value is packed only if it
+    decodes back to exactly the same string, so lookups stay exact-match;
+    anything else (upper-case hashes, zero-padded IPs, URLs) is kept as text.
+    """
+    for kind, family in ((0, socket.AF_INET), (1, socket.AF_INET6)):
+        try:
+            packed = socket.inet_pton(family, value)
+        except (OSError, ValueError):
+            continue
+        if socket.inet_ntop(family, packed) == value:
+            return kind, packed
+    if len(value) in _HASH_LENGTHS and _HEX.fullmatch(value):
+        return 2 + _HASH_LENGTHS.index(len(value)), bytes.fromhex(value)
+    return 5, value.encode("utf-8")
+
+
+# Exact-value index that keeps each IOC packed into flat arrays instead of as a Python string
+class CompactIocIndex:
+    """
+    Drop-in replacement for IocIndex (find_all/find_values/find_first and an
+    indexable `iocs`) for source lists with millions of entries. IPs are
+    stored as packed addresses and hashes as raw digests, in sorted arrays
+    searched by bisect, so an IOC costs tens of bytes rather than hundreds
+    and the index pickles cheaply into pool workers.
+
+    With canonical=True both sides are canonicalised (see ioc_canon), so
+    an IOC the model rewrote, e.g. an expanded IPv6 address, an upper-case
+    hash or a URL with a trailing slash, still matches. The source is
+    canonicalised once here; `iocs` keeps returning the original strings.
+    """
+
+    def __init__(self, ioc_list, object_paths, canonical=False):
+        self.object_paths = frozenset(object_paths)
+        self.canonical = canonical
+        self.tables = _new_tables()
+        self.kinds = array("B")
+        self.slots = array("I")
+        self.originals = {}  # source strings that differ from their canonical form
+        for position, ioc in enumerate(ioc_list):
+            value = canonicalise(ioc) if canonical else ioc
+            if value != ioc:
+                self.originals[position] = ioc
+            kind, key = _encode(value)
+            table = self.tables[kind]
+            self.kinds.append(kind)
+            self.slots.append(len(table))
+            table.append(key, position)
+
+        repeats = set()
+        for table in self.tables:
+            # Stable sort, so equal keys stay in list order and the first is the first occurrence
+            table.order = array("I", sorted(range(len(table)), key=table.key))
+            previous = None
+            for slot in table.order:
+                key = table.key(slot)
+                if key == previous:
+                    repeats.add(table.positions[slot])
+                previous = key
+        self.repeat_positions = frozenset(repeats)
+        self.iocs = _IocView(self)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def value_at(self, position):
+        if position in self.originals:
+            return self.originals[position]
+        return self.tables[self.kinds[position]].value(self.slots[position])
+
+    def positions_of(self, value):
+        if self.canonical:
+            value = canonical_ioc(value)
+        kind, key = _encode(value)
+        table = self.tables[kind]
+        keys = _SortedKeys(table)
+        start = bisect.bisect_left(keys, key)
+        end = start
+        while end < len(keys) and keys[end] == key:
+            end += 1
+        return [table.positions[table.order[i]] for i in range(start, end)]
+
+    def find_all(self, pattern):
+        return self.find_values(parse_pattern_values(pattern))
+
+    def find_values(self, values):
+        """Same as find_all, for (object_path, value) pairs that are already parsed."""
+        found = set()
+        for path, value in values:
+            if path in self.object_paths:
+                found.update(self.positions_of(value))
+        return found
+
+    def find_first(self, pattern):
+        found = self.find_all(pattern)
+        return min(found) if found else None
+
+
+# Read-only list view of the IOCs in their original order, decoded on access
+class _IocView:
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self.index.value_at(i) for i in range(*position.indices(len(self)))]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("IOC position out of range")
+        return self.index.value_at(position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield self.index.value_at(position)
@@ -0,0 +1,317 @@
+import os
+import json
+import math
+import time
+import random
+import argparse
+import tempfile
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Source record field -> STIX pattern the mock "model" writes for it, in order of preference
+IOC_FIELDS = [
+    ("ipAddress", lambda v: f"[{'ipv6-addr' if ':' in v else 'ipv4-addr'}:value = '{v}']"),
+    ("url", lambda v: f"[url:value = '{v}']"),
+    ("md5_hash", lambda v: f"[file:hashes.MD5 = '{v}']"),
+    ("sha1_hash", lambda v: f"[file:hashes.'SHA-1' = '{v}']"),
+    ("sha256_hash", lambda v: f"[file:hashes.'SHA-256' = '{v}']"),
+]
+
+
+# How the mock provider misbehaves; every rate is a per-request probability
+class MockBehaviour:
+    def __init__(self, latency="lognormal", latency_mean=0.5, latency_sigma=0.5, per_item_latency=0.0,
+                 throttle_rate=0.0, retry_after=1, truncate_rate=0.0, fence_rate=0.0, omission_rate=0.0, seed=0,
+                 chunk_chars=64, chunk_delay=0.0):
+        """
+        latency is "fixed", "uniform" (0 to 2x the mean) or "lognormal" (median
+        latency_mean, spread latency_sigma); per_item_latency is added for each
+        item in the batch. Throttled requests get a 429 with Retry-After. Each
+        batch item is dropped from the reply with probability omission_rate.
+        Streamed replies are sent chunk_chars at a time, chunk_delay apart,
+        after the latency above has passed.
+        """
+        self.latency = latency
+        self.latency_mean = latency_mean
+        self.latency_sigma = latency_sigma
+        self.per_item_latency = per_item_latency
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.truncate_rate = truncate_rate
+        self.fence_rate = fence_rate
+        self.omission_rate = omission_rate
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "throttled": 0, "truncated": 0, "fenced": 0, "items": 0, "omitted": 0}
+
+    def count(self, key, amount=1):
+        with self.lock:
+            self.stats[key] += amount
+
+    def chance(self, rate):
+        with self.lock:
+            return self.rng.random() < rate
+
+    def delay(self, items):
+        with self.lock:
+            if self.latency == "fixed":
+                base = self.latency_mean
+            elif self.latency == "uniform":
+                base = self.rng.uniform(0, 2 * self.latency_mean)
+            else:
+                base = self.latency_mean * math.exp(self.rng.gauss(0, self.latency_sigma))
+        return base + self.per_item_latency * items
+
+
+def find_batch(texts):
+    """Finds the {"data": [...]} prompt among the request's text parts."""
+    for text in reversed(texts):
+        try:
+            prompt = json.loads(text)
+        except (TypeError, ValueError):
+            continue
+        if isinstance(prompt, dict) and isinstance(prompt.get("data"), list):
+            return prompt["data"]
+    return []
+
+def indicator_for(record):
+    for field, pattern in IOC_FIELDS:
+        value = record.get(field) if isinstance(record, dict) else None
+        if value:
+            return {
+                "type": "indicator",
+                "spec_version": "2.1",
+                "id": "",
+                "created": "",
+                "modified": "",
+                "pattern": pattern(value),
+                "pattern_type": "stix",
+                "valid_from": "",
+                "description": f"Indicator for {value}",
+            }
+    return None
+
+# Turn one batch into the model's reply text, applying the configured faults
+def mock_completion(behaviour, batch, wrap_items):
+    """Returns (text, truncated)."""
+    indicators = []
+    for record in batch:
+        indicator = indicator_for(record)
+        if indicator is None:
+            continue
+        if behaviour.chance(behaviour.omission_rate):
+            behaviour.count("omitted")
+            continue
+        indicators.append(indicator)
+    behaviour.count("items", len(batch))
+
+    text = json.dumps({"items": indicators} if wrap_items else indicators, indent=2)
+    if behaviour.chance(behaviour.fence_rate):
+        behaviour.count("fenced")
+        text = f"```json\n{text}\n```"
+    truncated = behaviour.chance(behaviour.truncate_rate)
+    if truncated:
+        behaviour.count("truncated")
+        text = text[:len(text) // 2]
+    return text, truncated
+
+
+class MockProviderHandler(BaseHTTPRequestHandler):
+    behaviour = None  # set per server by start_mock_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        payload = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_events(self, events):
+        # Server-sent events, as both APIs use for streamed replies
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for i, event in enumerate(events):
+            if i and self.behaviour.chunk_delay:
+                time.sleep(self.behaviour.chunk_delay)
+            data = event if isinstance(event, str) else json.dumps(event)
+            self.wfile.write(f"data: {data}\n\n".encode("utf-8"))
+            self.wfile.flush()
+        self.close_connection = True
+
+    def chunks(self, text):
+        size = max(1, self.behaviour.chunk_chars)
+        return [text[i:i + size] for i in range(0, len(text), size)] or [""]
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            return self.send_json(400, {"error": {"code": 400, "message": "Request body is not JSON"}})
+
+        path = self.path.split("?", 1)[0]
+        if path.endswith("/chat/completions"):
+            texts = [m.get("content") for m in request.get("messages", []) if isinstance(m, dict)]
+            handler = self.openai_response
+        elif path.endswith(":generateContent") or path.endswith(":streamGenerateContent"):
+            texts = [part.get("text") for content in request.get("contents", []) for part in content.get("parts", [])]
+            handler = self.gemini_response
+        else:
+            return self.send_json(404, {"error": {"code": 404, "message": f"No mock for {path}"}})
+
+        behaviour = self.behaviour
+        behaviour.count("requests")
+        batch = find_batch(texts)
+
+        if behaviour.chance(behaviour.throttle_rate):
+            behaviour.count("throttled")
+            return self.send_json(429, {"error": {
+                "code": 429,
+                "message": "Rate limit reached (mock)",
+                "status": "RESOURCE_EXHAUSTED",
+                "type": "rate_limit_exceeded",
+            }}, {"Retry-After": str(behaviour.retry_after)})
+
+        time.sleep(behaviour.delay(len(batch)))
+        handler(request, texts, batch)
+
+    def openai_response(self, request, texts, batch):
+        text, truncated = mock_completion(self.behaviour, batch, wrap_items=True)
+        prompt_tokens = sum(len(str(t)) for t in texts) // 4
+        head = {
+            "id": f"chatcmpl-mock{random.getrandbits(48):x}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(text) // 4,
+                 "total_tokens": prompt_tokens + len(text) // 4}
+        finish_reason = "length" if truncated else "stop"
+
+        if not request.get("stream"):
+            return self.send_json(200, {**head, "object": "chat.completion", "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text, "refusal": None},
+                "finish_reason": finish_reason,
+            }], "usage": usage})
+
+        chunk = lambda choices, **extra: {**head, "object": "chat.completion.chunk", "choices": choices, **extra}
+        events = [chunk([{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}])
+                  for piece in self.chunks(text)]
+        events.append(chunk([{"index": 0, "delta": {}, "finish_reason": finish_reason}]))
+        if (request.get("stream_options") or {}).get("include_usage"):
+            events.append(chunk([], usage=usage))
+        self.send_events(events + ["[DONE]"])
+
+    def gemini_response(self, request, texts, batch):
+        text, truncated = mock_completion(self.behaviour, batch, wrap_items=False)
+        model = self.path.split("/models/", 1)[-1].split(":", 1)[0]
+        usage = {"promptTokenCount": sum(len(str(t)) for t in texts) // 4, "candidatesTokenCount": len(text) // 4}
+
+        def response(piece, finish_reason=None):
+            candidate = {"content": {"role": "model", "parts": [{"text": piece}]}, "index": 0}
+            if finish_reason:
+                candidate["finishReason"] = finish_reason
+            return {"candidates": [candidate], "usageMetadata": usage, "modelVersion": model}
+
+        finish_reason = "MAX_TOKENS" if truncated else "STOP"
+        if ":streamGenerateContent" not in self.path:
+            return self.send_json(200, response(text, finish_reason))
+        pieces = self.chunks(text)
+        self.send_events([response(piece) for piece in pieces[:-1]] + [response(pieces[-1], finish_reason)])
+
+
+def start_mock_server(behaviour, host="127.0.0.1", port=0):
+    """
+    Serves the mock provider from a background thread. Returns the server and
+    its base URL; pass f"{url}/v1" to OpenAI and the bare url to Gemini.
+    """
+    handler = type("BoundMockProviderHandler", (MockProviderHandler,), {"behaviour": behaviour})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# Run convert_to_stix_via_* against the mock at several concurrency settings
+def benchmark_conversion(provider, input_file, behaviour, concurrency_levels, batch_size=25, work_dir=None, stream=False):
+    # Imported here so serving the mock does not need the provider SDKs
+    import importlib
+    script = importlib.import_module("gpt_stix" if provider == "openai" else "gemini_stix")
+    convert = script.convert_to_stix_via_chatgpt if provider == "openai" else script.convert_to_stix_via_gemini
+
+    server, url = start_mock_server(behaviour)
+    base_url = f"{url}/v1" if provider == "openai" else url
+    work_dir = work_dir or tempfile.mkdtemp(prefix="mock_llm_")
+    rows = []
+    try:
+        for concurrency in concurrency_levels:
+            before = dict(behaviour.stats)
+            output_file = os.path.join(work_dir, f"{provider}_c{concurrency}.json")
+            start = time.perf_counter()
+            error = None
+            try:
+                convert(input_file, output_file, "mock-key", batch_size=batch_size, concurrency=concurrency,
+                        base_url=base_url, stream=stream)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            seconds = time.perf_counter() - start
+            stats = {key: behaviour.stats[key] - before[key] for key in before}
+            rows.append({"provider": provider, "concurrency": concurrency, "seconds": round(seconds, 3),
+                         "requests_per_second": round(stats["requests"] / seconds, 2), "error": error, **stats})
+    finally:
+        server.shutdown()
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI and Gemini APIs")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--latency-mean", type=float, default=0.5, help="seconds (median for lognormal)")
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--per-item-latency", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--fence-rate", type=float, default=0.0)
+    parser.add_argument("--omission-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-chars", type=int, default=64, help="characters per streamed chunk")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed chunks")
+    parser.add_argument("--benchmark", choices=["openai", "gemini"], help="run the conversion script against the mock instead of serving")
+    parser.add_argument("--input", help="IOC source file for --benchmark")
+    parser.add_argument("--concurrency", default="1,4,16", help="concurrency levels for --benchmark")
+    parser.add_argument("--batch-size", type=int, default=25)
+    parser.add_argument("--stream", action="store_true", help="use the streaming conversion mode in --benchmark")
+    args = parser.parse_args()
+
+    behaviour = MockBehaviour(args.latency, args.latency_mean, args.latency_sigma, args.per_item_latency,
+                              args.throttle_rate, args.retry_after, args.truncate_rate, args.fence_rate,
+                              args.omission_rate, args.seed, args.chunk_chars, args.chunk_delay)
+
+    if args.benchmark:
+        levels = [int(c) for c in args.concurrency.split(",")]
+        for row in benchmark_conversion(args.benchmark, args.input, behaviour, levels, args.batch_size,
+                                        stream=args.stream):
+            status = "✅" if not row["error"] else f"❌ {row['error']}"
+            print(f"⏱️ concurrency {row['concurrency']:>3}: {row['seconds']:.2f}s, {row['requests_per_second']} req/s, "
+                  f"{row['throttled']} throttled, {row['truncated']} truncated, {row['omitted']} omitted {status}")
+    else:
+        server, url = start_mock_server(behaviour, port=args.port)
+        print(f"🧪 Mock provider on {url} (OpenAI base_url {url}/v1, Gemini base_url {url})")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+            print(f"📊 {behaviour.stats}")
@@ -0,0 +1,178 @@
+import os
+import json
+from stix_patterns import IP_PATHS, URL_PATHS, MD5_PATHS, SHA1_PATHS, SHA256_PATHS, parse_pattern_values
+from eval_pool import list_stix_files, map_stix_files, evaluator_parser, evaluator_options
+from stix_reader import iter_stix_objects, StixStreamError
+from result_store import ResultStore, context_hash
+from omission_matrix import OmissionMatrixWriter, matrix_path_for, positions_for
+from results_db import ResultsDB, outcome_rows
+from ioc_store import exact_index, count_vector, distinct_positions
+
+# Where each IOC type lives in its source file, and which STIX object paths can match it
+IOC_TYPES = {
+    "ip": {"list_key": "data", "field": "ipAddress", "paths": IP_PATHS},
+    "url": {"list_key": "urls", "field": "url", "paths": URL_PATHS},
+    "md5": {"list_key": "data", "field": "md5_hash", "paths": MD5_PATHS},
+    "sha1": {"list_key": "data", "field": "sha1_hash", "paths": SHA1_PATHS},
+    "sha256": {"list_key": "data", "field": "sha256_hash", "paths": SHA256_PATHS},
+}
+
+# Step 1: Extract every configured IOC list from its source file
+def extract_ioc_lists(source_files):
+    ioc_lists = {}
+    for ioc_type, input_file in source_files.items():
+        if not input_file:
+            continue
+        spec = IOC_TYPES[ioc_type]
+        with open(input_file, 'r') as f:
+            data = json.load(f)
+        ioc_lists[ioc_type] = [entry[spec["field"]] for entry in data.get(spec["list_key"], []) if spec["field"] in entry]
+    return ioc_lists
+
+def build_indexes(ioc_lists, canonical=False, compact=False):
+    return {ioc_type: exact_index(ioc_list, IOC_TYPES[ioc_type]["paths"], canonical, compact)
+            for ioc_type, ioc_list in ioc_lists.items()}
+
+# Step 2: Score a single STIX file against every IOC type in one read
+def score_stix_file(indexes, filepath):
+    counts = {ioc_type: count_vector(len(index)) for ioc_type, index in indexes.items()}
+    unexpected_patterns = set()
+
+    parse_error = None
+    try:
+        for obj in iter_stix_objects(filepath):
+            if obj.get("type") == "indicator":
+                pattern = obj.get("pattern", "")
+                # Parse once, then look the values up in each type's index
+                values = parse_pattern_values(pattern)
+                matched = False
+                for ioc_type, index in indexes.items():
+                    for idx in index.find_values(values):
+                        counts[ioc_type][idx] += 1
+                        matched = True
+                if not matched:
+                    unexpected_patterns.add(pattern.strip())
+    except StixStreamError as e:
+        parse_error = str(e)
+
+    types = {}
+    for ioc_type, index in indexes.items():
+        # Duplicate source entries share their first position's count
+        type_counts = counts[ioc_type]
+        total = len(index)
+        matched_count = 0
+        repeated = {}
+        omitted = []
+        for idx in distinct_positions(index):
+            count = type_counts[idx]
+            if count == 0:
+                omitted.append(index.iocs[idx])
+                continue
+            matched_count += 1
+            if count > 1:
+                repeated[index.iocs[idx]] = count
+        types[ioc_type] = {
+            "matched": matched_count,
+            "total": total,
+            "percentage": round((matched_count / total) * 100, 2) if total else 0,
+            "repeated": repeated,
+            "omitted": omitted,
+        }
+
+    matched_total = sum(t["matched"] for t in types.values())
+    total = sum(t["total"] for t in types.values())
+    result = {
+        "file": os.path.basename(filepath),
+        "matched_iocs": matched_total,
+        "total_iocs": total,
+        "percentage": round((matched_total / total) * 100, 2) if total else 0,
+        "types": types,
+        "unexpected_patterns": sorted(unexpected_patterns)
+    }
+    if parse_error:
+        result["parse_error"] = parse_error
+    return result
+
+# Step 3: Print the per-file report
+def print_file_result(result):
+    print(f"\n📄 {result['file']}: {result['matched_iocs']}/{result['total_iocs']} IOCs matched ({result['percentage']}%)")
+    if "parse_error" in result:
+        print(f"⚠️ Could not parse all JSON in {result['file']}: {result['parse_error']}")
+    for ioc_type, summary in result["types"].items():
+        print(f"  {ioc_type}: {summary['matched']}/{summary['total']} ({summary['percentage']}%), "
+              f"{len(summary['repeated'])} repeated, {len(summary['omitted'])} omitted")
+    if result["unexpected_patterns"]:
+        print(f"❓ Unexpected patterns ({len(result['unexpected_patterns'])}):")
+        for pattern in result["unexpected_patterns"]:
+            print(f"  - {pattern}")
+
+# Step 4: Process all STIX files in a directory
+def evaluate_stix_directory(ioc_lists, stix_dir, output_file, workers=1, store_file=None, canonical=False,
+                            matrix_file=None, matrix_group=None,
+                            db_file=None, model=None, compact=False):
+    results = []
+    indexes = build_indexes(ioc_lists, canonical, compact)
+    del ioc_lists  # the indexes keep the IOCs; compact ones only save memory if they hold the sole copy
+
+    # Reuse stored results for files unchanged since the last run with these IOC lists
+    sources = {ioc_type: list(index.iocs) for ioc_type, index in indexes.items()} if store_file else None
+    store = ResultStore(store_file, context_hash("multi", canonical, sources)) if store_file else None
+    # One matrix per IOC type, one row per file, for cross-run omission analysis
+    matrices = {ioc_type: OmissionMatrixWriter(matrix_path_for(matrix_file, ioc_type), index.iocs, ioc_type)
+                for ioc_type, index in indexes.items()} if matrix_file else {}
+    db = ResultsDB(db_file) if db_file else None
+    run_id = db.start_run("multi_search", model=model, ioc_type=",".join(indexes), stix_dir=stix_dir,
+                          canonical=canonical) if db else None
+
+    paths = [os.path.join(stix_dir, filename) for filename in list_stix_files(stix_dir)]
+    for result, path in zip(map_stix_files(score_stix_file, indexes, paths, workers, store), paths):
+        results.append(result)
+        for ioc_type, matrix in matrices.items():
+            summary = result["types"][ioc_type]
+            matrix.add_run({"run": path, "group": matrix_group}, positions_for(indexes[ioc_type], summary["omitted"]),
+                           positions_for(indexes[ioc_type], summary["repeated"]))
+        if db:
+            outcomes = [row for ioc_type, summary in result["types"].items()
+                        for row in outcome_rows(ioc_type, summary["omitted"], summary["repeated"])]
+            db.add_file(run_id, result["file"], result["matched_iocs"], result["total_iocs"], result["percentage"],
+                        outcomes, result["unexpected_patterns"], result.get("parse_error"))
+        print_file_result(result)
+
+    if store:
+        print(f"\n♻️ Reused stored results for {store.hits}/{len(paths)} files")
+
+    if db:
+        db.finish_run(run_id)
+        db.close()
+        print(f"\n🗄️ Recorded run {run_id} in {db_file}")
+
+    if output_file:
+        with open(output_file, 'w') as out:
+            json.dump(results, out, indent=2)
+        print(f"\n✅ Saved summary to {output_file}")
+
+
+if __name__ == "__main__":
+    # Source lists to score against; set any of them to None to skip that IOC type
+    ip_source_file = [YOUR_IP_SOURCE_FILE]
+    url_source_file = [YOUR_URL_SOURCE_FILE]
+    md5_source_file = [YOUR_HASH_SOURCE_FILE]
+    sha1_source_file = None
+    sha256_source_file = None
+    stix_folder = [YOUR_FOLDER_TO_SCAN]
+    summary_output_file = "multi_match_summary_gpt.json"
+    result_store_file = "multi_match_store_gpt.json"  # per-file results reused on the next run
+    results_db_file = "stix_results.sqlite"  # every run is appended here (shared by all evaluators); None to skip
+
+    args = evaluator_parser("Score STIX output files against every source IOC list in one pass",
+                            "append each file's omissions to this runs x IOCs matrix (one .omx per IOC type)").parse_args()
+
+    source_files = {
+        "ip": ip_source_file,
+        "url": url_source_file,
+        "md5": md5_source_file,
+        "sha1": sha1_source_file,
+        "sha256": sha256_source_file,
+    }
+    evaluate_stix_directory(extract_ioc_lists(source_files), stix_folder, None if args.no_json else summary_output_file,
+                            **evaluator_options(args, result_store_file, results_db_file))
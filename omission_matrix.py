@@ -0,0 +1,274 @@
+import os
+import sys
+import json
+import heapq
+import struct
+import hashlib
+import argparse
+from array import array
+
+MAGIC = b"OMX1\n"
+MATRIX_SUFFIX = ".omx"
+
+# Each byte of a bitset spread into eight 32-bit counters, for turning bit planes into count vectors
+_LANES = [b"".join(struct.pack("<I", (byte >> bit) & 1) for bit in range(8)) for byte in range(256)]
+
+
+def source_digest(iocs):
+    digest = hashlib.sha256()
+    for ioc in iocs:
+        digest.update(ioc.encode("utf-8") + b"\n")
+    return digest.hexdigest()
+
+
+def matrix_path_for(matrix_file, ioc_type):
+    """Per-type matrix file next to matrix_file, for evaluators that score several IOC types."""
+    return f"{os.path.splitext(matrix_file)[0]}.{ioc_type}{MATRIX_SUFFIX}"
+
+
+def bitset(positions, size):
+    """Packs source positions into a little-endian bitset of `size` bits."""
+    bits = bytearray((size + 7) // 8)
+    for position in positions:
+        bits[position >> 3] |= 1 << (position & 7)
+    return bytes(bits)
+
+
+def positions_for(index, iocs):
+    """Source positions of IOC strings taken from a summary, duplicates included."""
+    positions = []
+    for ioc in iocs:
+        positions.extend(index.positions_of(ioc))
+    return positions
+
+
+# Appends one row per scored file: which source IOCs it omitted and which it repeated
+class OmissionMatrixWriter:
+    def __init__(self, path, iocs, ioc_type):
+        """
+        iocs is the source list in index order (e.g. index.iocs). A matrix
+        built for a different source list is replaced rather than mixed in.
+        """
+        self.path = path
+        self.size = len(iocs)
+        digest = source_digest(iocs)
+        try:
+            current = _read_header(path)[0]
+        except (OSError, ValueError):
+            current = None
+        if current is not None and current["source_sha256"] == digest:
+            return
+        if current is not None:
+            print(f"⚠️ {path} was built for a different source list; starting a new matrix")
+
+        header = json.dumps({"ioc_type": ioc_type, "iocs": self.size, "source_sha256": digest}).encode("utf-8")
+        block = "\n".join(iocs).encode("utf-8")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<I", len(header)) + header)
+            f.write(struct.pack("<Q", len(block)) + block)
+        os.replace(tmp_path, path)
+
+    def add_run(self, meta, omitted_positions, repeated_positions):
+        """meta must carry a "run" label; a later row with the same label replaces the earlier one."""
+        data = json.dumps(meta).encode("utf-8")
+        with open(self.path, "ab") as f:
+            f.write(struct.pack("<I", len(data)) + data)
+            f.write(bitset(omitted_positions, self.size))
+            f.write(bitset(repeated_positions, self.size))
+
+
+def _read_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not an omission matrix")
+        (length,) = struct.unpack("<I", f.read(4))
+        header = json.loads(f.read(length))
+        return header, f.tell()
+
+
+# Bit-sliced counter: plane k holds bit k of every IOC's count, so adding a row is a few big-int operations
+class _BitCounter:
+    def __init__(self):
+        self.planes = []
+
+    def add(self, row):
+        carry = row
+        for k, plane in enumerate(self.planes):
+            if not carry:
+                return
+            self.planes[k], carry = plane ^ carry, plane & carry
+        if carry:
+            self.planes.append(carry)
+
+    def counts(self, size):
+        """Per-IOC totals as an array of unsigned ints."""
+        nbytes = (size + 7) // 8
+        total = 0
+        for k, plane in enumerate(self.planes):
+            lanes = b"".join(_LANES[byte] for byte in plane.to_bytes(nbytes, "little"))
+            total += int.from_bytes(lanes, "little") << k
+        counts = array("I")
+        counts.frombytes(total.to_bytes(nbytes * 8 * 4, "little"))
+        if sys.byteorder == "big":
+            counts.byteswap()
+        return counts[:size]
+
+
+# A loaded matrix: runs as rows, source IOCs as columns, each row a pair of big-int bitsets
+class OmissionMatrix:
+    def __init__(self, path):
+        header, offset = _read_header(path)
+        self.ioc_type = header["ioc_type"]
+        self.size = header["iocs"]
+        nbytes = (self.size + 7) // 8
+        rows = {}
+        with open(path, "rb") as f:
+            f.seek(offset)
+            (length,) = struct.unpack("<Q", f.read(8))
+            self.iocs = f.read(length).decode("utf-8").split("\n") if self.size else []
+            while True:
+                prefix = f.read(4)
+                if len(prefix) < 4:
+                    break
+                (length,) = struct.unpack("<I", prefix)
+                meta = json.loads(f.read(length))
+                omitted = f.read(nbytes)
+                repeated = f.read(nbytes)
+                if len(repeated) < nbytes:
+                    print(f"⚠️ {path} ends in a partial row; ignoring it")
+                    break
+                rows[meta["run"]] = (meta, int.from_bytes(omitted, "little"), int.from_bytes(repeated, "little"))
+        self.runs = [meta for meta, _, _ in rows.values()]
+        self.omitted = [bits for _, bits, _ in rows.values()]
+        self.repeated = [bits for _, _, bits in rows.values()]
+
+    def select(self, **meta):
+        """Row numbers of the runs whose metadata matches every given field."""
+        return [i for i, run in enumerate(self.runs) if all(run.get(k) == v for k, v in meta.items())]
+
+    def groups(self, field):
+        grouped = {}
+        for i, run in enumerate(self.runs):
+            grouped.setdefault(run.get(field), []).append(i)
+        return grouped
+
+    def _counts(self, rows, rows_of):
+        counter = _BitCounter()
+        for i in rows_of if rows_of is not None else range(len(self.runs)):
+            counter.add(rows[i])
+        return counter.counts(self.size)
+
+    def omission_counts(self, rows=None):
+        """How many of the runs omitted each source IOC."""
+        return self._counts(self.omitted, rows)
+
+    def repeat_counts(self, rows=None):
+        """How many of the runs repeated each source IOC."""
+        return self._counts(self.repeated, rows)
+
+    def coverage(self, rows=None):
+        """Per run: the share of source IOCs it covered, and the share it repeated."""
+        rows = rows if rows is not None else range(len(self.runs))
+        size = self.size or 1
+        return [{"run": self.runs[i]["run"],
+                 "coverage": round(1 - self.omitted[i].bit_count() / size, 6),
+                 "duplicate_rate": round(self.repeated[i].bit_count() / size, 6)} for i in rows]
+
+    def always_omitted(self, rows):
+        bits = -1
+        for i in rows:
+            bits &= self.omitted[i]
+        return bits if rows else 0
+
+    def ever_omitted(self, rows):
+        bits = 0
+        for i in rows:
+            bits |= self.omitted[i]
+        return bits
+
+    def iocs_in(self, bits, limit=None):
+        found = []
+        while bits and (limit is None or len(found) < limit):
+            low = bits & -bits
+            found.append(self.iocs[low.bit_length() - 1])
+            bits ^= low
+        return found
+
+    def top_omitted(self, k=20, rows=None):
+        counts = self.omission_counts(rows)
+        runs = len(rows) if rows is not None else len(self.runs)
+        top = heapq.nlargest(k, range(self.size), key=counts.__getitem__)
+        return [{"ioc": self.iocs[i], "omitted_runs": counts[i], "frequency": round(counts[i] / runs, 4)}
+                for i in top if counts[i]]
+
+    def compare(self, rows_a, rows_b, k=20):
+        """
+        Contrasts two sets of runs (e.g. two models): mean coverage of each,
+        the IOCs one always drops and the other never does, and the IOCs
+        whose omission frequency differs most.
+        """
+        counts_a = self.omission_counts(rows_a)
+        counts_b = self.omission_counts(rows_b)
+        runs_a, runs_b = len(rows_a) or 1, len(rows_b) or 1
+        gap = lambda i: counts_a[i] / runs_a - counts_b[i] / runs_b
+        mean = lambda rows: round(sum(c["coverage"] for c in self.coverage(rows)) / (len(rows) or 1), 6)
+        only_a = self.always_omitted(rows_a) & ~self.ever_omitted(rows_b)
+        only_b = self.always_omitted(rows_b) & ~self.ever_omitted(rows_a)
+        return {
+            "coverage_a": mean(rows_a),
+            "coverage_b": mean(rows_b),
+            "always_omitted_only_by_a": only_a.bit_count(),
+            "always_omitted_only_by_b": only_b.bit_count(),
+            "examples_only_a": self.iocs_in(only_a, k),
+            "examples_only_b": self.iocs_in(only_b, k),
+            "worse_in_a": [{"ioc": self.iocs[i], "gap": round(gap(i), 4)}
+                           for i in heapq.nlargest(k, range(self.size), key=gap) if gap(i) > 0],
+            "worse_in_b": [{"ioc": self.iocs[i], "gap": round(-gap(i), 4)}
+                           for i in heapq.nsmallest(k, range(self.size), key=gap) if gap(i) < 0],
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query a runs x IOCs omission matrix written by the evaluators")
+    parser.add_argument("matrix", help=f"{MATRIX_SUFFIX} file")
+    parser.add_argument("--top", type=int, default=20, help="how many IOCs to list")
+    parser.add_argument("--group-by", default="group", help="run metadata field to group runs by (default: group)")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="compare two groups")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    matrix = OmissionMatrix(args.matrix)
+    groups = matrix.groups(args.group_by)
+    print(f"📊 {len(matrix.runs)} runs x {matrix.size} {matrix.ioc_type} IOCs in {len(groups)} groups")
+    report = {"groups": {}}
+    for name, rows in groups.items():
+        coverage = matrix.coverage(rows)
+        summary = {
+            "runs": len(rows),
+            "mean_coverage": round(sum(c["coverage"] for c in coverage) / len(rows), 6),
+            "mean_duplicate_rate": round(sum(c["duplicate_rate"] for c in coverage) / len(rows), 6),
+            "always_omitted": matrix.always_omitted(rows).bit_count(),
+            "ever_omitted": matrix.ever_omitted(rows).bit_count(),
+            "top_omitted": matrix.top_omitted(args.top, rows),
+        }
+        report["groups"][str(name)] = summary
+        print(f"\n📄 {name}: {summary['runs']} runs, {summary['mean_coverage']:.2%} mean coverage, "
+              f"{summary['mean_duplicate_rate']:.2%} repeated; {summary['always_omitted']} IOCs omitted by every run, "
+              f"{summary['ever_omitted']} by at least one")
+        for entry in summary["top_omitted"]:
+            print(f"  - {entry['ioc']} omitted in {entry['omitted_runs']}/{summary['runs']} runs")
+
+    if args.compare:
+        a, b = args.compare
+        result = matrix.compare(groups.get(a, []), groups.get(b, []), args.top)
+        report["compare"] = {"a": a, "b": b, **result}
+        print(f"\n⚖️ {a} vs {b}: coverage {result['coverage_a']:.2%} vs {result['coverage_b']:.2%}; "
+              f"{result['always_omitted_only_by_a']} IOCs always dropped only by {a}, "
+              f"{result['always_omitted_only_by_b']} only by {b}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Saved report to {args.output}")
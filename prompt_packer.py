@@ -0,0 +1,102 @@
+import json
+from async_dispatch import estimate_tokens
+from batch_repair import SOURCE_FIELDS
+
+# Source fields besides the IOC itself that help the model name and describe the indicator
+CONTEXT_FIELDS = ("name", "description", "threat", "tags")
+
+# Context window and output cap, in tokens, of the models the scripts are run with
+MODEL_LIMITS = {
+    "gpt-4o": (128_000, 16_384),
+    "gpt-4o-mini": (128_000, 16_384),
+    "gpt-4.1": (1_047_576, 32_768),
+    "gemini-1.5-pro": (2_097_152, 8_192),
+    "gemini-2.0-flash": (1_048_576, 8_192),
+    "gemini-2.5-flash": (1_048_576, 65_536),
+    "gemini-2.5-pro": (1_048_576, 65_536),
+}
+DEFAULT_LIMITS = (128_000, 8_192)
+
+# One indicator as the models write it, without its IOC value, for sizing replies
+_INDICATOR = json.dumps({
+    "type": "indicator", "spec_version": "2.1", "id": "", "created": "", "modified": "",
+    "pattern": "[ipv4-addr:value = '']", "pattern_type": "stix", "valid_from": "",
+    "name": "Malicious IP address", "description": "IP address associated with malware distribution",
+}, indent=2)
+INDICATOR_TOKENS = estimate_tokens(_INDICATOR)
+
+
+def model_limits(model):
+    """(context tokens, output tokens) for a model; versioned names fall back to their family."""
+    if model in MODEL_LIMITS:
+        return MODEL_LIMITS[model]
+    family = max((name for name in MODEL_LIMITS if model and model.startswith(name)), key=len, default=None)
+    return MODEL_LIMITS[family] if family else DEFAULT_LIMITS
+
+
+def pack_item(item):
+    """
+    The fields of a source record the conversion needs: its IOC fields and
+    a little context. Records with no known IOC field are sent whole, as
+    there is no telling which of their fields matter.
+    """
+    if not isinstance(item, dict) or not any(item.get(field) for field in SOURCE_FIELDS):
+        return item
+    return {key: value for key, value in item.items()
+            if (key in SOURCE_FIELDS or key in CONTEXT_FIELDS) and value not in (None, "", [])}
+
+
+# A batch cut down by pack_item; format_batch sends it as compact JSON
+class PackedBatch(list):
+    pass
+
+
+def pack_batch(batch):
+    return PackedBatch(pack_item(item) for item in batch)
+
+
+def format_batch(batch):
+    """The user message for a batch: compact JSON if it was packed, the original indented JSON otherwise."""
+    if isinstance(batch, PackedBatch):
+        return json.dumps({"data": batch}, separators=(",", ":"), ensure_ascii=False)
+    return json.dumps({"data": batch}, indent=2)
+
+
+def item_prompt_tokens(item, pack=True):
+    if pack:
+        return estimate_tokens(json.dumps(pack_item(item), separators=(",", ":"), ensure_ascii=False))
+    return estimate_tokens(json.dumps(item, indent=2))
+
+
+def item_reply_tokens(item):
+    """Estimated tokens of the indicator a model writes for one source record."""
+    value = next((item[field] for field in SOURCE_FIELDS if isinstance(item, dict) and item.get(field)), None)
+    return INDICATOR_TOKENS + estimate_tokens(str(value if value is not None else item))
+
+
+# Caps a batch by its estimated prompt and reply tokens, from the model's limits
+class TokenBudget:
+    def __init__(self, system_prompt, model, pack=True, output_share=0.8):
+        """
+        output_share is the part of the model's output cap a batch's reply
+        is planned to fill; the rest absorbs indicators that come out longer
+        than estimated, so replies are not cut off.
+        """
+        context, output = model_limits(model)
+        self.pack = pack
+        self.system_tokens = estimate_tokens(system_prompt)
+        self.reply_limit = int(output * output_share)
+        self.context_limit = context
+
+    def cut(self, items, start, end, max_items):
+        """End of the longest batch starting at items[start] that fits the budget (at least one item)."""
+        prompt = self.system_tokens
+        reply = 0
+        stop = min(end, start + max_items)
+        for i in range(start, stop):
+            prompt += item_prompt_tokens(items[i], self.pack)
+            reply += item_reply_tokens(items[i])
+            if i > start and (reply > self.reply_limit or prompt + reply > self.context_limit):
+                return i
+        return stop
+
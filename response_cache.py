@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import json
+import os
+
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def make_cache_key(provider, model, system_prompt, schema, batch):
+    """
+    Content address for one model request: a SHA-256 over everything that
+    can change the response. Post-processing such as append_fields is not
+    part of the key, so changing it still hits the cache.
+    """
+    payload = json.dumps(
+        {"provider": provider, "model": model, "system": system_prompt, "schema": schema, "batch": batch},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# On-disk cache of raw model responses, gzip-compressed, one file per key
+class ResponseCache:
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, refresh=False):
+        """
+        refresh=True ignores existing entries (every lookup misses) but still
+        stores the new responses, overwriting the stale ones.
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self.total_bytes = sum(os.path.getsize(path) for path, _ in self._entries())
+
+    def _path(self, key):
+        # Two-level fan-out keeps directories small
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json.gz")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json.gz"):
+                    path = os.path.join(root, name)
+                    yield path, os.path.getmtime(path)
+
+    def get(self, key):
+        path = self._path(key)
+        if self.refresh or not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                content = f.read()
+        except (OSError, EOFError):
+            # Corrupt or half-written entry: treat as a miss
+            self.misses += 1
+            return None
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        self.hits += 1
+        return content
+
+    def put(self, key, content):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            self.total_bytes -= os.path.getsize(path)
+
+        # Write then rename so readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+        self.total_bytes += os.path.getsize(path)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        for path, _ in sorted(self._entries(), key=lambda entry: entry[1]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            size = os.path.getsize(path)
+            os.remove(path)
+            self.total_bytes -= size
@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+
+
+def context_hash(*parts):
+    """Hash of everything besides the file itself that a stored result depends on (e.g. the IOC list)."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# Persistent per-file results, so a re-run only scores new or changed files
+class ResultStore:
+    def __init__(self, path, context, by_content=False):
+        """
+        Entries are keyed by file path and checked against size, mtime and
+        content hash. If `context` differs from the one the store was saved
+        with (the IOC list changed, say) every entry is discarded. With
+        by_content=True a new path whose content hash matches a stored file
+        (a copy or rename) reuses that file's result.
+        """
+        self.path = path
+        self.context = context
+        self.by_content = by_content
+        self.entries = {}
+        self._by_digest = None
+        self.hits = 0
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r") as f:
+                    saved = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                saved = {}
+            if saved.get("context") == context:
+                self.entries = saved.get("files", {})
+            elif saved:
+                print(f"♻️ {path} was built for a different source list, rescoring everything")
+
+    def lookup(self, filepath):
+        entry = self.entries.get(os.path.abspath(filepath))
+        if entry is None:
+            return self._lookup_content(filepath) if self.by_content else None
+        stat = os.stat(filepath)
+        if stat.st_size != entry["size"]:
+            return None
+        if stat.st_mtime_ns != entry["mtime_ns"]:
+            # Touched but maybe not changed: fall back to the content hash
+            if file_digest(filepath) != entry["sha256"]:
+                return None
+            entry["mtime_ns"] = stat.st_mtime_ns
+        self.hits += 1
+        return entry["result"]
+
+    def _lookup_content(self, filepath):
+        digest = file_digest(filepath)
+        if self._by_digest is None:
+            self._by_digest = {entry["sha256"]: entry for entry in self.entries.values()}
+        entry = self._by_digest.get(digest)
+        if entry is None:
+            return None
+        self.save(filepath, entry["result"], digest)
+        self.hits += 1
+        return entry["result"]
+
+    def save(self, filepath, result, digest=None):
+        stat = os.stat(filepath)
+        entry = {
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest or file_digest(filepath),
+            "result": result,
+        }
+        self.entries[os.path.abspath(filepath)] = entry
+        if self._by_digest is not None:
+            self._by_digest[entry["sha256"]] = entry
+
+    def flush(self):
+        # Forget files that have since been deleted
+        self.entries = {path: entry for path, entry in self.entries.items() if os.path.exists(path)}
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"context": self.context, "files": self.entries}, f)
+        os.replace(tmp_path, self.path)
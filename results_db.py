@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import sqlite3
+import argparse
+import threading
+
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    model TEXT,
+    ioc_type TEXT,
+    stix_dir TEXT,
+    label TEXT,
+    meta TEXT,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    file TEXT NOT NULL,
+    matched INTEGER,
+    total INTEGER,
+    percentage REAL,
+    is_valid INTEGER,
+    seconds REAL,
+    parse_error TEXT
+);
+CREATE TABLE IF NOT EXISTS ioc_outcomes (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    ioc_type TEXT NOT NULL,
+    ioc TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    count INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS unexpected_patterns (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    pattern TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS validation_messages (
+    file_id INTEGER NOT NULL REFERENCES files(id),
+    severity TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_model ON runs(model, started_at);
+CREATE INDEX IF NOT EXISTS runs_ioc_type ON runs(ioc_type, started_at);
+CREATE INDEX IF NOT EXISTS runs_started ON runs(started_at);
+CREATE INDEX IF NOT EXISTS files_run ON files(run_id);
+CREATE INDEX IF NOT EXISTS outcomes_file ON ioc_outcomes(file_id);
+CREATE INDEX IF NOT EXISTS outcomes_ioc ON ioc_outcomes(ioc_type, ioc, outcome);
+CREATE INDEX IF NOT EXISTS unexpected_file ON unexpected_patterns(file_id);
+CREATE INDEX IF NOT EXISTS messages_file ON validation_messages(file_id);
+"""
+
+
+# One SQLite file holding every evaluation and validation run, appended to rather than rewritten
+class ResultsDB:
+    def __init__(self, path, batch_files=200):
+        """
+        Rows are buffered and written with executemany in one transaction
+        per batch_files files (and when a run finishes). The database runs
+        in WAL mode, so it can be queried while an evaluation is writing.
+        Safe to share between threads.
+        """
+        self.path = path
+        self.batch_files = batch_files
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"{path} was written by a newer schema (version {version})")
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+            self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._clear()
+
+    def _clear(self):
+        self.pending = {"files": [], "ioc_outcomes": [], "unexpected_patterns": [], "validation_messages": []}
+
+    def start_run(self, tool, model=None, ioc_type=None, stix_dir=None, label=None, **meta):
+        with self.lock, self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (tool, model, ioc_type, stix_dir, label, meta, started_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (tool, model, ioc_type, stix_dir, label, json.dumps(meta) if meta else None, time.time()))
+            return cursor.lastrowid
+
+    def add_file(self, run_id, file, matched=None, total=None, percentage=None, outcomes=(), unexpected=(),
+                 parse_error=None, is_valid=None, seconds=None, errors=(), warnings=()):
+        """
+        outcomes holds (ioc_type, ioc, outcome, count) tuples, where outcome
+        is "omitted" or "repeated"; matched IOCs are not stored one by one.
+        """
+        with self.lock:
+            # Child rows point at the file's place in the batch until it has a row id
+            file_id = len(self.pending["files"])
+            self.pending["files"].append((run_id, file, matched, total, percentage,
+                                          None if is_valid is None else int(is_valid), seconds, parse_error))
+            self.pending["ioc_outcomes"].extend((file_id, *outcome) for outcome in outcomes)
+            self.pending["unexpected_patterns"].extend((file_id, pattern) for pattern in unexpected)
+            self.pending["validation_messages"].extend(
+                [(file_id, "error", message) for message in errors] + [(file_id, "warning", message) for message in warnings])
+            if len(self.pending["files"]) >= self.batch_files:
+                self._flush()
+
+    def _flush(self):
+        if not self.pending["files"]:
+            return
+        with self.conn:
+            # Row ids come from SQLite, so several processes can write to the same store
+            ids = [self.conn.execute(
+                "INSERT INTO files (run_id, file, matched, total, percentage, is_valid, seconds, parse_error) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", row).lastrowid for row in self.pending["files"]]
+            for table, placeholders in [("ioc_outcomes", "?, ?, ?, ?, ?"), ("unexpected_patterns", "?, ?"),
+                                        ("validation_messages", "?, ?, ?")]:
+                self.conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                                      ((ids[row[0]], *row[1:]) for row in self.pending[table]))
+        self._clear()
+
+    def finish_run(self, run_id):
+        with self.lock:
+            self._flush()
+            with self.conn:
+                self.conn.execute("UPDATE runs SET finished_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            self.conn.close()
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+
+def outcome_rows(ioc_type, omitted, repeated):
+    """Outcome tuples for add_file; repeated is a {ioc: count} dict or a list of IOCs."""
+    rows = [(ioc_type, ioc, "omitted", 0) for ioc in omitted]
+    if isinstance(repeated, dict):
+        rows.extend((ioc_type, ioc, "repeated", count) for ioc, count in repeated.items())
+    else:
+        rows.extend((ioc_type, ioc, "repeated", 2) for ioc in repeated)
+    return rows
+
+
+def top_omitted(db, model=None, ioc_type=None, limit=20):
+    """IOCs omitted by the most scored files, optionally for one model and IOC type."""
+    sql = ("SELECT o.ioc_type, o.ioc, COUNT(*) AS files FROM ioc_outcomes o "
+           "JOIN files f ON f.id = o.file_id JOIN runs r ON r.id = f.run_id WHERE o.outcome = 'omitted'")
+    params = []
+    if model:
+        sql += " AND r.model = ?"
+        params.append(model)
+    if ioc_type:
+        sql += " AND o.ioc_type = ?"
+        params.append(ioc_type)
+    sql += " GROUP BY o.ioc_type, o.ioc ORDER BY files DESC LIMIT ?"
+    return db.query(sql, params + [limit])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Query the SQLite results store written by the evaluators and validator")
+    parser.add_argument("db", help="results database")
+    parser.add_argument("--runs", type=int, default=20, help="list the most recent runs (default: 20)")
+    parser.add_argument("--top-omitted", type=int, default=0, help="list the IOCs omitted most often")
+    parser.add_argument("--model")
+    parser.add_argument("--ioc-type")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        raise SystemExit(f"❌ {args.db} does not exist")
+    db = ResultsDB(args.db)
+    rows = db.query(
+        "SELECT r.id, r.tool, r.model, r.ioc_type, r.started_at, COUNT(f.id), AVG(f.percentage), "
+        "SUM(f.is_valid = 0) FROM runs r LEFT JOIN files f ON f.run_id = r.id "
+        "WHERE (? IS NULL OR r.model = ?) AND (? IS NULL OR r.ioc_type = ?) "
+        "GROUP BY r.id ORDER BY r.started_at DESC LIMIT ?",
+        (args.model, args.model, args.ioc_type, args.ioc_type, args.runs))
+    for run_id, tool, model, ioc_type, started, files, percentage, invalid in rows:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(started))
+        score = f"{percentage:.2f}% mean match" if percentage is not None else f"{invalid or 0} invalid"
+        print(f"📄 run {run_id} {when} {tool} {model or '-'} {ioc_type or '-'}: {files} files, {score}")
+    if args.top_omitted:
+        print("\n❌ Most often omitted:")
+        for ioc_type, ioc, files in top_omitted(db, args.model, args.ioc_type, args.top_omitted):
+            print(f"  - {ioc} ({ioc_type}) omitted in {files} files")
+    db.close()
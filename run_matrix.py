@@ -0,0 +1,311 @@
+import os
+import json
+import time
+import argparse
+import importlib
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from async_dispatch import RateLimiter
+from bundle_writer import manifest_path_for
+from omission_matrix import OmissionMatrixWriter, MATRIX_SUFFIX, positions_for
+from results_db import ResultsDB, outcome_rows
+from stix_conversion import PROVIDERS
+
+# Settings a provider block may leave out
+PROVIDER_DEFAULTS = {
+    "api_key_env": None,
+    "api_key": None,
+    "models": None,
+    "concurrency": 1,
+    "parallel_runs": 1,
+    "requests_per_minute": None,
+    "tokens_per_minute": None,
+    "base_url": None,
+    "stream": False,
+    "pack_prompts": False,
+    "size_by_tokens": False,
+    "adaptive": None,
+}
+
+EXAMPLE_SPEC = {
+    "providers": {
+        "openai": {"api_key_env": "OPENAI_API_KEY", "models": ["gpt-4o"], "parallel_runs": 2, "concurrency": 4,
+                   "requests_per_minute": 500, "tokens_per_minute": 30000},
+        "gemini": {"api_key_env": "GEMINI_API_KEY", "models": ["gemini-2.0-flash"], "parallel_runs": 2},
+    },
+    "inputs": [{"file": "ip_list.json", "ioc_type": "ip"}, {"file": "url_list.json", "ioc_type": "url"}],
+    "batch_sizes": [25],
+    "repetitions": 5,
+    "output_dir": "matrix_output",
+    "validate": "fast",
+    "canonical": False,
+    "matrix_dir": "matrix_output/omissions",
+    "results_db": "stix_results.sqlite",
+    "eval_workers": 2,
+    "skip_existing": True,
+}
+
+
+def load_spec(path):
+    with open(path, 'r') as f:
+        spec = json.load(f)
+    for name, provider in spec["providers"].items():
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown provider {name!r}; expected one of {sorted(PROVIDERS)}")
+        spec["providers"][name] = {**PROVIDER_DEFAULTS, **provider}
+    spec.setdefault("batch_sizes", [25])
+    spec.setdefault("repetitions", 1)
+    spec.setdefault("output_dir", "matrix_output")
+    spec.setdefault("validate", "fast")
+    spec.setdefault("canonical", False)
+    spec.setdefault("matrix_dir", None)
+    spec.setdefault("results_db", None)
+    spec.setdefault("eval_workers", 2)
+    spec.setdefault("skip_existing", True)
+    return spec
+
+
+# Step 1: Expand the spec into one cell per provider, model, input, batch size and repetition
+def expand_cells(spec):
+    cells = []
+    for provider, settings in spec["providers"].items():
+        models = settings["models"] or [None]
+        for model, source, batch_size, run in itertools.product(
+                models, spec["inputs"], spec["batch_sizes"], range(1, spec["repetitions"] + 1)):
+            cells.append({
+                "provider": provider,
+                "model": model,
+                "input_file": source["file"],
+                "ioc_type": source["ioc_type"],
+                "batch_size": batch_size,
+                "run": run,
+            })
+    return cells
+
+
+def cell_output_file(output_dir, cell, model):
+    stem = os.path.splitext(os.path.basename(cell["input_file"]))[0]
+    folder = os.path.join(output_dir, cell["provider"], model.replace("/", "_"), stem, f"b{cell['batch_size']:02}")
+    return os.path.join(folder, f"stix_output_{cell['run']:03}.json")
+
+
+def output_exists(output_file):
+    return os.path.exists(output_file) or os.path.exists(manifest_path_for(output_file))
+
+
+# Everything one provider's cells share: its script, rate limiter, client and worker pool
+class ProviderLane:
+    def __init__(self, name, settings):
+        """
+        The rate limiter is shared by every cell of the provider, so the caps
+        hold however many cells run at once. The sync client (and so its
+        connection pool) is shared by cells that run with concurrency 1;
+        cells above that open an async client inside their own event loop,
+        as async clients cannot be shared across loops.
+        """
+        script_name, convert_name = PROVIDERS[name]
+        self.name = name
+        self.settings = settings
+        self.script = importlib.import_module(script_name)
+        self.convert = getattr(self.script, convert_name)
+        self.api_key = settings["api_key"] or (os.environ.get(settings["api_key_env"])
+                                               if settings["api_key_env"] else None)
+        if not self.api_key:
+            raise ValueError(f"No API key for {name}: set api_key_env (or api_key) in the spec")
+        self.limiter = RateLimiter(settings["requests_per_minute"], settings["tokens_per_minute"])
+        self.client = None
+        if settings["concurrency"] <= 1:
+            self.client = self.script.make_client(self.api_key, settings["base_url"])
+        self.pool = ThreadPoolExecutor(max_workers=settings["parallel_runs"], thread_name_prefix=name)
+
+    def default_model(self):
+        return self.script.model_name
+
+    def run(self, cell, output_file):
+        os.makedirs(os.path.dirname(output_file), exist_ok=True)
+        self.convert(cell["input_file"], output_file, self.api_key,
+                     batch_size=cell["batch_size"],
+                     concurrency=self.settings["concurrency"],
+                     base_url=self.settings["base_url"],
+                     telemetry_file=os.path.splitext(output_file)[0] + ".telemetry.jsonl",
+                     stream=self.settings["stream"],
+                     model=cell["model"],
+                     limiter=self.limiter,
+                     client=self.client,
+                     pack_prompts=self.settings["pack_prompts"],
+                     size_by_tokens=self.settings["size_by_tokens"],
+                     adaptive=self.settings["adaptive"])
+
+
+# Step 2: Score and validate one output file as soon as it lands
+class CellEvaluator:
+    def __init__(self, validate, canonical=False, matrix_dir=None, db_file=None):
+        self.validate = validate
+        self.canonical = canonical
+        self.matrix_dir = matrix_dir
+        self.db = ResultsDB(db_file) if db_file else None
+        self.matrices = {}
+        self.scorer = importlib.import_module("multi_search")
+        self.validator = importlib.import_module("validate_format") if validate else None
+        self.indexes = {}
+        self.lock = threading.Lock()
+
+    def indexes_for(self, input_file, ioc_type):
+        # Source lists are indexed once per input and reused by every repetition
+        with self.lock:
+            key = (input_file, ioc_type)
+            if key not in self.indexes:
+                ioc_lists = self.scorer.extract_ioc_lists({ioc_type: input_file})
+                self.indexes[key] = self.scorer.build_indexes(ioc_lists, self.canonical)
+            return self.indexes[key]
+
+    def add_matrix_row(self, cell, output_file, index, summary):
+        # One omission matrix per input file, with a row per cell grouped by provider/model
+        key = (cell["input_file"], cell["ioc_type"])
+        with self.lock:
+            if key not in self.matrices:
+                os.makedirs(self.matrix_dir, exist_ok=True)
+                stem = os.path.splitext(os.path.basename(cell["input_file"]))[0]
+                path = os.path.join(self.matrix_dir, f"{stem}.{cell['ioc_type']}{MATRIX_SUFFIX}")
+                self.matrices[key] = OmissionMatrixWriter(path, index.iocs, cell["ioc_type"])
+            meta = {"run": output_file, "group": f"{cell['provider']}/{cell['model']}", "provider": cell["provider"],
+                    "model": cell["model"], "batch_size": cell["batch_size"], "repetition": cell["run"]}
+            self.matrices[key].add_run(meta, positions_for(index, summary["omitted"]),
+                                       positions_for(index, summary["repeated"]))
+
+    def add_db_run(self, cell, output_file, score, summary):
+        # Each cell is its own run in the results database, labelled with its provider
+        run_id = self.db.start_run("run_matrix", model=cell["model"], ioc_type=cell["ioc_type"],
+                                   stix_dir=os.path.dirname(output_file), label=cell["provider"],
+                                   batch_size=cell["batch_size"], repetition=cell["run"], canonical=self.canonical)
+        types = score["types"][cell["ioc_type"]]
+        self.db.add_file(run_id, output_file, score["matched_iocs"], score["total_iocs"], score["percentage"],
+                         outcome_rows(cell["ioc_type"], types["omitted"], types["repeated"]),
+                         score["unexpected_patterns"], score.get("parse_error") or (summary or {}).get("error"),
+                         is_valid=summary.get("is_valid", False) if summary else None,
+                         seconds=summary.get("seconds") if summary else None,
+                         errors=summary.get("errors", []) if summary else (),
+                         warnings=summary.get("warnings", []) if summary else ())
+        self.db.finish_run(run_id)
+
+    def close(self):
+        if self.db:
+            self.db.close()
+
+    def evaluate(self, cell, output_file):
+        path = output_file if os.path.exists(output_file) else manifest_path_for(output_file)
+        indexes = self.indexes_for(cell["input_file"], cell["ioc_type"])
+        score = self.scorer.score_stix_file(indexes, path)
+        if self.matrix_dir:
+            self.add_matrix_row(cell, output_file, indexes[cell["ioc_type"]], score["types"][cell["ioc_type"]])
+        row = {
+            "matched_iocs": score["matched_iocs"],
+            "total_iocs": score["total_iocs"],
+            "percentage": score["percentage"],
+            "omitted": len(score["types"][cell["ioc_type"]]["omitted"]),
+            "repeated": len(score["types"][cell["ioc_type"]]["repeated"]),
+            "unexpected": len(score["unexpected_patterns"]),
+        }
+        if "parse_error" in score:
+            row["parse_error"] = score["parse_error"]
+        summary = None
+        if self.validator:
+            paths = self.validator.shard_paths(path) if path.endswith(self.validator.MANIFEST_SUFFIX) else [path]
+            fast = self.validate == "fast"
+            summaries = [self.validator.validate_stix_file(fast, p) for p in paths]
+            summary = summaries[0] if len(summaries) == 1 else self.validator.merge_shard_summaries(
+                os.path.basename(output_file), summaries)
+            row["is_valid"] = summary.get("is_valid", False)
+            row["validation_errors"] = len(summary.get("errors", [])) + ("error" in summary)
+        if self.db:
+            self.add_db_run(cell, output_file, score, summary)
+        return row
+
+
+# Step 3: Run every cell, evaluating each output while the rest are still converting
+def run_matrix(spec, results_file):
+    cells = expand_cells(spec)
+    lanes = {name: ProviderLane(name, settings) for name, settings in spec["providers"].items()}
+    evaluator = CellEvaluator(spec["validate"], spec["canonical"], spec["matrix_dir"], spec["results_db"])
+    eval_pool = ThreadPoolExecutor(max_workers=spec["eval_workers"], thread_name_prefix="eval")
+    results_lock = threading.Lock()
+    rows = []
+
+    def record(row):
+        with results_lock:
+            rows.append(row)
+            with open(results_file, 'a') as f:
+                f.write(json.dumps(row) + "\n")
+        status = "✅" if row["status"] == "ok" else "⚠️"
+        print(f"{status} [{len(rows)}/{len(cells)}] {row['provider']}/{row['model']} "
+              f"{os.path.basename(row['input_file'])} b{row['batch_size']} run {row['run']}: "
+              f"{row.get('percentage', '-')}% matched ({row['status']})")
+
+    def evaluate(row, output_file):
+        start = time.perf_counter()
+        try:
+            row.update(evaluator.evaluate(row, output_file))
+        except Exception as e:
+            row["status"] = "eval_failed"
+            row["error"] = f"{type(e).__name__}: {e}"
+        row["eval_seconds"] = round(time.perf_counter() - start, 3)
+        record(row)
+
+    def convert(lane, row, output_file):
+        start = time.perf_counter()
+        try:
+            if spec["skip_existing"] and output_exists(output_file):
+                row["status"] = "ok"
+                row["skipped"] = True
+            else:
+                lane.run(row, output_file)
+                row["status"] = "ok"
+        except Exception as e:
+            row["status"] = "failed"
+            row["error"] = f"{type(e).__name__}: {e}"
+        row["convert_seconds"] = round(time.perf_counter() - start, 3)
+        if row["status"] == "ok":
+            return eval_pool.submit(evaluate, row, output_file)
+        record(row)
+        return None
+
+    print(f"🧪 Running {len(cells)} cells across {', '.join(lanes)}")
+    conversions = []
+    for cell in cells:
+        lane = lanes[cell["provider"]]
+        model = cell["model"] or lane.default_model()
+        output_file = cell_output_file(spec["output_dir"], cell, model)
+        row = {**cell, "model": model, "output_file": output_file}
+        conversions.append(lane.pool.submit(convert, lane, row, output_file))
+
+    evaluations = [future.result() for future in conversions]
+    for future in evaluations:
+        if future is not None:
+            future.result()
+    for lane in lanes.values():
+        lane.pool.shutdown()
+    eval_pool.shutdown()
+    evaluator.close()
+
+    ok = sum(row["status"] == "ok" for row in rows)
+    print(f"\n✅ {ok}/{len(cells)} cells finished; results appended to {results_file}")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run conversion trials over a matrix of providers, models, "
+                                                 "inputs, batch sizes and repetitions")
+    parser.add_argument("spec", nargs="?", help="JSON experiment spec")
+    parser.add_argument("--results", default="matrix_results.jsonl", help="JSONL file to append one row per cell to")
+    parser.add_argument("--dry-run", action="store_true", help="list the cells without running them")
+    parser.add_argument("--example", action="store_true", help="print an example spec and exit")
+    args = parser.parse_args()
+
+    if args.example or not args.spec:
+        print(json.dumps(EXAMPLE_SPEC, indent=2))
+    elif args.dry_run:
+        for cell in expand_cells(load_spec(args.spec)):
+            print(json.dumps(cell))
+    else:
+        run_matrix(load_spec(args.spec), args.results)
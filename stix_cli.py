@@ -0,0 +1,164 @@
+import os
+import sys
+import time
+import argparse
+import importlib
+
+# Everything below imports its script inside the subcommand, so `evaluate`
+# never loads a provider SDK and only a full (non --fast) `validate` loads
+# stix2validator. The settings the scripts keep under __main__ become command-line options.
+# The repo ships no packaging (no pyproject.toml or setup.py), so this runs as
+# `python stix_cli.py <subcommand>` from the checkout like the other scripts.
+
+RESULTS_DB = "stix_results.sqlite"
+API_KEY_ENV = {"openai": "OPENAI_API_KEY", "gemini": "GEMINI_API_KEY"}
+IOC_TYPES = ["ip", "url", "md5", "sha1", "sha256"]
+
+
+def cmd_convert(args):
+    from stix_conversion import PROVIDERS
+    script_name, convert_name = PROVIDERS[args.provider]
+    script = importlib.import_module(script_name)
+
+    if args.dry_run:
+        # Batches and token estimates only; no client is made, so the SDK is never imported
+        import json
+        from prompt_packer import TokenBudget, pack_batch
+        from batch_planner import BatchPlanner
+        from stix_conversion import extract_list_payload
+        with open(args.input, 'r') as f:
+            data = extract_list_payload(json.load(f))
+        provider = script.PROVIDER
+        model = args.model or provider.model_name
+        budget = TokenBudget(provider.system_prompt, model, args.pack_prompts) if args.size_by_tokens else None
+        batches = list(BatchPlanner(data, args.batch_size, budget).batches.values())
+        pack = pack_batch if args.pack_prompts else (lambda batch: batch)
+        tokens = sum(provider.estimate_batch_tokens(pack(batch)) for batch in batches)
+        sizes = f"{min(map(len, batches))}-{max(map(len, batches))}" if batches else "0"
+        print(f"🧪 {len(data)} items in {len(batches)} batches of {sizes}, ~{tokens} tokens per run "
+              f"with {model}; {args.runs} runs into {args.output_dir}")
+        if args.adaptive:
+            print(f"📐 Batches start at {args.batch_size} items and are resized during the run, never above that")
+        return 0
+
+    api_key = os.environ.get(args.api_key_env or API_KEY_ENV[args.provider])
+    if not api_key:
+        print(f"❌ Set {args.api_key_env or API_KEY_ENV[args.provider]} to the {args.provider} API key")
+        return 2
+    cache = memo = None
+    if args.cache_dir:
+        from response_cache import ResponseCache
+        cache = ResponseCache(args.cache_dir, refresh=args.refresh_cache)
+    if args.memo_file:
+        from ioc_memo import IocMemo
+        memo = IocMemo(args.memo_file, args.memo_ttl_days * 24 * 3600, args.memo_refresh_share)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    convert = getattr(script, convert_name)
+    for i in range(args.first_run, args.first_run + args.runs):
+        output_file = os.path.join(args.output_dir, f"stix_output_{i:03}.json")
+        convert(args.input, output_file, api_key, batch_size=args.batch_size, concurrency=args.concurrency,
+                requests_per_minute=args.rpm, tokens_per_minute=args.tpm, base_url=args.base_url, cache=cache,
+                resume=args.resume, telemetry_file=args.telemetry, stream=args.stream, shard_bytes=args.shard_bytes,
+                repair_rounds=args.repair_rounds, memo=memo, model=args.model, pack_prompts=args.pack_prompts,
+                size_by_tokens=args.size_by_tokens, adaptive=args.adaptive)
+        if i < args.first_run + args.runs - 1:
+            time.sleep(1)
+    return 0
+
+
+def cmd_evaluate(args):
+    sources = {ioc_type: getattr(args, ioc_type) for ioc_type in IOC_TYPES}
+    if not any(sources.values()):
+        print(f"❌ Give at least one source list ({', '.join('--' + t for t in IOC_TYPES)})")
+        return 2
+    import multi_search as scorer
+    scorer.evaluate_stix_directory(scorer.extract_ioc_lists(sources), args.stix_dir, args.output,
+                                   workers=args.workers, store_file=args.store, canonical=args.canonical,
+                                   compact=args.compact, matrix_file=args.matrix, matrix_group=args.group,
+                                   db_file=None if args.no_db else args.db, model=args.model or args.group)
+    return 0
+
+
+def cmd_validate(args):
+    import validate_format as validator
+    validator.evaluate_stix_directory(args.stix_dir, args.output, workers=args.workers, store_file=args.store,
+                                      fast=args.fast, db_file=None if args.no_db else args.db, model=args.model)
+    return 0
+
+
+def add_run_options(parser):
+    parser.add_argument("--db", default=RESULTS_DB, help=f"results database to append the run to (default: {RESULTS_DB})")
+    parser.add_argument("--no-db", action="store_true", help="do not record the run in the results database")
+    parser.add_argument("--model", help="model that produced these files, recorded with the run")
+    parser.add_argument("--output", help="also write the per-file summaries as JSON")
+    parser.add_argument("--store", help="per-file results store reused on the next run")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="stix_cli", description="Convert IOC lists to STIX with an LLM, "
+                                                                   "then score and validate the output")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    convert = commands.add_parser("convert", help="convert an IOC list to STIX bundles, one file per run")
+    convert.add_argument("provider", choices=sorted(API_KEY_ENV))
+    convert.add_argument("input", help="IOC source file (JSON list, or a dict holding one)")
+    convert.add_argument("--output-dir", default="stix_output")
+    convert.add_argument("--runs", type=int, default=1, help="repeated conversions of the same input (default: 1)")
+    convert.add_argument("--first-run", type=int, default=1, help="number of the first stix_output_NNN.json")
+    convert.add_argument("--model", help="model name (default: the script's model_name)")
+    convert.add_argument("--api-key-env", help="environment variable holding the API key "
+                                               "(default: OPENAI_API_KEY / GEMINI_API_KEY)")
+    convert.add_argument("--base-url")
+    convert.add_argument("--batch-size", type=int, default=25)
+    convert.add_argument("--concurrency", type=int, default=1, help="batches in flight at once")
+    convert.add_argument("--pack-prompts", action="store_true", help="send only the IOC and context fields, as compact JSON")
+    convert.add_argument("--size-by-tokens", action="store_true",
+                         help="also cap each batch by its estimated tokens against the model's limits")
+    convert.add_argument("--adaptive", choices=["throughput", "cost"],
+                         help="resize batches (never above --batch-size) during the run from omissions and latency")
+    convert.add_argument("--rpm", type=int, help="requests-per-minute cap")
+    convert.add_argument("--tpm", type=int, help="tokens-per-minute cap")
+    convert.add_argument("--stream", action="store_true")
+    convert.add_argument("--cache-dir", help="reuse identical model responses from this directory")
+    convert.add_argument("--refresh-cache", action="store_true")
+    convert.add_argument("--resume", action="store_true", help="skip batches journaled by a crashed run")
+    convert.add_argument("--repair-rounds", type=int, default=0)
+    convert.add_argument("--memo-file")
+    convert.add_argument("--memo-ttl-days", type=float, default=30)
+    convert.add_argument("--memo-refresh-share", type=float, default=0.0)
+    convert.add_argument("--shard-bytes", type=int)
+    convert.add_argument("--telemetry", help=".jsonl file for per-batch timings and tokens")
+    convert.add_argument("--dry-run", action="store_true", help="show the batches and token estimate without calling the model")
+    convert.set_defaults(func=cmd_convert)
+
+    evaluate = commands.add_parser("evaluate", help="score STIX output against the source IOC lists")
+    evaluate.add_argument("stix_dir")
+    for ioc_type in IOC_TYPES:
+        evaluate.add_argument(f"--{ioc_type}", metavar="FILE", help=f"{ioc_type} source list")
+    evaluate.add_argument("--canonical", action="store_true",
+                          help="match IOCs the model rewrote (IP notation, hash case, URL encoding)")
+    evaluate.add_argument("--compact", action="store_true",
+                          help="keep the source IOCs in packed arrays: slower, but far smaller for multi-million-IOC lists")
+    evaluate.add_argument("--matrix", help="append each file's omissions to this runs x IOCs matrix")
+    evaluate.add_argument("--group", help="label for these runs in the matrix, e.g. the model name")
+    add_run_options(evaluate)
+    evaluate.set_defaults(func=cmd_evaluate)
+
+    validate = commands.add_parser("validate", help="check STIX output with stix2-validator")
+    validate.add_argument("stix_dir")
+    validate.add_argument("--fast", action="store_true",
+                          help="check Indicator objects in-process and send only suspicious ones to stix2validator")
+    add_run_options(validate)
+    validate.set_defaults(func=cmd_validate)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
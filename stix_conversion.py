@@ -0,0 +1,282 @@
+import json
+import os
+import time
+import uuid
+import asyncio
+from datetime import datetime
+from itertools import chain
+from async_dispatch import RateLimiter, dispatch_batches, estimate_tokens
+from batch_journal import BatchJournal, journal_seed
+from bundle_writer import write_stix_bundle, manifest_path_for
+from batch_telemetry import BatchTelemetry
+from batch_repair import REPAIR_BASE, drop_malformed, find_missing, plan_repairs
+from prompt_packer import TokenBudget, PackedBatch, pack_batch, format_batch, item_reply_tokens
+from batch_planner import AdaptiveBatchSize, BatchPlanner
+
+# The conversion run shared by gpt_stix.py and gemini_stix.py: batching,
+# caching, journaling, repairs and the final bundle. Each script only
+# describes how one batch is sent to its provider and how the reply is read.
+
+# Conversion script and entry point for each provider
+PROVIDERS = {
+    "openai": ("gpt_stix", "convert_to_stix_via_chatgpt"),
+    "gemini": ("gemini_stix", "convert_to_stix_via_gemini"),
+}
+
+
+def utc_timestamp():
+    now = datetime.utcnow()
+    return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+
+# Give one indicator a unique ID and the run's created/modified/valid_from time
+def stamp_indicator(object, timestamp_with_ms):
+    object["id"] = f"indicator--{uuid.uuid4()}"
+    object["created"] = timestamp_with_ms
+    object["modified"] = timestamp_with_ms
+    object["valid_from"] = timestamp_with_ms
+    return object
+
+def extract_list_payload(obj):
+    """Returns the first list found in the top-level keys of a dict, or the object itself if it's a list."""
+    if isinstance(obj, list):
+        return obj
+    elif isinstance(obj, dict):
+        for v in obj.values():
+            if isinstance(v, list):
+                return v
+    return []
+
+
+# What a conversion script tells the shared run about its provider
+class ConversionProvider:
+    def __init__(self, name, model_name, system_prompt, cache_key, decode_reply, make_client, make_async_client,
+                 generate, generate_async, stream, stream_async):
+        """
+        cache_key(batch, model) keys a batch's reply in the response cache;
+        decode_reply(text) returns the indicators in a reply or raises.
+        make_async_client(api_key, base_url) is used as an async context
+        manager, once per event loop. The four send functions take
+        (client, batch, batch_number, cache, telemetry, model) and return
+        the reply text (or, streaming, the decoded indicators).
+        """
+        self.name = name
+        self.model_name = model_name
+        self.system_prompt = system_prompt
+        self.cache_key = cache_key
+        self.decode_reply = decode_reply
+        self.make_client = make_client
+        self.make_async_client = make_async_client
+        self.generate = generate
+        self.generate_async = generate_async
+        self.stream = stream
+        self.stream_async = stream_async
+
+    def estimate_batch_tokens(self, batch):
+        # Prompt plus one indicator per item
+        return estimate_tokens(self.system_prompt + format_batch(batch)) + sum(map(item_reply_tokens, batch))
+
+
+# The response cache as one provider and model see it
+class BatchCache:
+    def __init__(self, cache, cache_key, model):
+        self.cache = cache
+        self.cache_key = cache_key
+        self.model = model
+
+    def key(self, batch):
+        # Packed batches are keyed by the text sent, so they never reuse a reply to the full prompt
+        return self.cache_key(format_batch(batch) if isinstance(batch, PackedBatch) else batch, self.model)
+
+    def load(self, batch, batch_number):
+        content = self.cache.get(self.key(batch))
+        if content is not None:
+            print(f"💾 Reused cached response for batch {batch_number}")
+        return content
+
+    def store(self, batch, content):
+        if content is not None:
+            self.cache.put(self.key(batch), content)
+
+
+# Parse one batch response into a list of indicators, saving it to disk if it is unusable
+def parse_batch_response(batch_num, stix_text, decode_reply, output_file=None):
+    if isinstance(stix_text, list):
+        # Already decoded while streaming
+        return stix_text
+    if isinstance(stix_text, Exception):
+        print(f"⚠️ Batch {batch_num} failed after retries: {stix_text}")
+        stix_text = str(stix_text)
+    stix_text = stix_text or ""
+    try:
+        parsed = decode_reply(stix_text)
+        if not isinstance(parsed, list):
+            raise ValueError("Expected top-level JSON array of indicator objects.")
+        return parsed
+
+    except Exception as e:
+        print(f"⚠️ Failed to parse batch {batch_num}: {e}")
+        # Kept beside the output file, so runs writing to different files never overwrite each other's
+        dump_file = f"{output_file}.failed_batch_{batch_num}.txt" if output_file else f"failed_batch_{batch_num}.txt"
+        with open(dump_file, "w") as err_file:
+            err_file.write(stix_text)
+        print(f"📝 Saved raw response to {dump_file}")
+        return None
+
+
+# Send the pending batches concurrently, handing each response to on_result as it lands
+def send_concurrently(provider, api_key, numbered_batches, concurrency, on_result, limiter, base_url=None,
+                      cache=None, telemetry=None, stream=False, model=None):
+    generate = provider.stream_async if stream else provider.generate_async
+
+    async def run():
+        # A client per event loop, as async clients cannot be shared across loops
+        async with provider.make_async_client(api_key, base_url) as client:
+            await dispatch_batches(
+                [batch for _, batch in numbered_batches],
+                lambda batch, batch_number: generate(client, batch, batch_number, cache, telemetry, model),
+                concurrency=concurrency,
+                limiter=limiter,
+                token_estimate=provider.estimate_batch_tokens,
+                batch_numbers=[batch_num for batch_num, _ in numbered_batches],
+                on_result=on_result,
+                telemetry=telemetry,
+            )
+    asyncio.run(run())
+
+
+# Main function: convert one input file into one STIX bundle through a provider
+def convert_with(provider, input_file, output_file, api_key, batch_size=25, concurrency=1,
+                 requests_per_minute=None, tokens_per_minute=None, base_url=None, cache=None, resume=False,
+                 telemetry_file=None, stream=False, shard_bytes=None, repair_rounds=0,
+                 repair_batch_size=5, memo=None, model=None, limiter=None, client=None,
+                 pack_prompts=False, size_by_tokens=False, adaptive=None):
+    with open(input_file, 'r') as f:
+        full_input = json.load(f)
+
+    data = extract_list_payload(full_input)
+    model = model or provider.model_name
+    limiter = limiter or RateLimiter(requests_per_minute, tokens_per_minute)
+    batch_cache = BatchCache(cache, provider.cache_key, model) if cache is not None else None
+    journal_file = f"{output_file}.journal"
+    memoized = []
+    seed = None
+    if memo is not None:
+        # A resumed run refreshes the same memoized IOCs as the run it picks up, so its batches still match
+        seed = journal_seed(journal_file) if resume else None
+        if seed is None:
+            seed = memo.run_seed()
+        # IOCs converted by an earlier run skip the model; only the rest are batched
+        memoized, data, refreshed = memo.split(data, model, seed)
+        print(f"🧠 Reused {len(memoized)} memoized indicators; sending {len(data)} items "
+              f"({refreshed} forced refreshes)")
+    # batch_size caps each batch, adaptive ones included; the token budget and the adaptive size can make it smaller
+    budget = TokenBudget(provider.system_prompt, model, pack_prompts) if size_by_tokens else None
+    planner = BatchPlanner(data, batch_size, budget,
+                           AdaptiveBatchSize(batch_size, maximum=batch_size, objective=adaptive) if adaptive else None,
+                           provider.system_prompt)
+
+    # Every finished batch is journaled, so a crash only loses the batches in flight
+    journal = BatchJournal(journal_file, planner.fingerprint(), resume=resume, seed=seed)
+    pending = planner.resume(journal)
+    done = journal.completed_batches()
+    if done:
+        print(f"⏩ Resuming: {len(done)} batches already converted")
+
+    failed_batches = []
+    telemetry = BatchTelemetry(telemetry_file, run=os.path.basename(output_file))
+    batch_items = planner.batches
+
+    def record_batch(batch_num, stix_text):
+        start = time.perf_counter()
+        parsed = parse_batch_response(batch_num, stix_text, provider.decode_reply, output_file)
+        if parsed is not None and repair_rounds:
+            parsed = drop_malformed(batch_num, parsed)
+        parse_seconds = round(time.perf_counter() - start, 6)
+        if parsed is None:
+            # A failed repair batch is simply retried in the next round
+            if batch_num < REPAIR_BASE:
+                failed_batches.append(batch_num)
+            status = "failed" if isinstance(stix_text, Exception) else "parse_error"
+        else:
+            journal.append(batch_num, parsed, planner.spans.get(batch_num))
+            status = "ok"
+        telemetry.finish(batch_num, status=status, items_in=len(batch_items[batch_num]),
+                         indicators_out=len(parsed or []), parse_seconds=parse_seconds)
+        planner.observe(batch_num, parsed, telemetry.records[-1])
+
+    def run_batches(numbered_batches, cache):
+        if pack_prompts:
+            # Only the fields the conversion needs are sent; batch_items keeps the full records
+            numbered_batches = [(batch_num, pack_batch(batch)) for batch_num, batch in numbered_batches]
+        # Cached replies are served up front, so they are never held back by the rate limiter;
+        # the send functions only store the replies to batches that missed
+        uncached = []
+        for batch_num, batch in numbered_batches:
+            cached = cache.load(batch, batch_num) if cache is not None else None
+            if cached is None:
+                uncached.append((batch_num, batch))
+            else:
+                telemetry.update(batch_num, cached=True)
+                record_batch(batch_num, cached)
+        numbered_batches = uncached
+        if not numbered_batches:
+            return
+        if concurrency > 1:
+            send_concurrently(provider, api_key, numbered_batches, concurrency, record_batch, limiter, base_url,
+                              cache, telemetry, stream, model)
+        else:
+            # A client passed in (e.g. by run_matrix) is shared with other runs
+            sync_client = client or provider.make_client(api_key, base_url)
+            generate = provider.stream if stream else provider.generate
+            for batch_num, batch in numbered_batches:
+                limiter.wait(provider.estimate_batch_tokens(batch))
+                start = time.perf_counter()
+                stix_text = generate(sync_client, batch, batch_num, cache, telemetry, model)
+                telemetry.update(batch_num, request_seconds=round(time.perf_counter() - start, 6))
+                record_batch(batch_num, stix_text)
+
+    for wave in planner.waves(pending, concurrency):
+        run_batches(wave, batch_cache)
+    if planner.adaptive:
+        print(f"📐 Batch size settled at {planner.adaptive.size} items")
+
+    # Re-request only the items no indicator covers, in small batches; repairs
+    # skip the cache so each round gets a fresh answer
+    for round_num in range(1, repair_rounds + 1):
+        missing = find_missing(data, journal.iter_indicators())
+        if not missing:
+            break
+        repairs = plan_repairs(missing, journal.completed_batches(), repair_batch_size)
+        batch_items.update(repairs)
+        print(f"🔧 Repair round {round_num}/{repair_rounds}: re-requesting {len(missing)} items in {len(repairs)} batches")
+        run_batches(list(repairs.items()), None)
+    if repair_rounds:
+        missing = find_missing(data, journal.iter_indicators())
+        if missing:
+            print(f"⚠️ {len(missing)} items still missing after {repair_rounds} repair rounds")
+        else:
+            # Items of batches that failed outright were recovered by the repairs
+            failed_batches.clear()
+
+    # Build the final STIX bundle from the journal, one batch in memory at a time
+    timestamp_with_ms = utc_timestamp()
+    indicators = (stamp_indicator(obj, timestamp_with_ms) for obj in chain(journal.iter_indicators(), memoized))
+    count = write_stix_bundle(output_file, indicators, shard_bytes)
+
+    if memo is not None:
+        learned = memo.learn(data, journal.iter_indicators(), model)
+        memo.flush()
+        print(f"🧠 Memoized indicators for {learned}/{len(data)} converted items")
+
+    if failed_batches:
+        print(f"📒 Kept {journal.path} so a resumed run can retry batches {sorted(failed_batches)}")
+    else:
+        journal.remove()
+
+    if shard_bytes:
+        print(f"Saved {count} indicators in shards listed by {manifest_path_for(output_file)}")
+    else:
+        print(f"Saved {count} indicators to {output_file}")
+    telemetry.print_summary()
+    if telemetry_file:
+        telemetry.write_prometheus(os.path.splitext(telemetry_file)[0] + ".prom")
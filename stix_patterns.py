@@ -0,0 +1,94 @@
+import re
+from functools import lru_cache
+from ioc_canon import canonicalise, canonical_ioc
+
+# Object paths each evaluator accepts as a match for its IOC type
+IP_PATHS = frozenset({"ipv4-addr:value", "ipv6-addr:value"})
+URL_PATHS = frozenset({"url:value"})
+MD5_PATHS = frozenset({"file:hashes.MD5"})
+SHA1_PATHS = frozenset({"file:hashes.SHA1", "file:hashes.SHA-1"})
+SHA256_PATHS = frozenset({"file:hashes.SHA256", "file:hashes.SHA-256"})
+
+# A single comparison: object path, then either `= 'value'` or `IN ('a', 'b', ...)`
+_STRING = r"'(?:[^'\\]|\\.)*'"
+_COMPARISON_RE = re.compile(
+    r"([a-z0-9][a-z0-9-]*:[^\s=!<>()\[\]]+(?:\[[^\]]*\][^\s=!<>()\[\]]*)*)\s*"
+    r"(?:=\s*(" + _STRING + r")|IN\s*\(\s*((?:" + _STRING + r"\s*,?\s*)+)\))"
+)
+_STRING_RE = re.compile(_STRING)
+
+
+def _unquote(literal):
+    return literal[1:-1].replace("\\'", "'").replace("\\\\", "\\")
+
+
+def _normalise_path(path):
+    # file:hashes.'MD5' and file:hashes.md5 both mean file:hashes.MD5
+    path = path.replace("'", "")
+    if ":hashes." in path:
+        prefix, algorithm = path.split(":hashes.", 1)
+        path = f"{prefix}:hashes.{algorithm.upper()}"
+    return path
+
+
+# Step 1: Pull (object_path, value) pairs out of a STIX pattern string
+@lru_cache(maxsize=100_000)
+def parse_pattern_values(pattern):
+    """
+    Returns a tuple of (object_path, value) pairs for every equality or IN
+    comparison in the pattern, e.g. "[ipv4-addr:value = '1.1.1.1']" gives
+    (("ipv4-addr:value", "1.1.1.1"),). Unparseable patterns give ().
+    """
+    values = []
+    for match in _COMPARISON_RE.finditer(pattern):
+        path = _normalise_path(match.group(1))
+        if match.group(2) is not None:
+            values.append((path, _unquote(match.group(2))))
+        else:
+            for literal in _STRING_RE.findall(match.group(3)):
+                values.append((path, _unquote(literal)))
+    return tuple(values)
+
+
+# Step 2: Exact-value index over the source IOC list
+class IocIndex:
+    """
+    Hash index of source IOCs, matched against parsed pattern values.
+    Exposes the same find_all/find_first interface as IocMatcher.
+    With canonical=True both sides are canonicalised (see ioc_canon).
+    """
+
+    def __init__(self, ioc_list, object_paths, canonical=False):
+        self.iocs = list(ioc_list)
+        self.object_paths = frozenset(object_paths)
+        self.canonical = canonical
+        self._positions = {}
+        for idx, ioc in enumerate(self.iocs):
+            self._positions.setdefault(canonicalise(ioc) if canonical else ioc, []).append(idx)
+        # Every occurrence after the first, so distinct_positions need not group the list again
+        self.repeat_positions = frozenset(idx for positions in self._positions.values() for idx in positions[1:])
+
+    def __len__(self):
+        return len(self.iocs)
+
+    def positions_of(self, value):
+        if self.canonical:
+            value = canonical_ioc(value)
+        return list(self._positions.get(value, ()))
+
+    def find_all(self, pattern):
+        return self.find_values(parse_pattern_values(pattern))
+
+    def find_values(self, values):
+        """Same as find_all, for (object_path, value) pairs that are already parsed."""
+        found = set()
+        for path, value in values:
+            if path in self.object_paths:
+                if self.canonical:
+                    value = canonical_ioc(value)
+                found.update(self._positions.get(value, ()))
+        return found
+
+    def find_first(self, pattern):
+        found = self.find_all(pattern)
+        return min(found) if found else None
@@ -0,0 +1,143 @@
+import json
+import os
+
+CHUNK_SIZE = 1 << 16
+MANIFEST_SUFFIX = ".manifest.json"
+_WHITESPACE = " \t\n\r"
+
+
+class StixStreamError(ValueError):
+    """Raised after the last recoverable object when a bundle is truncated or malformed."""
+
+    def __init__(self, message, recovered):
+        super().__init__(f"{message} (recovered {recovered} objects)")
+        self.message = message
+        self.recovered = recovered
+
+
+class _Buffer:
+    def __init__(self, f):
+        self.f = f
+        self.text = ""
+        self.pos = 0
+        self.base = 0
+        self.eof = False
+
+    def fill(self):
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop what has already been consumed so the buffer stays small
+        self.base += self.pos
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"expected {' or '.join(repr(c) for c in chars)} at offset {self.base + self.pos}, got {char or 'end of file'!r}")
+        self.pos += 1
+        return char
+
+    def decode(self, decoder):
+        self.peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.text, self.pos)
+                # A value ending exactly at the buffer edge may continue in the next chunk
+                if end < len(self.text) or self.eof or not self.fill():
+                    self.pos = end
+                    return value
+                continue
+            except json.JSONDecodeError as e:
+                if not self.fill():
+                    raise ValueError(f"{e.msg} at offset {self.base + e.pos}") from None
+
+
+# Yield the entries of a bundle's top-level "objects" array one at a time
+def iter_stix_objects(stix_file_path):
+    """
+    Streams a STIX bundle and yields each entry of its "objects" array without
+    loading the whole file. If the file is truncated or malformed, every object
+    read before the damage is yielded first and StixStreamError is raised after.
+    A shard manifest is read as one bundle made of its shards, in order.
+    """
+    if stix_file_path.endswith(MANIFEST_SUFFIX):
+        yield from _iter_manifest_objects(stix_file_path)
+        return
+
+    decoder = json.JSONDecoder()
+    recovered = 0
+
+    with open(stix_file_path, 'r') as f:
+        buf = _Buffer(f)
+        try:
+            buf.expect("{")
+            if buf.peek() == "}":
+                return
+            while True:
+                key = buf.decode(decoder)
+                buf.expect(":")
+                if key == "objects" and buf.peek() == "[":
+                    buf.pos += 1
+                    if buf.peek() == "]":
+                        buf.pos += 1
+                    else:
+                        while True:
+                            yield buf.decode(decoder)
+                            recovered += 1
+                            if buf.expect(",]") == "]":
+                                break
+                else:
+                    buf.decode(decoder)
+                if buf.expect(",}") == "}":
+                    return
+        except ValueError as e:
+            raise StixStreamError(str(e), recovered) from None
+
+
+def read_manifest(manifest_path):
+    with open(manifest_path, 'r') as f:
+        return json.load(f)
+
+
+def shard_paths(manifest_path):
+    """Paths of a sharded bundle's shard files, in bundle order."""
+    folder = os.path.dirname(manifest_path)
+    return [os.path.join(folder, shard["file"]) for shard in read_manifest(manifest_path)["shards"]]
+
+
+def _iter_manifest_objects(manifest_path):
+    try:
+        shards = read_manifest(manifest_path)["shards"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise StixStreamError(f"unreadable shard manifest: {e}", 0) from None
+
+    folder = os.path.dirname(manifest_path)
+    recovered = 0
+    for shard in shards:
+        shard_path = os.path.join(folder, shard["file"])
+        if not os.path.exists(shard_path):
+            raise StixStreamError(f"missing shard {shard['file']}", recovered)
+        count = 0
+        try:
+            for obj in iter_stix_objects(shard_path):
+                count += 1
+                recovered += 1
+                yield obj
+        except StixStreamError as e:
+            raise StixStreamError(f"{shard['file']}: {e.message}", recovered) from None
+        if count != shard["objects"]:
+            raise StixStreamError(f"{shard['file']} holds {count} objects but the manifest lists {shard['objects']}",
+                                  recovered)
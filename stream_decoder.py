@@ -0,0 +1,169 @@
+import json
+import re
+import time
+
+# Characters that can change the decoder's state; everything else is skipped in bulk
+_STRUCTURAL = re.compile(r'[][{}"\\]')
+
+
+# Incremental parser for a model reply that contains an array of indicator objects
+class IndicatorStreamDecoder:
+    def __init__(self):
+        """
+        Feed the reply text as it arrives; each object directly inside the
+        indicator list is returned as soon as its closing brace is seen. The
+        list is the first JSON array whose first element is an object with a
+        "type" or "pattern" key, so text before it (a markdown fence, the
+        {"items": wrapper, or a note holding arrays of its own) is skipped.
+        Each character is scanned once however the reply is split.
+        """
+        self.buffer = ""
+        self.offset = 0            # absolute position of buffer[0] in the reply
+        self.scanned = 0           # absolute position scanned up to
+        self.depth = 0
+        self.array_depth = None    # depth just inside the candidate (or indicator) list
+        self.awaiting_first = False  # the candidate list has no element yet
+        self.locked = False        # the candidate's first object was an indicator
+        self.ignored_depth = None  # depth just inside a rejected array, until it closes
+        self.object_start = None
+        self.in_string = False
+        self.escaped = False
+        self.complete = False    # the array's closing bracket arrived
+        self.emitted = 0
+        self.bad_objects = 0
+
+    def feed(self, text):
+        """Adds the next piece of the reply and returns the objects it completed."""
+        if self.complete or not text:
+            return []
+        self.buffer += text
+        objects = []
+        pos = self.scanned - self.offset
+
+        while not self.complete:
+            if self.escaped:
+                # The escaped character may be the first one of this piece
+                if pos >= len(self.buffer):
+                    break
+                self.escaped = False
+                pos += 1
+                continue
+            match = _STRUCTURAL.search(self.buffer, pos)
+            if self.awaiting_first and self.buffer[pos:match.start() if match else len(self.buffer)].strip():
+                # A number, true/false or null first: not a list of indicators
+                self._reject_array()
+            if not match:
+                pos = len(self.buffer)
+                break
+            char = match.group()
+            pos = match.end()
+
+            if self.in_string:
+                if char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                if self.awaiting_first:
+                    self._reject_array()
+                self.in_string = True
+            elif char in "[{":
+                if self.awaiting_first and char == "[":
+                    self._reject_array()
+                self.depth += 1
+                if char == "[" and self.array_depth is None and self.ignored_depth is None:
+                    self.array_depth = self.depth
+                    self.awaiting_first = True
+                elif char == "{" and self.array_depth is not None and self.depth == self.array_depth + 1:
+                    self.awaiting_first = False
+                    self.object_start = pos - 1
+            elif char in "]}":
+                if char == "}" and self.object_start is not None and self.depth == self.array_depth + 1:
+                    objects.extend(self._decode(self.buffer[self.object_start:pos]))
+                    self.object_start = None
+                elif char == "]" and self.depth == self.array_depth:
+                    if self.locked:
+                        self.complete = True
+                    else:
+                        # Empty, or closed before any object decoded
+                        self._reject_array()
+                if char == "]" and self.depth == self.ignored_depth:
+                    self.ignored_depth = None
+                self.depth -= 1
+
+        self.scanned = self.offset + pos
+        # Keep only the unfinished object; everything before it has been handled
+        keep = self.object_start if self.object_start is not None else pos
+        self.buffer = self.buffer[keep:]
+        self.offset += keep
+        if self.object_start is not None:
+            self.object_start = 0
+        return objects
+
+    def _reject_array(self):
+        # Nothing inside this array is considered again, nested arrays included
+        self.ignored_depth = self.array_depth
+        self.array_depth = None
+        self.awaiting_first = False
+
+    def _decode(self, text):
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            # A broken first object leaves the list undecided; the next one settles it
+            self.bad_objects += 1
+            return []
+        if not self.locked:
+            if "type" not in obj and "pattern" not in obj:
+                self._reject_array()
+                return []
+            self.locked = True
+        self.emitted += 1
+        return [obj]
+
+
+# Collects one streamed reply: its text, and the indicators decoded from it so far
+class StreamedReply:
+    def __init__(self, batch_number, telemetry=None):
+        self.batch_number = batch_number
+        self.telemetry = telemetry
+        self.decoder = IndicatorStreamDecoder()
+        self.parts = []
+        self.indicators = []
+        self.started = time.perf_counter()
+
+    @property
+    def text(self):
+        return "".join(self.parts)
+
+    @property
+    def complete(self):
+        return self.decoder.complete
+
+    def add(self, delta):
+        if not delta:
+            return
+        self.parts.append(delta)
+        found = self.decoder.feed(delta)
+        if found and not self.indicators and self.telemetry is not None:
+            self.telemetry.update(self.batch_number,
+                                  first_indicator_seconds=round(time.perf_counter() - self.started, 6))
+        self.indicators.extend(found)
+
+    def finish(self, error=None):
+        """
+        Returns the decoded indicators, keeping the complete ones when the
+        reply was cut off. A reply with no indicator list comes back as raw text
+        for the usual parse-and-save path, and an error that left nothing to
+        keep is re-raised so the request can be retried.
+        """
+        if error is not None and not self.indicators:
+            raise error
+        if self.complete:
+            return self.indicators
+        if not self.indicators:
+            return self.text
+        print(f"✂️ Batch {self.batch_number} was cut off; kept {len(self.indicators)} complete indicators")
+        if self.telemetry is not None:
+            self.telemetry.update(self.batch_number, truncated=True)
+        return self.indicators
@@ -0,0 +1,159 @@
+import os
+import json
+import random
+import argparse
+import ipaddress
+import uuid
+
+# Source record shapes, matching the feeds the evaluators read
+def _ip_record(rng, ip):
+    return {
+        "ipAddress": ip,
+        "abuseConfidenceScore": rng.randint(25, 100),
+        "countryCode": rng.choice(["US", "CN", "RU", "NL", "DE", "BR", "IN"]),
+        "lastReportedAt": f"2025-0{rng.randint(1, 9)}-{rng.randint(10, 28)}T{rng.randint(10, 23)}:00:00+00:00",
+    }
+
+def _url_record(rng, url):
+    return {
+        "id": str(rng.randint(1_000_000, 9_999_999)),
+        "url": url,
+        "url_status": rng.choice(["online", "offline"]),
+        "threat": "malware_download",
+        "tags": rng.sample(["elf", "mozi", "exe", "AsyncRAT", "32-bit", "mips"], 2),
+    }
+
+def _md5_record(rng, md5):
+    return {
+        "sha256_hash": f"{rng.getrandbits(256):064x}",
+        "md5_hash": md5,
+        "file_type": rng.choice(["exe", "dll", "elf", "zip", "docx"]),
+        "signature": rng.choice(["AgentTesla", "Mirai", "Formbook", "RedLineStealer", None]),
+    }
+
+def _ips(rng, n):
+    ips = []
+    for value in rng.sample(range(1 << 32), n):
+        # A small share of IPv6 so both object paths are exercised
+        if value % 20 == 0:
+            ips.append(str(ipaddress.IPv6Address((0x2001_0db8 << 96) | value)))
+        else:
+            ips.append(str(ipaddress.IPv4Address(value)))
+    return ips
+
+def _urls(rng, n):
+    tlds = ["com", "net", "org", "ru", "cn", "xyz", "top"]
+    return [
+        f"http://{rng.getrandbits(40):x}.{rng.choice(tlds)}/{rng.getrandbits(32):x}/{rng.choice(['bin.sh', 'mozi.m', 'x.exe', 'i'])}"
+        for _ in range(n)
+    ]
+
+def _md5s(rng, n):
+    return [f"{value:032x}" for value in (rng.getrandbits(128) for _ in range(n))]
+
+IOC_KINDS = {
+    "ip": {"list_key": "data", "record": _ip_record, "generate": _ips},
+    "url": {"list_key": "urls", "record": _url_record, "generate": _urls},
+    "md5": {"list_key": "data", "record": _md5_record, "generate": _md5s},
+}
+
+def ioc_pattern(kind, ioc):
+    if kind == "ip":
+        object_type = "ipv6-addr" if ":" in ioc else "ipv4-addr"
+        return f"[{object_type}:value = '{ioc}']"
+    if kind == "url":
+        return f"[url:value = '{ioc}']"
+    return f"[file:hashes.MD5 = '{ioc}']"
+
+def _hallucination(kind, rng, source):
+    # An IOC-shaped value that is guaranteed not to be in the source list
+    while True:
+        fake = IOC_KINDS[kind]["generate"](rng, 1)[0]
+        if fake not in source:
+            return fake
+
+# Step 1: Write a source file of n IOCs in the feed's shape
+def write_source_file(kind, n, path, seed=0):
+    rng = random.Random(seed)
+    spec = IOC_KINDS[kind]
+    iocs = spec["generate"](rng, n)
+    with open(path, 'w') as f:
+        json.dump({spec["list_key"]: [spec["record"](rng, ioc) for ioc in iocs]}, f)
+    return iocs
+
+# Step 2: Write one STIX bundle with known omissions, duplicates and hallucinations
+def write_bundle(kind, iocs, path, omission_rate=0.02, duplicate_rate=0.01, hallucination_rate=0.01, seed=0):
+    """
+    Returns the ground truth for the bundle: which IOCs were left out, which
+    were emitted twice, and which patterns do not correspond to any IOC.
+    """
+    rng = random.Random(seed)
+    source = set(iocs)
+    omitted = []
+    duplicated = []
+    hallucinated = []
+    patterns = []
+
+    for ioc in iocs:
+        if rng.random() < omission_rate:
+            omitted.append(ioc)
+            continue
+        patterns.append(ioc_pattern(kind, ioc))
+        if rng.random() < duplicate_rate:
+            duplicated.append(ioc)
+            patterns.append(ioc_pattern(kind, ioc))
+    for _ in range(int(len(iocs) * hallucination_rate)):
+        pattern = ioc_pattern(kind, _hallucination(kind, rng, source))
+        hallucinated.append(pattern)
+        patterns.append(pattern)
+    rng.shuffle(patterns)
+
+    timestamp = "2025-06-15T12:00:00.000Z"
+    with open(path, 'w') as f:
+        f.write('{"type": "bundle", "id": "bundle--%s", "spec_version": "2.1", "objects": [' % uuid.UUID(int=rng.getrandbits(128)))
+        for i, pattern in enumerate(patterns):
+            f.write(",\n" if i else "\n")
+            json.dump({
+                "type": "indicator",
+                "spec_version": "2.1",
+                "id": f"indicator--{uuid.UUID(int=rng.getrandbits(128), version=4)}",
+                "created": timestamp,
+                "modified": timestamp,
+                "pattern": pattern,
+                "pattern_type": "stix",
+                "valid_from": timestamp,
+                "description": f"Synthetic {kind} indicator",
+            }, f)
+        f.write("\n]}")
+
+    return {"omitted": omitted, "duplicated": duplicated, "hallucinated": hallucinated}
+
+# Step 3: Source file plus a folder of bundles, with ground truth alongside
+def write_corpus(out_dir, kind, n, bundles=3, seed=0, **rates):
+    stix_dir = os.path.join(out_dir, f"stix_{kind}_{n}")
+    os.makedirs(stix_dir, exist_ok=True)
+    source_file = os.path.join(out_dir, f"{kind}_{n}_source.json")
+    iocs = write_source_file(kind, n, source_file, seed)
+
+    truth = {}
+    for i in range(1, bundles + 1):
+        filename = f"stix_output_{i:03}.json"
+        truth[filename] = write_bundle(kind, iocs, os.path.join(stix_dir, filename), seed=seed + i, **rates)
+    with open(os.path.join(out_dir, f"{kind}_{n}_truth.json"), 'w') as f:
+        json.dump(truth, f)
+    return source_file, stix_dir, truth
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic IOC source files and STIX bundles with known errors")
+    parser.add_argument("out_dir")
+    parser.add_argument("--kinds", default="ip,url,md5")
+    parser.add_argument("--sizes", default="1000,100000,1000000")
+    parser.add_argument("--bundles", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for kind in args.kinds.split(","):
+        for n in map(int, args.sizes.split(",")):
+            source_file, stix_dir, _ = write_corpus(args.out_dir, kind, n, args.bundles, args.seed)
+            print(f"✅ {kind} x {n}: {source_file}, {stix_dir}")
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from async_dispatch import RETRY_STATUSES, TokenBucket, call_with_backoff, dispatch_batches
+
+
+class FakeStatusError(Exception):
+    """Stands in for an SDK error carrying an HTTP status, as openai's do."""
+
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def test_results_come_back_in_input_order_whatever_order_they_finish():
+    finished = []
+
+    async def send(batch, batch_number):
+        # Each batch waits for the one after it, so they finish last to first
+        while batch_number < 4 and batch_number + 1 not in finished:
+            await asyncio.sleep(0)
+        return [item * 10 for item in batch]
+
+    results = asyncio.run(dispatch_batches([[1], [2, 3], [4], [5]], send, concurrency=4,
+                                           on_result=lambda n, result: finished.append(n)))
+    assert results == [[10], [20, 30], [40], [50]]
+    assert finished == [4, 3, 2, 1]
+
+
+def test_concurrency_caps_requests_in_flight():
+    in_flight = []
+    peak = []
+
+    async def send(batch, batch_number):
+        in_flight.append(batch_number)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.001)
+        in_flight.remove(batch_number)
+        return batch_number
+
+    results = asyncio.run(dispatch_batches(list(range(9)), send, concurrency=3, batch_numbers=range(101, 110)))
+    assert results == list(range(101, 110))
+    assert max(peak) == 3
+
+
+def test_a_batch_that_fails_comes_back_as_its_exception():
+    async def send(batch, batch_number):
+        if batch_number == 2:
+            raise ValueError("bad reply")
+        return batch
+
+    results = asyncio.run(dispatch_batches(["a", "b", "c"], send))
+    assert results[0] == "a" and results[2] == "c"
+    assert isinstance(results[1], ValueError)
+
+
+def test_retryable_statuses_are_retried_until_they_succeed():
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise FakeStatusError(429)
+        return "done"
+
+    assert asyncio.run(call_with_backoff(call, base_delay=0.001)) == "done"
+    assert len(attempts) == 3
+
+
+def test_other_errors_are_not_retried():
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise FakeStatusError(400)
+
+    assert 400 not in RETRY_STATUSES
+    with pytest.raises(FakeStatusError):
+        asyncio.run(call_with_backoff(call, base_delay=0.001))
+    assert len(attempts) == 1
+
+
+def test_retries_give_up_after_max_retries():
+    attempts = []
+
+    async def call():
+        attempts.append(1)
+        raise FakeStatusError(503)
+
+    with pytest.raises(FakeStatusError):
+        asyncio.run(call_with_backoff(call, max_retries=2, base_delay=0.001))
+    assert len(attempts) == 3
+
+
+def test_token_bucket_only_makes_callers_wait_past_its_capacity():
+    bucket = TokenBucket(600)  # 10 units a second
+    assert bucket.reserve(600) == 0.0
+    assert bucket.reserve(5) == pytest.approx(0.5, abs=0.05)
@@ -0,0 +1,51 @@
+from batch_journal import BatchJournal, input_fingerprint, journal_seed
+
+DATA = [{"ipAddress": f"10.0.0.{i}"} for i in range(6)]
+FINGERPRINT = input_fingerprint(DATA, 2)
+
+
+def indicator(n):
+    return {"type": "indicator", "pattern": f"[ipv4-addr:value = '10.0.0.{n}']"}
+
+
+def test_resume_keeps_finished_batches(tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = BatchJournal(path, FINGERPRINT, seed=7)
+    journal.append(2, [indicator(2), indicator(3)], span=(2, 4))
+    journal.append(1, [indicator(0)])
+
+    resumed = BatchJournal(path, FINGERPRINT, resume=True)
+    assert resumed.completed_batches() == {1, 2}
+    assert resumed.spans == {2: (2, 4)}
+    # Batch order, not the order they were journaled in
+    assert list(resumed.iter_indicators()) == [indicator(0), indicator(2), indicator(3)]
+    assert journal_seed(path) == 7
+
+
+def test_a_torn_last_line_is_dropped_and_appends_continue_cleanly(tmp_path):
+    path = str(tmp_path / "run.journal")
+    journal = BatchJournal(path, FINGERPRINT)
+    journal.append(1, [indicator(0)])
+    with open(path, "a") as f:
+        f.write('{"batch": 2, "items": [{"type": "indic')
+
+    resumed = BatchJournal(path, FINGERPRINT, resume=True)
+    assert resumed.completed_batches() == {1}
+    resumed.append(2, [indicator(2)])
+    assert list(BatchJournal(path, FINGERPRINT, resume=True).iter_indicators()) == [indicator(0), indicator(2)]
+
+
+def test_a_journal_for_other_batches_is_started_over(tmp_path, capsys):
+    path = str(tmp_path / "run.journal")
+    BatchJournal(path, FINGERPRINT).append(1, [indicator(0)])
+
+    other = BatchJournal(path, input_fingerprint(DATA, 3), resume=True)
+    assert other.completed_batches() == set()
+    assert "different input or batch size" in capsys.readouterr().out
+
+
+def test_without_resume_an_old_journal_is_ignored(tmp_path):
+    path = str(tmp_path / "run.journal")
+    BatchJournal(path, FINGERPRINT).append(1, [indicator(0)])
+    assert BatchJournal(path, FINGERPRINT).completed_batches() == set()
+    assert journal_seed(str(tmp_path / "missing.journal")) is None
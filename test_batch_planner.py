@@ -0,0 +1,76 @@
+from batch_planner import AdaptiveBatchSize, BatchPlanner
+
+ITEMS = [{"ipAddress": f"192.0.2.{i}"} for i in range(23)]
+
+
+def covering(items):
+    return [{"type": "indicator", "pattern": f"[ipv4-addr:value = '{item['ipAddress']}']"} for item in items]
+
+
+class JournalStub:
+    def __init__(self, spans):
+        self.spans = spans
+
+    def completed_batches(self):
+        return set(self.spans)
+
+
+def test_fixed_batches_cover_the_input_in_order():
+    planner = BatchPlanner(ITEMS, batch_size=10)
+    assert planner.spans == {1: (0, 10), 2: (10, 20), 3: (20, 23)}
+    assert [item for _, batch in sorted(planner.batches.items()) for item in batch] == ITEMS
+    assert list(planner.waves([1, 2, 3], concurrency=4)) == [[(n, planner.batches[n]) for n in (1, 2, 3)]]
+
+
+def test_fingerprint_follows_the_batching():
+    assert BatchPlanner(ITEMS, 10).fingerprint() == BatchPlanner(list(ITEMS), 10).fingerprint()
+    assert BatchPlanner(ITEMS, 10).fingerprint() != BatchPlanner(ITEMS, 5).fingerprint()
+
+
+def test_resume_leaves_only_unfinished_batches():
+    planner = BatchPlanner(ITEMS, batch_size=10)
+    assert planner.resume(JournalStub({2: None})) == [1, 3]
+
+
+class TestAdaptivePlanning:
+    def test_waves_shrink_after_omissions(self):
+        planner = BatchPlanner(ITEMS, batch_size=8, adaptive=AdaptiveBatchSize(8, minimum=2, maximum=8))
+        waves = planner.waves([], concurrency=1)
+
+        (number, batch), = next(waves)
+        assert len(batch) == 8
+        # Half the batch came back without an indicator
+        planner.observe(number, covering(batch[:4]), {"request_seconds": 1.0})
+        (_, batch), = next(waves)
+        assert len(batch) == int(8 * 0.7)
+
+    def test_sizes_never_pass_the_maximum(self):
+        planner = BatchPlanner(ITEMS, batch_size=4, adaptive=AdaptiveBatchSize(4, maximum=4))
+        sizes = []
+        for wave in planner.waves([], concurrency=2):
+            for number, batch in wave:
+                sizes.append(len(batch))
+                planner.observe(number, covering(batch), {"request_seconds": 0.1})
+        assert sum(sizes) == len(ITEMS)
+        assert max(sizes) == 4
+
+    def test_resume_recuts_only_the_gaps(self):
+        planner = BatchPlanner(ITEMS, batch_size=5, adaptive=AdaptiveBatchSize(5))
+        assert planner.resume(JournalStub({1: (0, 5), 3: (10, 15)})) == []
+        assert planner.gaps == [(5, 10), (15, 23)]
+        numbers = [number for wave in planner.waves([], concurrency=8) for number, _ in wave]
+        assert numbers[0] == 4
+        assert sorted(planner.spans[n] for n in numbers) == [(5, 10), (15, 20), (20, 23)]
+
+
+def test_adaptive_size_turns_round_when_a_step_scores_worse():
+    size = AdaptiveBatchSize(20, minimum=5, maximum=100)
+    assert size.observe(20, 0, seconds=1.0, prompt_tokens=0, completion_tokens=0) == 25
+    # 25 items took much longer than 20 did: step back down
+    assert size.observe(25, 0, seconds=5.0, prompt_tokens=0, completion_tokens=0) == 19
+    assert [h["next_size"] for h in size.history] == [25, 19]
+
+
+def test_cost_objective_scores_by_price_weighted_tokens():
+    size = AdaptiveBatchSize(10, objective="cost")
+    assert size.score(10, 99.0, prompt_tokens=100, completion_tokens=50) == 10 / 300
@@ -0,0 +1,89 @@
+import pytest
+
+from fast_validate import check_pattern, fast_check
+
+VALID = {
+    "type": "indicator",
+    "spec_version": "2.1",
+    "id": "indicator--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f",
+    "created": "2025-06-15T12:00:00.000Z",
+    "modified": "2025-06-15T12:00:00.000Z",
+    "pattern": "[ipv4-addr:value = '198.51.100.7']",
+    "pattern_type": "stix",
+    "valid_from": "2025-06-15T12:00:00Z",
+    "description": "IP address associated with malware distribution",
+}
+
+
+def indicator(**changes):
+    obj = dict(VALID, **changes)
+    return {key: value for key, value in obj.items() if value is not None}
+
+
+# Indicators the fast path must pass straight through
+VALID_CASES = {
+    "baseline": indicator(),
+    "valid_from_with_microseconds": indicator(valid_from="2025-06-15T12:00:00.123456Z"),
+    "no_description": indicator(description=None),
+    "url_pattern": indicator(pattern="[url:value = 'http://example.com/a?b=1']"),
+    "hash_pattern": indicator(pattern="[file:hashes.MD5 = 'd41d8cd98f00b204e9800998ecf8427e']"),
+    "quoted_hash_pattern": indicator(
+        pattern="[file:hashes.'SHA-256' = 'e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855']"),
+    "either_observation": indicator(pattern="[ipv4-addr:value = '198.51.100.7'] OR [domain-name:value = 'example.com']"),
+    "modified_after_created": indicator(modified="2025-06-16T08:30:15.250Z"),
+}
+
+# Indicators the fast path must hand to stix2validator
+INVALID_CASES = {
+    "created_without_fraction": indicator(created="2025-06-15T12:00:00Z"),
+    "created_microseconds": indicator(created="2025-06-15T12:00:00.000000Z"),
+    "modified_centiseconds": indicator(modified="2025-06-15T12:00:00.00Z"),
+    "created_no_zone": indicator(created="2025-06-15T12:00:00.000"),
+    "created_not_a_date": indicator(created="2025-02-30T12:00:00.000Z"),
+    "modified_before_created": indicator(modified="2025-06-14T12:00:00.000Z"),
+    "valid_from_missing": indicator(valid_from=None),
+    "spec_version_2_0": indicator(spec_version="2.0"),
+    "id_not_uuid": indicator(id="indicator--1234"),
+    "id_wrong_type": indicator(id="malware--8e2e2d2b-17d4-4cbf-938f-98ee46b3cd3f"),
+    "pattern_unclosed": indicator(pattern="[ipv4-addr:value = '198.51.100.7'"),
+    "pattern_unknown_object": indicator(pattern="[ip-addr:value = '198.51.100.7']"),
+    "pattern_hash_as_property": indicator(pattern="[file:md5 = 'd41d8cd98f00b204e9800998ecf8427e']"),
+    "pattern_unknown_property": indicator(pattern="[ipv4-addr:address = '1.1.1.1']"),
+    "pattern_unknown_hash": indicator(pattern="[file:hashes.MD6 = 'd41d8cd98f00b204e9800998ecf8427e']"),
+    "pattern_nested_property": indicator(pattern="[network-traffic:src_ref.value = '198.51.100.7']"),
+    "pattern_not_stix": indicator(pattern_type="snort"),
+    "extra_field": indicator(labels=["malicious-activity"]),
+    "not_an_indicator": indicator(type="malware"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(VALID_CASES))
+def test_valid_indicators_pass_the_fast_path(name):
+    assert fast_check(VALID_CASES[name]) == []
+
+
+@pytest.mark.parametrize("name", sorted(INVALID_CASES))
+def test_invalid_indicators_go_to_the_full_validator(name):
+    assert fast_check(INVALID_CASES[name]) != []
+
+
+def test_pattern_problems_name_the_property():
+    assert check_pattern("[file:md5 = 'd41d8cd98f00b204e9800998ecf8427e']") == (
+        "pattern: property not covered by the fast path: file:md5",)
+    assert check_pattern("[ipv4-addr:value = '1.1.1.1' AND ipv4-addr:address = '1.1.1.1']") == (
+        "pattern: property not covered by the fast path: ipv4-addr:address",)
+
+
+# The fast path is only worth having if stix2validator agrees with it
+@pytest.mark.parametrize("name", sorted(VALID_CASES))
+def test_valid_indicators_pass_stix2validator(name):
+    validate_instance = pytest.importorskip("stix2validator").validate_instance
+    assert validate_instance(VALID_CASES[name]).is_valid
+
+
+def test_no_false_accepts():
+    validate_instance = pytest.importorskip("stix2validator").validate_instance
+    cases = dict(VALID_CASES, **INVALID_CASES)
+    false_accepts = [name for name, obj in sorted(cases.items())
+                     if not fast_check(obj) and not validate_instance(obj).is_valid]
+    assert false_accepts == []
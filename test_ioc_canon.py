@@ -0,0 +1,33 @@
+import pytest
+
+from ioc_canon import canonical_ip, canonical_url, canonicalise
+
+# (as a model might write it, canonical form)
+EQUIVALENT = [
+    ("2001:0DB8:0000:0000:0000:0000:0000:0001", "2001:db8::1"),
+    ("::ffff:198.51.100.7", "198.51.100.7"),
+    (" 198.51.100.7\n", "198.51.100.7"),
+    ("D41D8CD98F00B204E9800998ECF8427E", "d41d8cd98f00b204e9800998ecf8427e"),
+    ("HTTP://Example.COM:80/a/./b/../c/", "http://example.com/a/c"),
+    ("http://example.com/%7euser/%2f?q=%2a", "http://example.com/~user/%2F?q=%2A"),
+    ("https://[2001:DB8::0001]:8443/x", "https://[2001:db8::1]:8443/x"),
+    ("ftp://user@Host.:21/", "ftp://user@host"),
+]
+
+
+@pytest.mark.parametrize("written, canonical", EQUIVALENT)
+def test_equivalent_spellings_share_a_canonical_form(written, canonical):
+    assert canonicalise(written) == canonical
+    assert canonicalise(canonical) == canonical
+
+
+def test_different_iocs_stay_different():
+    assert canonicalise("http://example.com/a") != canonicalise("http://example.com/A")
+    assert canonicalise("https://example.com:8080/") != canonicalise("https://example.com/")
+    assert canonicalise("10.0.0.1") != canonicalise("10.0.0.10")
+
+
+def test_values_of_no_known_shape_are_only_stripped():
+    assert canonicalise("  evil.example  ") == "evil.example"
+    assert canonical_ip("evil.example") is None
+    assert canonical_url("evil.example/path") is None
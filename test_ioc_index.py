@@ -0,0 +1,63 @@
+import pickle
+import random
+
+import pytest
+
+from ioc_store import CompactIocIndex, distinct_positions, exact_index
+from stix_patterns import IocIndex, IP_PATHS, MD5_PATHS, URL_PATHS
+from synthetic_corpus import IOC_KINDS, ioc_pattern
+
+KIND_PATHS = {"ip": IP_PATHS, "url": URL_PATHS, "md5": MD5_PATHS}
+
+
+def source_and_patterns(kind, seed):
+    rng = random.Random(seed)
+    iocs = IOC_KINDS[kind]["generate"](rng, 300)
+    iocs += rng.sample(iocs, 20)  # repeated entries
+    misses = IOC_KINDS[kind]["generate"](random.Random(seed + 1), 30)
+    patterns = [ioc_pattern(kind, ioc) for ioc in rng.sample(iocs, 50) + misses]
+    # Several values in one pattern, and a path the index does not cover
+    patterns.append(f"[{sorted(KIND_PATHS[kind])[0]} IN ('{iocs[0]}', '{iocs[1]}', '{misses[0]}')]")
+    patterns.append(f"[domain-name:value = '{iocs[2]}']")
+    return iocs, patterns
+
+
+@pytest.mark.parametrize("kind", sorted(KIND_PATHS))
+@pytest.mark.parametrize("canonical", [False, True])
+def test_compact_index_answers_like_the_plain_one(kind, canonical):
+    iocs, patterns = source_and_patterns(kind, seed=len(kind))
+    plain = IocIndex(iocs, KIND_PATHS[kind], canonical)
+    compact = CompactIocIndex(iocs, KIND_PATHS[kind], canonical)
+
+    for pattern in patterns:
+        assert compact.find_all(pattern) == plain.find_all(pattern), pattern
+        assert compact.find_first(pattern) == plain.find_first(pattern)
+    assert list(compact.iocs) == list(plain.iocs) == iocs
+    assert compact.iocs[-3:] == plain.iocs[-3:]
+    assert list(distinct_positions(compact)) == list(distinct_positions(plain))
+    assert compact.positions_of(iocs[-1]) == plain.positions_of(iocs[-1])
+
+
+def test_canonical_matching_sees_through_rewrites():
+    iocs = ["198.51.100.7", "2001:db8::1", "http://example.com/a", "d41d8cd98f00b204e9800998ecf8427e",
+            "::ffff:198.51.100.7"]
+    rewritten = {
+        "[ipv6-addr:value = '2001:0db8:0000:0000:0000:0000:0000:0001']": {1},
+        "[url:value = 'HTTP://EXAMPLE.com/a/']": {2},
+        "[file:hashes.MD5 = 'D41D8CD98F00B204E9800998ECF8427E']": {3},
+        "[ipv4-addr:value = '198.51.100.7']": {0, 4},
+    }
+    paths = IP_PATHS | URL_PATHS | MD5_PATHS
+    for index in (exact_index(iocs, paths, canonical=True), exact_index(iocs, paths, canonical=True, compact=True)):
+        assert {pattern: index.find_all(pattern) for pattern in rewritten} == rewritten
+        # The matched IOCs are reported as the source wrote them
+        assert index.iocs[4] == "::ffff:198.51.100.7"
+        assert list(distinct_positions(index)) == [0, 1, 2, 3]
+    assert exact_index(iocs, paths).find_all("[url:value = 'HTTP://EXAMPLE.com/a/']") == set()
+
+
+def test_compact_index_survives_pickling_into_workers():
+    iocs, patterns = source_and_patterns("ip", seed=3)
+    compact = CompactIocIndex(iocs, IP_PATHS)
+    copy = pickle.loads(pickle.dumps(compact))
+    assert [copy.find_all(p) for p in patterns] == [compact.find_all(p) for p in patterns]
@@ -0,0 +1,63 @@
+import struct
+
+import pytest
+
+from omission_matrix import OmissionMatrix, OmissionMatrixWriter, bitset
+
+IOCS = [f"198.51.100.{i}" for i in range(1, 20)]  # 19 columns: the last byte of each bitset is partial
+
+
+@pytest.fixture
+def matrix_path(tmp_path):
+    path = str(tmp_path / "runs.omx")
+    writer = OmissionMatrixWriter(path, IOCS, "ip")
+    writer.add_run({"run": "a1", "group": "model-a"}, omitted_positions=[0, 18], repeated_positions=[3])
+    writer.add_run({"run": "a2", "group": "model-a"}, omitted_positions=[0, 5], repeated_positions=[])
+    writer.add_run({"run": "b1", "group": "model-b"}, omitted_positions=[5, 6, 7], repeated_positions=[3, 18])
+    return path
+
+
+def test_rows_read_back_as_written(matrix_path):
+    matrix = OmissionMatrix(matrix_path)
+    assert (matrix.ioc_type, matrix.size, matrix.iocs) == ("ip", 19, IOCS)
+    assert [run["run"] for run in matrix.runs] == ["a1", "a2", "b1"]
+    assert matrix.iocs_in(matrix.omitted[0]) == [IOCS[0], IOCS[18]]
+    assert matrix.iocs_in(matrix.repeated[2]) == [IOCS[3], IOCS[18]]
+
+
+def test_counts_and_groups(matrix_path):
+    matrix = OmissionMatrix(matrix_path)
+    counts = matrix.omission_counts()
+    assert (counts[0], counts[5], counts[18], counts[1]) == (2, 2, 1, 0)
+    assert list(matrix.repeat_counts())[3] == 2
+
+    groups = matrix.groups("group")
+    assert groups == {"model-a": [0, 1], "model-b": [2]}
+    assert matrix.iocs_in(matrix.always_omitted(groups["model-a"])) == [IOCS[0]]
+    assert matrix.top_omitted(k=1, rows=groups["model-a"]) == [{"ioc": IOCS[0], "omitted_runs": 2, "frequency": 1.0}]
+    assert matrix.coverage([2]) == [{"run": "b1", "coverage": round(1 - 3 / 19, 6), "duplicate_rate": round(2 / 19, 6)}]
+
+
+def test_a_rerun_replaces_its_row(matrix_path):
+    OmissionMatrixWriter(matrix_path, IOCS, "ip").add_run({"run": "a1"}, [1], [])
+    matrix = OmissionMatrix(matrix_path)
+    assert len(matrix.runs) == 3
+    assert matrix.iocs_in(matrix.omitted[matrix.select(run="a1")[0]]) == [IOCS[1]]
+
+
+def test_a_different_source_list_starts_a_new_matrix(matrix_path, capsys):
+    OmissionMatrixWriter(matrix_path, IOCS[:-1], "ip")
+    assert "different source list" in capsys.readouterr().out
+    matrix = OmissionMatrix(matrix_path)
+    assert matrix.size == 18 and matrix.runs == []
+
+
+def test_a_partial_last_row_is_ignored(matrix_path):
+    with open(matrix_path, "ab") as f:
+        meta = b'{"run": "torn"}'
+        f.write(struct.pack("<I", len(meta)) + meta + b"\x01")
+    assert [run["run"] for run in OmissionMatrix(matrix_path).runs] == ["a1", "a2", "b1"]
+
+
+def test_bitset_is_little_endian_by_position():
+    assert bitset([0, 9], 10) == bytes([0b00000001, 0b00000010])
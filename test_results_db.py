@@ -0,0 +1,58 @@
+import sqlite3
+
+import pytest
+
+from results_db import SCHEMA_VERSION, ResultsDB, outcome_rows, top_omitted
+
+
+def record_run(db, model, files):
+    run_id = db.start_run("ip_search", model=model, ioc_type="ip", stix_dir="out", batch_size=25)
+    for name, omitted, repeated in files:
+        db.add_file(run_id, name, matched=10 - len(omitted), total=10, percentage=(10 - len(omitted)) * 10.0,
+                    outcomes=outcome_rows("ip", omitted, repeated), unexpected=["[ipv4-addr:value = '0.0.0.0']"])
+    db.finish_run(run_id)
+    return run_id
+
+
+def test_runs_files_and_outcomes_are_stored(tmp_path):
+    db = ResultsDB(str(tmp_path / "results.sqlite"), batch_files=2)
+    run_id = record_run(db, "gpt-4o", [
+        ("a.json", ["10.0.0.1"], {"10.0.0.2": 3}),
+        ("b.json", ["10.0.0.1", "10.0.0.3"], {}),
+        ("c.json", [], ["10.0.0.4"]),
+    ])
+
+    assert db.query("SELECT tool, model, meta, finished_at IS NOT NULL FROM runs WHERE id = ?", (run_id,)) == [
+        ("ip_search", "gpt-4o", '{"batch_size": 25}', 1)]
+    assert db.query("SELECT file, matched FROM files ORDER BY file") == [("a.json", 9), ("b.json", 8), ("c.json", 10)]
+    # Child rows land on their own file, across the flush every two files
+    assert db.query("SELECT f.file, o.ioc, o.outcome, o.count FROM ioc_outcomes o JOIN files f ON f.id = o.file_id "
+                    "ORDER BY f.file, o.ioc") == [
+        ("a.json", "10.0.0.1", "omitted", 0), ("a.json", "10.0.0.2", "repeated", 3),
+        ("b.json", "10.0.0.1", "omitted", 0), ("b.json", "10.0.0.3", "omitted", 0),
+        ("c.json", "10.0.0.4", "repeated", 2),
+    ]
+    assert db.query("SELECT COUNT(*) FROM unexpected_patterns") == [(3,)]
+    db.close()
+
+
+def test_runs_append_and_are_queried_together(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    db = ResultsDB(path)
+    record_run(db, "gpt-4o", [("a.json", ["10.0.0.1", "10.0.0.2"], {})])
+    db.close()
+
+    db = ResultsDB(path)
+    record_run(db, "gemini", [("a.json", ["10.0.0.1"], {}), ("b.json", ["10.0.0.1"], {})])
+    assert top_omitted(db) == [("ip", "10.0.0.1", 3), ("ip", "10.0.0.2", 1)]
+    assert top_omitted(db, model="gemini", limit=5) == [("ip", "10.0.0.1", 2)]
+    db.close()
+
+
+def test_a_newer_schema_is_refused(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+    conn.close()
+    with pytest.raises(ValueError, match="newer schema"):
+        ResultsDB(path)
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import stix_reader
+from bundle_writer import manifest_path_for, write_stix_bundle
+from stix_reader import StixStreamError, iter_stix_objects
+
+OBJECTS = [{"type": "indicator", "id": f"indicator--{i}", "pattern": f"[ipv4-addr:value = '10.0.0.{i}']",
+            "description": "x" * (i * 7 % 50)} for i in range(40)]
+
+
+def write_bundle(path, text):
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 16])
+def test_objects_survive_any_chunk_boundary(tmp_path, monkeypatch, chunk_size):
+    monkeypatch.setattr(stix_reader, "CHUNK_SIZE", chunk_size)
+    bundle = {"type": "bundle", "id": "bundle--1", "objects": OBJECTS, "spec_version": "2.1"}
+    path = write_bundle(tmp_path / "bundle.json", json.dumps(bundle, indent=2))
+    assert list(iter_stix_objects(path)) == OBJECTS
+
+
+def test_bundle_without_objects_yields_nothing(tmp_path):
+    assert list(iter_stix_objects(write_bundle(tmp_path / "a.json", "{}"))) == []
+    assert list(iter_stix_objects(write_bundle(tmp_path / "b.json", '{"type": "bundle", "objects": []}'))) == []
+
+
+def test_truncated_bundle_yields_what_it_can_then_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(stix_reader, "CHUNK_SIZE", 16)
+    text = json.dumps({"type": "bundle", "objects": OBJECTS})
+    # Cut in the middle of the 11th object
+    cut = text.index('"indicator--10"') + 5
+    path = write_bundle(tmp_path / "cut.json", text[:cut])
+
+    seen = []
+    with pytest.raises(StixStreamError) as error:
+        for obj in iter_stix_objects(path):
+            seen.append(obj)
+    assert seen == OBJECTS[:10]
+    assert error.value.recovered == 10
+
+
+def test_garbage_between_objects_is_reported(tmp_path):
+    path = write_bundle(tmp_path / "bad.json", '{"objects": [{"id": 1} {"id": 2}]}')
+    with pytest.raises(StixStreamError, match="recovered 1 objects"):
+        list(iter_stix_objects(path))
+
+
+def test_manifest_reads_shards_in_order(tmp_path):
+    output_file = str(tmp_path / "out.json")
+    write_stix_bundle(output_file, iter(OBJECTS), shard_bytes=1024)
+    manifest = manifest_path_for(output_file)
+    assert len(stix_reader.shard_paths(manifest)) > 1
+    assert list(iter_stix_objects(manifest)) == OBJECTS
@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from stream_decoder import IndicatorStreamDecoder, StreamedReply
+
+INDICATORS = [
+    {"type": "indicator", "pattern": "[ipv4-addr:value = '203.0.113.1']", "description": "brackets ] and } in text"},
+    {"type": "indicator", "pattern": "[url:value = 'http://example.com/a?b=[1]']", "description": "escaped \" quote"},
+    {"type": "indicator", "pattern": "[file:hashes.MD5 = 'd41d8cd98f00b204e9800998ecf8427e']",
+     "kill_chain_phases": [{"kill_chain_name": "k", "phase_name": "p"}]},
+]
+ARRAY = json.dumps(INDICATORS)
+
+REPLIES = {
+    "bare_array": ARRAY,
+    "items_wrapper": json.dumps({"items": INDICATORS}),
+    "markdown_fence": "```json\n" + json.dumps(INDICATORS, indent=2) + "\n```",
+    "note_with_number_array": 'note {"x":[1]} ' + ARRAY,
+    "note_with_object_array": 'note {"refs": [{"name": "a"}, {"more": [{"type": "x"}]}]} ' + ARRAY,
+    "empty_arrays_first": "[] and [[]] then " + ARRAY,
+    "prose_in_brackets": "Here you go [see below]:\n" + ARRAY,
+}
+
+
+def feed_in_pieces(text, size):
+    decoder = IndicatorStreamDecoder()
+    found = []
+    for start in range(0, len(text), size):
+        found.extend(decoder.feed(text[start:start + size]))
+    return decoder, found
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 64, 100_000])
+@pytest.mark.parametrize("name", sorted(REPLIES))
+def test_indicators_are_decoded_however_the_reply_is_split(name, size):
+    decoder, found = feed_in_pieces(REPLIES[name], size)
+    assert found == INDICATORS
+    assert decoder.complete
+
+
+def test_objects_arrive_as_soon_as_they_close():
+    decoder = IndicatorStreamDecoder()
+    first = json.dumps(INDICATORS[0])
+    assert decoder.feed("[" + first[:-1]) == []
+    assert decoder.feed("}, ") == [INDICATORS[0]]
+    assert not decoder.complete
+
+
+def test_a_broken_object_is_counted_and_skipped():
+    decoder, found = feed_in_pieces('[{"type": "indicator", "pattern": oops}, ' + ARRAY[1:], 3)
+    assert found == INDICATORS
+    assert decoder.bad_objects == 1
+
+
+def test_a_reply_cut_off_keeps_its_complete_indicators(capsys):
+    reply = StreamedReply(4)
+    reply.add(ARRAY[:ARRAY.index("}, {") + 3])
+    reply.add('{"type": "indicator", "pat')
+    assert not reply.complete
+    assert reply.finish() == INDICATORS[:1]
+    assert "cut off" in capsys.readouterr().out
+
+
+def test_a_reply_without_an_indicator_list_comes_back_as_text():
+    reply = StreamedReply(1)
+    reply.add('{"items": []}')
+    assert reply.finish() == '{"items": []}'
+
+
+def test_an_error_before_any_indicator_is_raised():
+    reply = StreamedReply(2)
+    reply.add('{"items": [')
+    with pytest.raises(TimeoutError):
+        reply.finish(TimeoutError("stream dropped"))
@@ -1,9 +1,11 @@
 import os
 import json
-
-url_source_file = [YOUR_SOURCE_FILE]
-stix_folder = [YOUR_FOLDER_TO_SCAN]
-summary_output_file = "url_match_summary_gpt.json"
+from ioc_matcher import IocMatcher
+from stix_patterns import IocIndex, URL_PATHS
+from ioc_store import exact_index, count_vector, distinct_positions
+from eval_pool import evaluate_files, evaluator_parser, evaluator_options
+from stix_reader import iter_stix_objects, StixStreamError
+from omission_matrix import positions_for
 
 # Step 1: Extract list of urls from the original input file
 def extract_url_list(input_file):
@@ -12,89 +14,113 @@ def extract_url_list(input_file):
     return [entry["url"] for entry in data.get("urls", []) if "url" in entry]
 
 # Step 2: Check urls in a single STIX file
-def find_urls_in_stix(url_list, stix_file_path):
-    with open(stix_file_path, 'r') as f:
-        try:
-            stix_data = json.load(f)
-        except json.JSONDecodeError:
-            print(f"⚠️ Could not parse JSON in {stix_file_path}")
-            return 0
-
+def find_urls_in_stix(url_list, stix_file_path, exact=True):
+    matcher = IocIndex(url_list, URL_PATHS) if exact else IocMatcher(url_list)
     found_urls = set()
-    for obj in stix_data.get("objects", []):
-        if obj.get("type") == "indicator":
-            pattern = obj.get("pattern", "")
-            for url in url_list:
-                if url in pattern:
-                    found_urls.add(url)
+    try:
+        for obj in iter_stix_objects(stix_file_path):
+            if obj.get("type") == "indicator":
+                pattern = obj.get("pattern", "")
+                for idx in matcher.find_all(pattern):
+                    found_urls.add(url_list[idx])
+    except StixStreamError as e:
+        print(f"⚠️ Could not parse JSON in {stix_file_path}: {e}")
 
     return len(found_urls)
 
-# Step 3: Process all STIX files in a directory
-def evaluate_stix_directory(url_list, stix_dir, output_file):
-    results = []
+# Step 3: Score a single STIX file against the url index
+def score_stix_file(matcher, filepath):
+    url_list = matcher.iocs
     total_urls = len(url_list)
-    url_set = set(url_list)
-
-    for filename in os.listdir(stix_dir):
-        if filename.endswith(".json"):
-            filepath = os.path.join(stix_dir, filename)
-            url_occurrences = {url: 0 for url in url_list}
-            unexpected_patterns = set()  # ✅ Collect unexpected pattern strings
-
-            with open(filepath, 'r') as f:
-                try:
-                    stix_data = json.load(f)
-                except json.JSONDecodeError:
-                    print(f"⚠️ Could not parse JSON in {filepath}")
-                    continue
-
-            for obj in stix_data.get("objects", []):
-                if obj.get("type") == "indicator":
-                    pattern = obj.get("pattern", "")
-                    matched = False
-                    for u in url_list:
-                        if u in pattern:
-                            url_occurrences[u] += 1
-                            matched = True
-                    if not matched:
-                        # ✅ Just save the whole pattern
-                        unexpected_patterns.add(pattern.strip())
-
-            matched_count = sum(1 for count in url_occurrences.values() if count > 0)
-            percentage = (matched_count / total_urls) * 100 if total_urls else 0
-
-            repeated_urls = [url for url, count in url_occurrences.items() if count > 1]
-            omitted_urls = [url for url, count in url_occurrences.items() if count == 0]
-
-            results.append({
-                "file": filename,
-                "matched_urls": matched_count,
-                "total_urls": total_urls,
-                "percentage": round(percentage, 2),
-                "repeated_urls": repeated_urls,
-                "omitted_urls": omitted_urls,
-                "unexpected_patterns": sorted(unexpected_patterns)  # ✅ Whole patterns
-            })
-
-            print(f"\n📄 {filename}: {matched_count}/{total_urls} matched ({round(percentage, 2)}%)")
-            if repeated_urls:
-                print(f"♻️ Repeated ({len(repeated_urls)}):")
-                for url in repeated_urls:
-                    print(f"  - {url} (count: {url_occurrences[url]})")
-            if omitted_urls:
-                print(f"❌ Omitted ({len(omitted_urls)}):")
-                for url in omitted_urls:
-                    print(f"  - {url}")
-            if unexpected_patterns:
-                print(f"❓ Unexpected patterns ({len(unexpected_patterns)}):")
-                for pattern in sorted(unexpected_patterns):
-                    print(f"  - {pattern}")
-
-    with open(output_file, 'w') as out:
-        json.dump(results, out, indent=2)
-    print(f"\n✅ Saved summary to {output_file}")
-
-
-url_list = extract_url_list(url_source_file)
-evaluate_stix_directory(url_list, stix_folder, summary_output_file)
\ No newline at end of file
+    counts = count_vector(total_urls)  # one counter per source position
+    unexpected_patterns = set()  # ✅ Collect unexpected pattern strings
+
+    # Score objects as they stream in; a damaged tail keeps what was recovered
+    parse_error = None
+    try:
+        for obj in iter_stix_objects(filepath):
+            if obj.get("type") == "indicator":
+                pattern = obj.get("pattern", "")
+                matched = matcher.find_all(pattern)
+                for idx in matched:
+                    counts[idx] += 1
+                if not matched:
+                    # ✅ Just save the whole pattern
+                    unexpected_patterns.add(pattern.strip())
+    except StixStreamError as e:
+        parse_error = str(e)
+
+    # Duplicate source entries share their first position's count
+    matched_count = 0
+    repeated_counts = {}
+    omitted_urls = []
+    for idx in distinct_positions(matcher):
+        count = counts[idx]
+        if count == 0:
+            omitted_urls.append(url_list[idx])
+            continue
+        matched_count += 1
+        if count > 1:
+            repeated_counts[url_list[idx]] = count
+    percentage = (matched_count / total_urls) * 100 if total_urls else 0
+
+    result = {
+        "file": os.path.basename(filepath),
+        "matched_urls": matched_count,
+        "total_urls": total_urls,
+        "percentage": round(percentage, 2),
+        "repeated_urls": list(repeated_counts),
+        "omitted_urls": omitted_urls,
+        "unexpected_patterns": sorted(unexpected_patterns)  # ✅ Whole patterns
+    }
+    if parse_error:
+        result["parse_error"] = parse_error
+    return result, repeated_counts
+
+# Step 4: Print the per-file report
+def print_file_result(result, repeated_counts):
+    print(f"\n📄 {result['file']}: {result['matched_urls']}/{result['total_urls']} matched ({result['percentage']}%)")
+    if "parse_error" in result:
+        print(f"⚠️ Could not parse all JSON in {result['file']}: {result['parse_error']}")
+    if repeated_counts:
+        print(f"♻️ Repeated ({len(repeated_counts)}):")
+        for url, count in repeated_counts.items():
+            print(f"  - {url} (count: {count})")
+    if result["omitted_urls"]:
+        print(f"❌ Omitted ({len(result['omitted_urls'])}):")
+        for url in result["omitted_urls"]:
+            print(f"  - {url}")
+    if result["unexpected_patterns"]:
+        print(f"❓ Unexpected patterns ({len(result['unexpected_patterns'])}):")
+        for pattern in result["unexpected_patterns"]:
+            print(f"  - {pattern}")
+
+# Step 4b: What the shared evaluation loop records about one scored file
+def describe_file(matcher, scored):
+    result, repeated_counts = scored
+    return {"result": result, "matched": result["matched_urls"], "total": result["total_urls"],
+            "omitted": result["omitted_urls"], "repeated": repeated_counts,
+            "repeated_positions": positions_for(matcher, result["repeated_urls"]),
+            "unexpected": result["unexpected_patterns"]}
+
+# Step 5: Process all STIX files in a directory
+def evaluate_stix_directory(url_list, stix_dir, output_file, exact=True, workers=1, store_file=None, canonical=False,
+                            matrix_file=None, matrix_group=None,
+                            db_file=None, model=None, compact=False):
+    matcher = exact_index(url_list, URL_PATHS, canonical, compact) if exact else IocMatcher(url_list)
+    del url_list  # the matcher keeps the IOCs; a compact one only saves memory if it holds the sole copy
+    return evaluate_files("url_search", "url", matcher, stix_dir, output_file, score_stix_file, describe_file,
+                          lambda scored: print_file_result(*scored),
+                          exact, workers, store_file, canonical, matrix_file, matrix_group, db_file, model)
+
+
+if __name__ == "__main__":
+    url_source_file = [YOUR_SOURCE_FILE]
+    stix_folder = [YOUR_FOLDER_TO_SCAN]
+    summary_output_file = "url_match_summary_gpt.json"
+    result_store_file = "url_match_store_gpt.json"  # per-file results reused on the next run
+    results_db_file = "stix_results.sqlite"  # every run is appended here (shared by all evaluators); None to skip
+
+    args = evaluator_parser("Score STIX output files against the source url list").parse_args()
+    evaluate_stix_directory(extract_url_list(url_source_file), stix_folder, None if args.no_json else summary_output_file,
+                            **evaluator_options(args, result_store_file, results_db_file))
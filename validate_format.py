@@ -1,32 +1,148 @@
 import os
 import json
-from stix2validator import validate_file, print_results
+import time
+import argparse
+from importlib.metadata import version, PackageNotFoundError
+from eval_pool import list_stix_files, map_stix_files
+from result_store import ResultStore, context_hash
+from fast_validate import validate_objects
+from stix_reader import MANIFEST_SUFFIX, shard_paths
+from results_db import ResultsDB
 
-stix_folder = [YOUR_FOLDER_TO_SCAN]
-summary_output_file = "stix_validation_gpt_url.json"
+def validator_version():
+    try:
+        return version("stix2-validator")
+    except PackageNotFoundError:
+        return "unknown"
 
-def evaluate_stix_directory(stix_dir, output_file):
+# Flatten the validator's per-object results into plain message lists
+def collect_messages(results):
+    errors = []
+    warnings = []
+    if getattr(results, "fatal", None):
+        errors.append(f"fatal: {results.fatal.message}")
+    for obj in results.object_results or []:
+        prefix = f"{obj.object_id}: " if obj.object_id else ""
+        errors.extend(prefix + str(error) for error in obj.errors or [])
+        warnings.extend(prefix + str(warning) for warning in obj.warnings or [])
+    return errors, warnings
+
+def validate_stix_file(fast, filepath):
+    filename = os.path.basename(filepath)
+    start = time.perf_counter()
+    try:
+        if fast:
+            # In-process checks; only suspicious objects reach stix2validator
+            summary = {"file": filename, **validate_objects(filepath)}
+            summary["seconds"] = round(time.perf_counter() - start, 3)
+            return summary
+
+        # Imported lazily: fast runs and the other stix_cli subcommands never load stix2validator
+        from stix2validator import validate_file
+        results = validate_file(filepath)
+        errors, warnings = collect_messages(results)
+        summary = {
+            "file": filename,
+            "is_valid": results.is_valid,
+            "errors": errors,
+            "warnings": warnings
+        }
+    except Exception as e:
+        summary = {"file": filename, "error": str(e)}
+    summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+# Combine the summaries of a sharded bundle's shards into one for the bundle
+def merge_shard_summaries(filename, summaries):
+    failed = [s for s in summaries if "error" in s]
+    if failed:
+        return {"file": filename, "error": "; ".join(f"{s['file']}: {s['error']}" for s in failed)}
+    merged = {"file": filename, "is_valid": all(s["is_valid"] for s in summaries), "errors": [], "warnings": [],
+              "shards": len(summaries)}
+    for s in summaries:
+        merged["errors"].extend(f"{s['file']}: {e}" for e in s["errors"])
+        merged["warnings"].extend(f"{s['file']}: {w}" for w in s["warnings"])
+        for key in ("seconds", "fast_checked", "fully_validated"):
+            if key in s:
+                merged[key] = round(merged.get(key, 0) + s[key], 3)
+    return merged
+
+def evaluate_stix_directory(stix_dir, output_file, workers=1, store_file=None, fast=False, db_file=None, model=None):
     val_res = []
+    start = time.perf_counter()
+
+    # Results are reused for any file whose content was already validated by this
+    # validator version, even under another name
+    store = ResultStore(store_file, context_hash("stix2-validator", validator_version(), fast), by_content=True) if store_file else None
+
+    # Each shard of a sharded bundle is validated on its own, so the shards of
+    # one large bundle spread across the workers too
+    bundles = []
+    paths = []
+    for filename in list_stix_files(stix_dir):
+        path = os.path.join(stix_dir, filename)
+        try:
+            files = shard_paths(path) if filename.endswith(MANIFEST_SUFFIX) else [path]
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"❌ Error reading manifest {filename}: {e}")
+            continue
+        bundles.append((filename, len(files)))
+        paths.extend(files)
 
-    for filename in os.listdir(stix_dir):
-        if filename.endswith(".json"):
-            print(f"Validating {filename}...")
-            filepath = os.path.join(stix_dir, filename)
-            try:
-                results = validate_file(filepath)
-                summary = {
-                    "file": filename,
-                    "is_valid": results.is_valid
-                }
-                val_res.append(summary)
-
-            except Exception as e:
-                print(f"❌ Error validating {filename}: {e}")
-            
+    db = ResultsDB(db_file) if db_file else None
+    run_id = db.start_run("validate_format", model=model, stix_dir=stix_dir, fast=fast,
+                          validator=validator_version()) if db else None
+
+    # A result reused from a copy of this file carries the copy's name
+    summaries = [dict(summary, file=os.path.basename(paths[i]))
+                 for i, summary in enumerate(map_stix_files(validate_stix_file, fast, paths, workers, store))]
+    first = 0
+    for filename, shard_count in bundles:
+        shards = summaries[first:first + shard_count]
+        first += shard_count
+        summary = shards[0] if not filename.endswith(MANIFEST_SUFFIX) else merge_shard_summaries(filename, shards)
+        if "error" in summary:
+            print(f"❌ Error validating {summary['file']}: {summary['error']}")
+            if db:
+                db.add_file(run_id, summary["file"], is_valid=False, seconds=summary.get("seconds"),
+                            parse_error=summary["error"])
+            continue
+        if db:
+            db.add_file(run_id, summary["file"], is_valid=summary["is_valid"], seconds=summary.get("seconds"),
+                        errors=summary["errors"], warnings=summary["warnings"])
+        status = "✅" if summary["is_valid"] else "❌"
+        print(f"{status} {summary['file']}: {len(summary['errors'])} errors, "
+              f"{len(summary['warnings'])} warnings ({summary['seconds']}s)")
+        val_res.append(summary)
+
+    if store:
+        print(f"\n♻️ Reused stored results for {store.hits}/{len(paths)} files")
+    print(f"⏱️ Validated {len(bundles)} bundles ({len(paths)} files) in {time.perf_counter() - start:.2f}s")
+
+    if db:
+        db.finish_run(run_id)
+        db.close()
+        print(f"🗄️ Recorded run {run_id} in {db_file}")
 
     # Save summary results
-    with open(output_file, 'w') as out:
-        json.dump(val_res, out, indent=2)
-    print(f"\n📄 Saved summary to {output_file}")
+    if output_file:
+        with open(output_file, 'w') as out:
+            json.dump(val_res, out, indent=2)
+        print(f"\n📄 Saved summary to {output_file}")
+
+
+if __name__ == "__main__":
+    stix_folder = [YOUR_FOLDER_TO_SCAN]
+    summary_output_file = "stix_validation_gpt_url.json"
+    result_store_file = "stix_validation_store_gpt_url.json"  # per-file results reused on the next run
+    results_db_file = "stix_results.sqlite"  # every run is appended here (shared by all evaluators and this validator); None to skip
+
+    parser = argparse.ArgumentParser(description="Validate STIX output files with stix2-validator")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes (default: 1)")
+    parser.add_argument("--fast", action="store_true", help="check Indicator objects in-process and send only suspicious ones to stix2validator")
+    parser.add_argument("--model", help="model that produced these files, recorded with the run in the results database")
+    parser.add_argument("--no-json", action="store_true", help="skip the JSON summary; the run still goes to the results database")
+    args = parser.parse_args()
 
-evaluate_stix_directory(stix_folder, summary_output_file)
\ No newline at end of file
+    evaluate_stix_directory(stix_folder, None if args.no_json else summary_output_file, workers=args.workers,
+                            store_file=result_store_file, fast=args.fast, db_file=results_db_file, model=args.model)